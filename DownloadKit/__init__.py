@@ -1,2 +1,3 @@
 # -*- coding:utf-8 -*-
 from .downloadKit import DownloadKit
+from .cluster import Cluster
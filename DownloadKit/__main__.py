@@ -0,0 +1,11 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   __main__.py
+"""
+from sys import exit
+
+from .cli import main
+
+exit(main())
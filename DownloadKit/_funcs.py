@@ -4,15 +4,25 @@
 @Contact :   g1879@qq.com
 """
 from copy import copy
-from os import path as os_PATH
+from errno import ENOSPC
+from os import path as os_PATH, scandir, replace, stat, link
 from pathlib import Path
 from random import randint
 from re import search, sub
-from time import time
+from shutil import disk_usage, copyfile
+from threading import Lock
+from time import time, perf_counter
 from urllib.parse import unquote
 
 from requests import Session
 
+from .encoding import iter_body
+
+try:
+    from os import posix_fallocate
+except ImportError:  # windows、mac
+    posix_fallocate = None
+
 
 def copy_session(session):
     """复制输入Session对象，返回一个新的
@@ -34,22 +44,103 @@ def copy_session(session):
     return new
 
 
-class BlockSizeSetter(object):
-    def __set__(self, block_size, val):
-        if isinstance(val, int) and val > 0:
-            size = val
-        elif isinstance(val, str):
-            units = {'b': 1, 'k': 1024, 'm': 1048576, 'g': 21474836480}
-            num = int(val[:-1])
-            unit = units.get(val[-1].lower(), None)
-            if unit and num > 0:
-                size = num * unit
-            else:
-                raise ValueError('单位只支持B、K、M、G，数字必须为大于0的整数。')
+class ByteCounter(object):
+    def __init__(self):
+        """线程安全的计数器，用于字节数、任务数等，附带平滑后的速度"""
+        self._lock = Lock()
+        self._value = 0
+        self._speed = None
+        self._last_time = perf_counter()
+        self._last_value = 0
+
+    @property
+    def value(self):
+        """返回累计值"""
+        return self._value
+
+    def add(self, num):
+        """增加计数
+        :param num: 增加的数量，可为负数
+        :return: None
+        """
+        with self._lock:
+            self._value += num
+
+    def speed(self):
+        """返回平滑后的速度（字节/秒），两次计算间隔不足0.5秒时返回上次结果"""
+        now = perf_counter()
+        with self._lock:
+            interval = now - self._last_time
+            if interval >= .5:
+                speed = (self._value - self._last_value) / interval
+                self._speed = speed if self._speed is None else self._speed * .7 + speed * .3
+                self._last_time, self._last_value = now, self._value
+            return self._speed
+
+
+class CookiesCache(object):
+    def __init__(self, download_kit, ttl=10):
+        """缓存页面对象的cookies和user agent，供所有任务共用，避免每个任务都从浏览器获取
+        :param download_kit: 所属DownloadKit对象
+        :param ttl: 缓存有效时间（秒），为0时每次都重新获取
+        """
+        self._download_kit = download_kit
+        self.ttl = ttl
+        self._lock = Lock()
+        self._cookies = None
+        self._user_agent = None
+        self._expire = 0
+
+    def get(self):
+        """返回cookies和user agent组成的tuple，缓存过期时从页面对象重新获取"""
+        with self._lock:
+            if self._cookies is None or perf_counter() >= self._expire:
+                page = self._download_kit.page
+                self._cookies = page.get_cookies()
+                self._user_agent = page.user_agent
+                self._expire = perf_counter() + self.ttl
+            return self._cookies, self._user_agent
+
+    def set_session(self, session):
+        """把缓存的cookies和user agent设置到Session对象
+        :param session: Session对象
+        :return: None
+        """
+        if self._download_kit.page is None:
+            return
+        cookies, user_agent = self.get()
+        set_session_cookies(session, cookies)
+        session.headers.update({"User-Agent": user_agent})
+
+    def clear(self):
+        """清除缓存，下次使用时重新从页面获取"""
+        with self._lock:
+            self._cookies = None
+            self._user_agent = None
+
+
+def parse_size(val):
+    """把表示大小的int或str转换为字节数
+    :param val: int或'10K'、'10M'等格式的str
+    :return: 字节数
+    """
+    if isinstance(val, int) and val > 0:
+        return val
+    elif isinstance(val, str):
+        units = {'b': 1, 'k': 1024, 'm': 1048576, 'g': 1073741824}
+        num = int(val[:-1])
+        unit = units.get(val[-1].lower(), None)
+        if unit and num > 0:
+            return num * unit
         else:
-            raise TypeError('split_size只能传入int或str，数字必须为大于0的整数。')
+            raise ValueError('单位只支持B、K、M、G，数字必须为大于0的整数。')
+    else:
+        raise TypeError('只能传入int或str，数字必须为大于0的整数。')
 
-        block_size._block_size = size
+
+class BlockSizeSetter(object):
+    def __set__(self, block_size, val):
+        block_size._block_size = parse_size(val)
 
     def __get__(self, block_size, objtype=None) -> int:
         return block_size._block_size
@@ -76,34 +167,6 @@ class FileExistsSetter(object):
         return file_exists._file_exists
 
 
-def get_usable_path(path):
-    """检查文件或文件夹是否有重名，并返回可以使用的路径
-    :param path: 文件或文件夹路径
-    :return: 可用的路径，Path对象
-    """
-    path = Path(path)
-    parent = path.parent
-    path = parent / make_valid_name(path.name)
-    name = path.stem if path.is_file() else path.name
-    ext = path.suffix if path.is_file() else ''
-
-    first_time = True
-
-    while path.exists():
-        r = search(r'(.*)_(\d+)$', name)
-
-        if not r or (r and first_time):
-            src_name, num = name, '1'
-        else:
-            src_name, num = r.group(1), int(r.group(2)) + 1
-
-        name = f'{src_name}_{num}'
-        path = parent / f'{name}{ext}'
-        first_time = None
-
-    return path
-
-
 def make_valid_name(full_name):
     """获取有效的文件名
     :param full_name: 文件名
@@ -164,14 +227,146 @@ def set_charset(response):
     return response
 
 
-def get_file_info(response, goal_path=None, rename=None, file_exists=None, lock=None):
+class FileNames(object):
+    def __init__(self):
+        """记录各文件夹中已占用的文件名，用于快速分配不重名的文件名
+        每个文件夹首次使用时扫描一次，之后在内存中查找，并且每个文件夹使用独立的锁
+        """
+        self._folders = {}
+        self._lock = Lock()
+
+    def _get_folder(self, folder):
+        """返回文件夹的锁、已占用文件名集合和序号记录，首次使用时创建文件夹并扫描
+        :param folder: 文件夹路径，Path对象
+        :return: [Lock, set, dict]
+        """
+        key = str(folder)
+        f = self._folders.get(key, None)
+        if f is None:
+            with self._lock:
+                f = self._folders.get(key, None)
+                if f is None:
+                    folder.mkdir(parents=True, exist_ok=True)
+                    with scandir(key) as entries:
+                        names = {os_PATH.normcase(i.name) for i in entries}
+                    f = self._folders[key] = [Lock(), names, {}]
+        return f
+
+    def reserve(self, path, rename=False):
+        """占用一个文件名
+        :param path: 文件路径，Path对象
+        :param rename: 文件名已被占用时是否生成新文件名
+        :return: (最终路径, 原文件名是否已被占用)
+        """
+        lock, names, nums = self._get_folder(path.parent)
+        name = os_PATH.normcase(path.name)
+        with lock:
+            if name not in names:
+                names.add(name)
+                return path, False
+            if not rename:
+                return path, True
+            if not path.exists():  # 记录可能已过期（文件被其它程序删除），以硬盘为准，重名由独占创建兜底
+                return path, False
+
+            stem, ext = (path.stem, path.suffix) if path.suffix else (path.name, '')
+            num = nums.get(name, 1)
+            new = f'{stem}_{num}{ext}'
+            while os_PATH.normcase(new) in names:
+                num += 1
+                new = f'{stem}_{num}{ext}'
+            nums[name] = num + 1
+            names.add(os_PATH.normcase(new))
+            return path.parent / new, True
+
+    def release(self, path):
+        """释放一个文件名，用于文件被删除时
+        :param path: 文件路径
+        :return: None
+        """
+        path = Path(path)
+        f = self._folders.get(str(path.parent), None)
+        if f is not None:
+            with f[0]:
+                f[1].discard(os_PATH.normcase(path.name))
+
+
+class DiskSpace(object):
+    def __init__(self, margin=0, preallocate=False):
+        """按文件大小为任务预留硬盘空间，同一文件系统上的所有任务一起计算
+        :param margin: 每个文件系统至少保留多少空闲字节
+        :param preallocate: 预留成功后是否立即为文件分配空间
+        """
+        self.margin = margin
+        self.preallocate = preallocate
+        self._lock = Lock()
+        self._missions = {}  # {st_dev: {任务: 预留字节数}}
+        self._parked = {}  # {st_dev: [等待空间的任务]}
+
+    def reserve(self, mission, path, size, allocate=True):
+        """为任务预留空间
+        :param mission: 任务对象
+        :param path: 文件路径，Path对象
+        :param size: 需要的字节数
+        :param allocate: 是否允许预先分配文件空间
+        :return: 'ok'为已预留；'wait'为须等其它任务结束后重试，任务已登记等待；'full'为空间不足
+        """
+        dev = stat(path.parent).st_dev
+        with self._lock:
+            missions = self._missions.setdefault(dev, {})
+            # 其它任务还未写入的部分也算作已占用
+            pending = sum(max(0, s - m.downloaded_size) for m, s in missions.items() if not m._preallocated)
+            if disk_usage(path.parent).free - pending - size < self.margin:
+                if missions:
+                    self._parked.setdefault(dev, []).append(mission)
+                    return 'wait'
+                return 'full'
+
+            if self.preallocate and allocate and posix_fallocate is not None:
+                try:
+                    with open(path, 'rb+') as f:
+                        posix_fallocate(f.fileno(), 0, size)
+                    mission._preallocated = True
+                except OSError as e:
+                    if e.errno == ENOSPC:
+                        if missions:
+                            self._parked.setdefault(dev, []).append(mission)
+                            return 'wait'
+                        return 'full'
+
+            missions[mission] = size
+            mission._space_device = dev
+            return 'ok'
+
+    def release(self, mission):
+        """释放任务预留的空间
+        :param mission: 任务对象
+        :return: 在同一文件系统上等待空间的任务列表，须重新加入运行
+        """
+        with self._lock:
+            dev = mission._space_device
+            if dev is None:
+                return []
+            self._missions.get(dev, {}).pop(mission, None)
+            mission._space_device = None
+            return self._parked.pop(dev, [])
+
+    def reserved(self):
+        """返回各文件系统预留的字节数和等待空间的任务数"""
+        with self._lock:
+            return {dev: {'reserved': sum(missions.values()), 'waiting': len(self._parked.get(dev, []))}
+                    for dev, missions in self._missions.items()}
+
+
+def get_file_info(response, goal_path=None, rename=None, file_exists=None, file_names=None, create=True):
     """获取文件信息，大小单位为byte
     包括：size、path、skip
     :param response: Response对象
     :param goal_path: 目标文件夹
     :param rename: 重命名
     :param file_exists: 存在重名文件时的处理方式
-    :param lock: 线程锁
+    :param file_names: 记录已占用文件名的FileNames对象
+    :param create: 是否预先创建空文件，为False时只占用文件名
     :return: 文件名、文件大小、保存路径、是否跳过
     """
     # ------------获取文件大小------------
@@ -186,10 +381,55 @@ def get_file_info(response, goal_path=None, rename=None, file_exists=None, lock=
     # 按windows规则去除路径中的非法字符
     goal_path = goal_Path.anchor + sub(r'[*:|<>?"]', '', goal_path.lstrip(goal_Path.anchor)).strip()
     goal_Path = Path(goal_path).absolute()
-    goal_Path.mkdir(parents=True, exist_ok=True)
 
     # ------------获取保存文件名------------
-    # -------------------重命名，不改变扩展名-------------------
+    full_name = get_full_name(file_name, rename)
+
+    # -------------------生成路径-------------------
+    skip = False
+    full_path, exists = file_names.reserve(goal_Path / full_name, file_exists == 'rename')
+    if file_exists != 'rename':  # 记录只用于快速选择新文件名，文件是否存在以硬盘为准
+        exists = full_path.exists()
+
+    if exists and file_exists == 'skip':
+        skip = True
+
+    elif not create:
+        pass
+
+    elif file_exists == 'add':  # 不存在时创建，已存在（包括其它程序刚创建的）时不截断
+        break_link(full_path)
+        with open(full_path, 'ab'):
+            pass
+
+    elif file_exists == 'rename':
+        while True:  # 文件可能由其它程序创建，未被记录
+            try:
+                with open(full_path, 'xb'):
+                    pass
+                break
+            except FileExistsError:
+                full_path = file_names.reserve(goal_Path / full_name, True)[0]
+
+    else:  # 先删除再创建，原文件是仓库文件等的硬链接时不会被截断
+        try:
+            full_path.unlink()
+        except FileNotFoundError:
+            pass
+        with open(full_path, 'wb'):
+            pass
+
+    return {'size': file_size,
+            'path': full_path,
+            'skip': skip}
+
+
+def get_full_name(file_name, rename=None):
+    """生成保存用的文件名，重命名时不改变扩展名
+    :param file_name: 服务器上的文件名
+    :param rename: 重命名
+    :return: 可用的文件名
+    """
     if rename:
         tmp = file_name.rsplit('.', 1)
         ext_name = tmp[-1] if len(tmp) > 1 else ''
@@ -198,36 +438,72 @@ def get_file_info(response, goal_path=None, rename=None, file_exists=None, lock=
         full_name = rename if ext_rename == ext_name else f'{rename}.{ext_name}'
     else:
         full_name = file_name
+    return make_valid_name(full_name)
 
-    full_name = make_valid_name(full_name)
 
-    # -------------------生成路径-------------------
-    skip = False
-    create = True
-    full_path = goal_Path / full_name
-
-    with lock:
-        if full_path.exists():
-            if file_exists == 'rename':
-                full_path = get_usable_path(full_path)
-
-            elif file_exists == 'skip':
-                skip = True
-                create = False
-
-            elif file_exists == 'overwrite':
-                full_path.unlink()
+def read_small(response, max_size, raw=False):
+    """尝试读取不超过指定大小的完整响应数据
+    :param response: Response对象
+    :param max_size: 最大字节数
+    :param raw: 是否读取未解压的原始数据
+    :return: (完整数据或None, 已读取但未超过时为空的前段数据)，数据超过大小时第一位为None，第二位为已读取的数据
+    """
+    size = response.headers.get('Content-Length', None)
+    if size is not None and int(size) > max_size:
+        return None, b''
 
-            elif file_exists == 'add':
-                create = False
+    data = b''
+    for chunk in iter_body(response, max_size + 1, raw):
+        data += chunk
+        if len(data) > max_size:
+            return None, data
+    return data, b''
 
-        if create:
-            with open(full_path, 'wb'):
-                pass
 
-    return {'size': file_size,
-            'path': full_path,
-            'skip': skip}
+def break_link(path):
+    """文件有多个硬链接时换成内容相同的独立文件，之后原位写入不会改动其它链接（如内容仓库中的文件）
+    :param path: 文件路径，Path对象
+    :return: None
+    """
+    try:
+        if stat(path).st_nlink <= 1:
+            return
+    except FileNotFoundError:
+        return
+
+    tmp = path.parent / f'.{path.name}.{randint(0, 99999999)}.tmp'
+    try:
+        copyfile(path, tmp)
+        replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def save_file(path, data, exclusive=False):
+    """先写入临时文件再改名，一次性保存文件
+    :param path: 文件路径，Path对象
+    :param data: 字节数据
+    :param exclusive: 为True时不覆盖已存在的文件，已存在时抛出FileExistsError
+    :return: None
+    """
+    tmp = path.parent / f'.{path.name}.{randint(0, 99999999)}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        if not exclusive:
+            replace(tmp, path)
+            return
+        try:  # 硬链接到目标路径，目标已存在时失败，不会覆盖
+            link(tmp, path)
+        except FileExistsError:
+            raise
+        except OSError:  # 文件系统不支持硬链接
+            with open(path, 'xb') as f:
+                f.write(data)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
 
 
 def _get_file_name(response) -> str:
@@ -260,8 +536,8 @@ def _get_file_name(response) -> str:
         file_name = file_name.strip("'")
 
     # 在url里获取文件名
-    if not file_name and os_PATH.basename(response.url):
-        file_name = os_PATH.basename(response.url).split("?")[0]
+    if not file_name:
+        file_name = _url_file_name(response.url)
 
     # 找不到则用时间和随机数生成文件名
     if not file_name:
@@ -272,6 +548,14 @@ def _get_file_name(response) -> str:
     return unquote(file_name, charset)
 
 
+def _url_file_name(url):
+    """从url中获取文件名，未解码
+    :param url: url
+    :return: 文件名，没有时返回空字符串
+    """
+    return os_PATH.basename(url).split("?")[0]
+
+
 def set_session_cookies(session, cookies):
     """设置Session对象的cookies
     :param session: Session对象
@@ -281,7 +565,7 @@ def set_session_cookies(session, cookies):
     # cookies = cookies_to_tuple(cookies)
     for cookie in cookies:
         if cookie['value'] is None:
-            cookie['value'] = ''
+            cookie = dict(cookie, value='')  # cookies可能是多个任务共用的缓存，不修改原数据
 
         kwargs = {x: cookie[x] for x in cookie
                   if x.lower() in ('version', 'port', 'domain', 'path', 'secure',
@@ -5,14 +5,54 @@
 """
 from pathlib import Path
 from threading import Lock
-from typing import Union
+from typing import Union, Dict, List, Tuple, Optional, Literal
 
 from requests import Session, Response
 
+from .downloadKit import DownloadKit
+from .mission import Mission
+
 
 def copy_session(session: Session) -> Session: ...
 
 
+class ByteCounter(object):
+    _lock: Lock = ...
+    _value: int = ...
+    _speed: Optional[float] = ...
+    _last_time: float = ...
+    _last_value: int = ...
+
+    def __init__(self): ...
+
+    @property
+    def value(self) -> int: ...
+
+    def add(self, num: int) -> None: ...
+
+    def speed(self) -> Optional[float]: ...
+
+
+class CookiesCache(object):
+    _download_kit: DownloadKit = ...
+    ttl: float = ...
+    _lock: Lock = ...
+    _cookies: Optional[list] = ...
+    _user_agent: Optional[str] = ...
+    _expire: float = ...
+
+    def __init__(self, download_kit: DownloadKit, ttl: float = 10): ...
+
+    def get(self) -> Tuple[list, str]: ...
+
+    def set_session(self, session: Session) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+def parse_size(val: Union[str, int]) -> int: ...
+
+
 class BlockSizeSetter(object):
     def __set__(self, block_size, val: Union[str, int]): ...
 
@@ -31,9 +71,6 @@ class FileExistsSetter(object):
     def __get__(self, file_exists, objtype=None): ...
 
 
-def get_usable_path(path: Union[str, Path]) -> Path: ...
-
-
 def make_valid_name(full_name: str) -> str: ...
 
 
@@ -43,11 +80,60 @@ def get_long(txt: str) -> int: ...
 def set_charset(response: Response) -> Response: ...
 
 
+class FileNames(object):
+    _folders: Dict[str, list] = ...
+    _lock: Lock = ...
+
+    def __init__(self): ...
+
+    def _get_folder(self, folder: Path) -> List[Lock, set, dict]: ...
+
+    def reserve(self, path: Path, rename: bool = False) -> Tuple[Path, bool]: ...
+
+    def release(self, path: Union[str, Path]) -> None: ...
+
+
+class DiskSpace(object):
+    margin: int = ...
+    preallocate: bool = ...
+    _lock: Lock = ...
+    _missions: Dict[int, Dict[Mission, int]] = ...
+    _parked: Dict[int, List[Mission]] = ...
+
+    def __init__(self, margin: int = 0, preallocate: bool = False): ...
+
+    def reserve(self, mission: Mission, path: Path, size: int,
+                allocate: bool = True) -> Literal['ok', 'wait', 'full']: ...
+
+    def release(self, mission: Mission) -> List[Mission]: ...
+
+    def reserved(self) -> Dict[int, dict]: ...
+
+
 def get_file_info(response: Response,
                   goal_path: str = None,
                   rename: str = None,
                   file_exists: str = None,
-                  lock: Lock = None) -> dict: ...
+                  file_names: FileNames = None,
+                  create: bool = True) -> dict: ...
+
+
+def get_full_name(file_name: str, rename: Optional[str] = None) -> str: ...
+
+
+def read_small(response: Response, max_size: int, raw: bool = False) -> Tuple[Optional[bytes], bytes]: ...
+
+
+def break_link(path: Path) -> None: ...
+
+
+def save_file(path: Path, data: bytes, exclusive: bool = False) -> None: ...
 
 
 def set_session_cookies(session: Session, cookies: list) -> None: ...
+
+
+def _get_file_name(response: Response) -> str: ...
+
+
+def _url_file_name(url: str) -> str: ...
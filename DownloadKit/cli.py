@@ -0,0 +1,278 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   cli.py
+"""
+from csv import DictReader
+from json import dumps, loads
+from pathlib import Path
+from sys import stdin, exit
+from time import sleep, perf_counter, time
+
+from .downloadKit import DownloadKit
+
+_FIELDS = ('url', 'goal_path', 'rename', 'file_exists', 'split', 'headers')
+
+
+def read_missions(path, fmt=None):
+    """逐条读取任务列表文件
+    txt格式每行一个网址，空行和#开头的行忽略；csv格式首行为表头；jsonl格式每行一个json对象
+    csv和jsonl可用列：url、goal_path、rename、file_exists、split、headers（dict或json文本），jsonl可用kwargs传入其它连接参数
+    :param path: 文件路径，'-'表示从标准输入读取txt格式
+    :param fmt: 文件格式，'txt'、'csv'或'jsonl'，为None时按扩展名判断
+    :return: 生成器，每项为包含行号id的任务信息dict
+    """
+    if fmt is None:
+        suffix = Path(path).suffix.lower()
+        fmt = 'csv' if suffix == '.csv' else 'jsonl' if suffix in ('.jsonl', '.json', '.ndjson') else 'txt'
+
+    f = stdin if path == '-' else open(path, 'r', encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    try:
+        if fmt == 'csv':
+            for ID, row in enumerate(DictReader(f), 1):
+                row = {k.strip().lower(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                if row.get('url', None):
+                    yield _make_row(ID, row)
+
+        else:
+            for ID, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                yield _make_row(ID, loads(line) if fmt == 'jsonl' else {'url': line})
+    finally:
+        if f is not stdin:
+            f.close()
+
+
+def _make_row(ID, data):
+    """整理一条任务信息
+    :param ID: 行号
+    :param data: 读取到的数据
+    :return: 任务信息dict
+    """
+    if not data.get('url', None):
+        raise ValueError(f'第{ID}行缺少url。')
+    row = {k: data.get(k, None) for k in _FIELDS}
+    row['id'] = ID
+    if isinstance(row['headers'], str):
+        row['headers'] = loads(row['headers'])
+    if isinstance(row['split'], str):
+        row['split'] = row['split'].lower() in ('1', 'true', 'yes', 'y')
+    row['kwargs'] = data.get('kwargs', None) or {}
+    return row
+
+
+def load_state(path):
+    """读取结果文件，得到每个任务最后的状态
+    :param path: 结果文件路径
+    :return: {id: {'url': 网址, 'result': 结果或None, 'path': 已知的文件路径}}
+    """
+    state = {}
+    if not Path(path).exists():
+        return state
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                data = loads(line)
+            except ValueError:  # 中断时可能写了半行
+                continue
+            if 'id' not in data:
+                continue
+            s = state.setdefault(data['id'], {'url': data.get('url', None), 'result': None, 'path': None})
+            if data.get('path', None):
+                s['path'] = data['path']
+            if data.get('event', None) == 'done':
+                s['result'] = data.get('result', None)
+    return state
+
+
+class BatchRunner(object):
+    def __init__(self, input_path, results_path=None, goal_path='.', roads=10, block_size='50M', retry=None,
+                 interval=None, timeout=None, rate=None, file_exists='rename', split=True, fmt=None,
+                 resume=False, progress_interval=5):
+        """从文件读取任务批量下载，结果逐行写入jsonl文件，中断后可从结果文件继续
+        :param input_path: 任务列表文件路径
+        :param results_path: 结果文件路径，为None时为任务列表文件名加'.results.jsonl'
+        :param goal_path: 默认保存路径
+        :param roads: 可同时运行的线程数
+        :param block_size: 分块大小
+        :param retry: 连接失败时重试次数
+        :param interval: 重试间隔（秒）
+        :param timeout: 连接超时时间（秒）
+        :param rate: 每秒最多开始多少个任务，为None时不限制
+        :param file_exists: 默认遇到同名文件时的处理方式
+        :param split: 是否允许分块下载
+        :param fmt: 任务列表格式，为None时按扩展名判断
+        :param resume: 是否跳过结果文件中已成功的任务，中断的任务覆盖已下载的文件重新下载
+        :param progress_interval: 多少秒向结果文件写一次总进度，为0时不写
+        """
+        self.input_path = input_path
+        self.results_path = results_path or f'{"stdin" if input_path == "-" else input_path}.results.jsonl'
+        self.fmt = fmt
+        self.rate = rate
+        self.resume = resume
+        self.progress_interval = progress_interval
+        self.summary = {'total': 0, 'success': 0, 'skipped': 0, 'failed': 0, 'resumed': 0}
+
+        self._kit = DownloadKit(goal_path, roads=roads, file_exists=file_exists)
+        self._kit.set.block_size(block_size)
+        self._kit.set.split(split)
+        if retry is not None:
+            self._kit.set.retry(retry)
+        if interval is not None:
+            self._kit.set.interval(interval)
+        if timeout is not None:
+            self._kit.set.timeout(timeout)
+        self._kit.set.log.print_nothing()
+        self._file = None
+
+    @property
+    def kit(self):
+        """返回执行下载的DownloadKit对象"""
+        return self._kit
+
+    def run(self, show=False):
+        """执行所有任务，直到全部结束
+        :param show: 是否在命令行显示进度
+        :return: 各结果的任务数dict
+        """
+        state = load_state(self.results_path) if self.resume else {}
+        self._file = open(self.results_path, 'a' if self.resume else 'w', encoding='utf-8')
+        running = {}
+        max_running = self._kit.roads * 2  # 只读取需要的任务，任务列表很大时不占用过多内存
+        last_start = last_progress = 0
+
+        try:
+            rows = read_missions(self.input_path, self.fmt)
+            finished = False
+            while True:
+                while not finished and len(running) < max_running:
+                    if self.rate and perf_counter() - last_start < 1 / self.rate:
+                        break
+                    row = next(rows, None)
+                    if row is None:
+                        finished = True
+                        break
+                    self.summary['total'] += 1
+                    old = state.get(row['id'], None)
+                    if old and old['url'] == row['url'] and old['result'] in ('success', 'skipped'):
+                        self.summary['resumed'] += 1
+                        continue
+                    running[row['id']] = [row, self._add(row, old), False]
+                    last_start = perf_counter()
+
+                for ID, (row, mission, has_path) in list(running.items()):
+                    if not has_path and mission.path:  # 记录文件路径，中断后继续时覆盖此文件
+                        self._write({'id': ID, 'url': row['url'], 'event': 'start', 'path': str(mission.path)})
+                        running[ID][2] = True
+                    if mission.is_done:
+                        self._done(row, mission)
+                        running.pop(ID)
+
+                if self.progress_interval and perf_counter() - last_progress >= self.progress_interval:
+                    last_progress = perf_counter()
+                    self._write(dict(self._kit.progress(), event='progress'))
+                if show:
+                    self._show()
+
+                if finished and not running:
+                    break
+                sleep(.1)
+
+        except KeyboardInterrupt:
+            self._kit.cancel()
+            raise
+
+        finally:
+            self._file.close()
+            if show:
+                print()
+        return self.summary
+
+    def _add(self, row, old):
+        """把一条任务添加到下载器
+        :param row: 任务信息
+        :param old: 结果文件中此任务的状态
+        :return: 任务对象
+        """
+        goal_path, rename, file_exists = row['goal_path'], row['rename'], row['file_exists']
+        if old and old['url'] == row['url'] and old['path']:  # 上次中断的任务，覆盖未完成的文件
+            path = Path(old['path'])
+            goal_path, rename, file_exists = str(path.parent), path.name, 'overwrite'
+        kwargs = dict(row['kwargs'])
+        if row['headers']:
+            kwargs['headers'] = row['headers']
+        return self._kit.add(row['url'], goal_path=goal_path, rename=rename, file_exists=file_exists,
+                             split=row['split'], **kwargs)
+
+    def _done(self, row, mission):
+        """记录一个已结束的任务
+        :param row: 任务信息
+        :param mission: 任务对象
+        :return: None
+        """
+        result = mission.result
+        key = result if result in ('success', 'skipped') else 'failed'
+        self.summary[key] += 1
+        self._write({'id': row['id'], 'url': row['url'], 'event': 'done', 'result': result,
+                     'info': mission.info, 'path': str(mission.path) if mission.path else None, 'size': mission.size,
+                     'downloaded': mission.downloaded_size})
+
+    def _write(self, data):
+        """向结果文件写入一行
+        :param data: 数据dict
+        :return: None
+        """
+        data['time'] = round(time(), 3)
+        self._file.write(dumps(data, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def _show(self):
+        """在命令行显示一行总进度"""
+        p = self._kit.progress()
+        s = self.summary
+        speed = f'{p["speed"] / 1048576:.2f}MB/s' if p['speed'] else '-'
+        print(f'\r\033[K已读取：{s["total"]} 成功：{s["success"]} 跳过：{s["skipped"] + s["resumed"]} '
+              f'失败：{s["failed"]} 运行：{p["running"]} {speed}', end='')
+
+
+def main(args=None):
+    """命令行批量下载"""
+    from argparse import ArgumentParser
+    parser = ArgumentParser(prog='python -m DownloadKit', description='从文件读取网址批量下载，结果写入jsonl文件。')
+    parser.add_argument('input', help='任务列表文件，txt、csv或jsonl格式，-表示从标准输入读取网址')
+    parser.add_argument('-o', '--output', default=None, help='结果文件路径，默认为任务列表文件名加.results.jsonl')
+    parser.add_argument('-p', '--goal-path', default='.', help='默认保存路径')
+    parser.add_argument('-r', '--roads', type=int, default=10, help='可同时运行的线程数')
+    parser.add_argument('-b', '--block-size', default='50M', help='分块大小')
+    parser.add_argument('--retry', type=int, default=None, help='连接失败时重试次数')
+    parser.add_argument('--interval', type=float, default=None, help='重试间隔（秒）')
+    parser.add_argument('--timeout', type=float, default=None, help='连接超时时间（秒）')
+    parser.add_argument('--rate', type=float, default=None, help='每秒最多开始多少个任务')
+    parser.add_argument('--file-exists', default='rename', choices=('skip', 'overwrite', 'rename', 'add'),
+                        help='默认遇到同名文件时的处理方式')
+    parser.add_argument('--no-split', action='store_true', help='不分块下载')
+    parser.add_argument('--format', default=None, choices=('txt', 'csv', 'jsonl'), help='任务列表格式，默认按扩展名判断')
+    parser.add_argument('--resume', action='store_true', help='跳过结果文件中已成功的任务，继续上次中断的批次')
+    parser.add_argument('--progress-interval', type=float, default=5, help='多少秒向结果文件写一次总进度，0为不写')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不显示进度')
+    args = parser.parse_args(args)
+
+    runner = BatchRunner(args.input, args.output, args.goal_path, args.roads, args.block_size, args.retry,
+                         args.interval, args.timeout, args.rate, args.file_exists, not args.no_split, args.format,
+                         args.resume, args.progress_interval)
+    try:
+        summary = runner.run(show=not args.quiet)
+    except KeyboardInterrupt:
+        print('已中断，可加--resume参数继续。')
+        return 130
+    if not args.quiet:
+        print(f'共{summary["total"]}个任务，成功{summary["success"]}个，跳过{summary["skipped"] + summary["resumed"]}个，'
+              f'失败{summary["failed"]}个。结果文件：{runner.results_path}')
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    exit(main())
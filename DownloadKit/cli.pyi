@@ -0,0 +1,66 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from typing import Union, Optional, Iterator, Literal, TextIO
+
+from .downloadKit import DownloadKit, FILE_EXISTS
+from .mission import Mission
+
+_FIELDS: tuple = ...
+
+
+def read_missions(path: Union[str, Path],
+                  fmt: Optional[Literal['txt', 'csv', 'jsonl']] = None) -> Iterator[dict]: ...
+
+
+def _make_row(ID: int, data: dict) -> dict: ...
+
+
+def load_state(path: Union[str, Path]) -> dict: ...
+
+
+class BatchRunner(object):
+    input_path: Union[str, Path] = ...
+    results_path: Union[str, Path] = ...
+    fmt: Optional[str] = ...
+    rate: Optional[float] = ...
+    resume: bool = ...
+    progress_interval: float = ...
+    summary: dict = ...
+    _kit: DownloadKit = ...
+    _file: Optional[TextIO] = ...
+
+    def __init__(self,
+                 input_path: Union[str, Path],
+                 results_path: Union[str, Path, None] = None,
+                 goal_path: Union[str, Path] = '.',
+                 roads: int = 10,
+                 block_size: Union[str, int] = '50M',
+                 retry: Optional[int] = None,
+                 interval: Optional[float] = None,
+                 timeout: Optional[float] = None,
+                 rate: Optional[float] = None,
+                 file_exists: FILE_EXISTS = 'rename',
+                 split: bool = True,
+                 fmt: Optional[Literal['txt', 'csv', 'jsonl']] = None,
+                 resume: bool = False,
+                 progress_interval: float = 5): ...
+
+    @property
+    def kit(self) -> DownloadKit: ...
+
+    def run(self, show: bool = False) -> dict: ...
+
+    def _add(self, row: dict, old: Optional[dict]) -> Mission: ...
+
+    def _done(self, row: dict, mission: Mission) -> None: ...
+
+    def _write(self, data: dict) -> None: ...
+
+    def _show(self) -> None: ...
+
+
+def main(args: Optional[list] = None) -> int: ...
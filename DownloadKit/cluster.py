@@ -0,0 +1,334 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   cluster.py
+"""
+from json import dumps, loads
+from multiprocessing import Process, cpu_count
+from os import getpid
+from pathlib import Path
+from socket import gethostname
+from sqlite3 import connect
+from time import sleep, perf_counter, time
+
+from .downloadKit import DownloadKit
+
+
+class SQLiteQueue(object):
+    """以SQLite文件作为中转的任务队列，供同一主机上的多个进程使用
+    使用WAL日志模式，依赖本机共享内存，不能放在NFS、SMB等网络文件系统上供多台主机共用"""
+
+    def __init__(self, path, timeout=30):
+        """
+        :param path: 数据库文件路径
+        :param timeout: 等待数据库锁的超时时间（秒）
+        """
+        self._path = str(path)
+        Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = connect(self._path, timeout=timeout, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS missions (
+                              id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              url TEXT NOT NULL,
+                              goal_path TEXT,
+                              rename TEXT,
+                              file_exists TEXT,
+                              split INTEGER,
+                              kwargs TEXT,
+                              state TEXT NOT NULL DEFAULT 'waiting',
+                              worker TEXT,
+                              result TEXT,
+                              info TEXT,
+                              path TEXT,
+                              size INTEGER,
+                              downloaded INTEGER NOT NULL DEFAULT 0,
+                              updated REAL)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_state ON missions (state)')
+
+    @property
+    def path(self):
+        """返回数据库文件路径"""
+        return self._path
+
+    def put(self, file_url, goal_path=None, rename=None, file_exists=None, split=None, kwargs=None):
+        """添加一个任务，返回任务id
+        :param file_url: 文件网址
+        :param goal_path: 保存路径，为None时使用执行进程的设置
+        :param rename: 重命名的文件名
+        :param file_exists: 遇到同名文件时的处理方式，为None时使用执行进程的设置
+        :param split: 是否允许分块下载，为None时使用执行进程的设置
+        :param kwargs: 连接参数，须能转换为json
+        :return: 任务id
+        """
+        cur = self._conn.execute('INSERT INTO missions (url, goal_path, rename, file_exists, split, kwargs, updated) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (file_url, None if goal_path is None else str(goal_path), rename, file_exists,
+                                  None if split is None else int(split), dumps(kwargs or {}), time()))
+        return cur.lastrowid
+
+    def take(self, worker, num=1):
+        """领取等待中的任务，领取后状态改为running
+        :param worker: 执行进程名称
+        :param num: 最多领取的数量
+        :return: 任务信息dict组成的列表
+        """
+        if num <= 0:
+            return []
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self._conn.execute('SELECT id, url, goal_path, rename, file_exists, split, kwargs FROM missions '
+                                      "WHERE state = 'waiting' ORDER BY id LIMIT ?", (num,)).fetchall()
+            now = time()
+            self._conn.executemany("UPDATE missions SET state = 'running', worker = ?, updated = ? WHERE id = ?",
+                                   [(worker, now, r[0]) for r in rows])
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        return [{'id': r[0], 'url': r[1], 'goal_path': r[2], 'rename': r[3], 'file_exists': r[4],
+                 'split': None if r[5] is None else bool(r[5]), 'kwargs': loads(r[6])} for r in rows]
+
+    def report(self, progress, worker=None):
+        """批量更新执行中任务的进度，已被重新放回队列或结束的任务不更新
+        :param progress: (任务id, 已下载字节数, 文件大小)组成的列表
+        :param worker: 执行进程名称，不为None时只更新由该进程领取的任务
+        :return: 指定worker时，返回已不属于该进程的任务id列表，执行进程须停止这些任务
+        """
+        if not progress:
+            return []
+        now = time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany('UPDATE missions SET downloaded = ?, size = ?, updated = ? '
+                                   "WHERE id = ? AND state = 'running' AND (? IS NULL OR worker = ?)",
+                                   [(d, s, now, i, worker, worker) for i, d, s in progress])
+            lost = [] if worker is None else [
+                i for i, _, _ in progress
+                if self._conn.execute("SELECT 1 FROM missions WHERE id = ? AND state = 'running' AND worker = ?",
+                                      (i, worker)).fetchone() is None]
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        return lost
+
+    def finish(self, ID, result, info, path=None, size=None, downloaded=0, worker=None):
+        """记录任务结果，任务已被重新放回队列（可能已由其它进程领取）时不记录
+        :param ID: 任务id
+        :param result: 任务结果
+        :param info: 任务信息
+        :param path: 文件保存路径
+        :param size: 文件大小
+        :param downloaded: 已下载字节数
+        :param worker: 执行进程名称，不为None时只记录由该进程领取的任务
+        :return: 是否已记录
+        """
+        cur = self._conn.execute("UPDATE missions SET state = 'done', result = ?, info = ?, path = ?, size = ?, "
+                                 "downloaded = ?, updated = ? WHERE id = ? AND state = 'running' "
+                                 'AND (? IS NULL OR worker = ?)',
+                                 (str(result), str(info), None if path is None else str(path), size, downloaded,
+                                  time(), ID, worker, worker))
+        return cur.rowcount > 0
+
+    def requeue_stale(self, seconds):
+        """把长时间未更新的运行中任务重新放回等待状态，用于执行进程意外退出的情况
+        :param seconds: 超过多少秒未更新视为失效
+        :return: 重新放回的任务数
+        """
+        cur = self._conn.execute("UPDATE missions SET state = 'waiting', worker = NULL, downloaded = 0 "
+                                 "WHERE state = 'running' AND updated < ?", (time() - seconds,))
+        return cur.rowcount
+
+    def progress(self):
+        """返回所有任务的汇总进度"""
+        r = self._conn.execute('SELECT '
+                               "SUM(state = 'waiting'), SUM(state = 'running'), SUM(state = 'done'), "
+                               "SUM(state = 'done' AND result = 'False'), "
+                               'SUM(downloaded), SUM(size), COUNT(DISTINCT worker) FROM missions').fetchone()
+        return {'waiting': r[0] or 0, 'running': r[1] or 0, 'done': r[2] or 0, 'failed': r[3] or 0,
+                'downloaded': r[4] or 0, 'size': r[5] or 0, 'workers': r[6] or 0}
+
+    def results(self, state=None):
+        """返回任务信息列表
+        :param state: 只返回指定状态的任务，为None返回全部
+        :return: 任务信息dict组成的列表
+        """
+        sql = 'SELECT id, url, state, worker, result, info, path, size, downloaded FROM missions'
+        rows = self._conn.execute(f'{sql} WHERE state = ? ORDER BY id', (state,)).fetchall() if state \
+            else self._conn.execute(f'{sql} ORDER BY id').fetchall()
+        keys = ('id', 'url', 'state', 'worker', 'result', 'info', 'path', 'size', 'downloaded')
+        return [dict(zip(keys, r)) for r in rows]
+
+    def close(self):
+        """关闭数据库连接"""
+        self._conn.close()
+
+
+def run_worker(queue_path, goal_path='.', roads=10, block_size='50M', idle_timeout=10, name=None):
+    """执行进程函数，从共享队列领取任务并下载，直到队列空闲超过指定时间
+    :param queue_path: 队列数据库文件路径
+    :param goal_path: 默认保存路径
+    :param roads: 本进程可同时运行的线程数
+    :param block_size: 分块大小
+    :param idle_timeout: 队列为空多少秒后退出，为0时不退出
+    :param name: 进程名称，用于标记任务由谁执行
+    :return: None
+    """
+    name = name or f'{gethostname()}-{getpid()}'
+    queue = SQLiteQueue(queue_path)
+    kit = DownloadKit(goal_path, roads=roads)
+    kit.set.block_size(block_size)
+    running = {}
+    idle_since = perf_counter()
+
+    try:
+        while True:
+            rows = queue.take(name, roads * 2 - len(running))
+            for row in rows:
+                if row['id'] in running:  # 本进程的任务被重新放回队列后又由本进程领取
+                    running.pop(row['id']).cancel(False)
+                mission = kit.add(row['url'], goal_path=row['goal_path'], rename=row['rename'],
+                                  file_exists=row['file_exists'], split=row['split'], **row['kwargs'])
+                running[row['id']] = mission
+
+            progress = []
+            for ID, mission in list(running.items()):
+                downloaded = mission.downloaded_size
+                if mission.is_done:
+                    queue.finish(ID, mission.result, mission.info, mission.path, mission.size, downloaded, name)
+                    running.pop(ID)
+                else:
+                    progress.append((ID, downloaded, mission.size))
+            for ID in queue.report(progress, name):  # 已被重新放回队列的任务由其它进程接手，文件也归其所有
+                running.pop(ID).cancel(False)
+
+            if running or rows:
+                idle_since = perf_counter()
+            elif idle_timeout and perf_counter() - idle_since > idle_timeout:
+                break
+            sleep(.5)
+
+    finally:
+        for mission in running.values():
+            mission.cancel()
+        queue.close()
+
+
+class Cluster(object):
+    def __init__(self, queue_path, workers=None, goal_path='.', roads=10, block_size='50M', stale_timeout=120):
+        """多进程下载协调器，任务保存在共享队列中，由本机多个执行进程领取执行
+        本机其它进程可用 python -m DownloadKit.cluster 命令连接同一队列文件参与执行，队列文件不能放在网络文件系统上
+        :param queue_path: 队列数据库文件路径
+        :param workers: 本机启动的执行进程数，为None时使用cpu核数
+        :param goal_path: 默认保存路径
+        :param roads: 每个执行进程可同时运行的线程数
+        :param block_size: 分块大小
+        :param stale_timeout: 运行中任务超过多少秒未更新进度则重新放回队列
+        """
+        self._queue = SQLiteQueue(queue_path)
+        self._workers_num = workers or cpu_count()
+        self._goal_path = str(goal_path)
+        self._roads = roads
+        self._block_size = block_size
+        self._stale_timeout = stale_timeout
+        self._processes = []
+
+    @property
+    def queue(self):
+        """返回共享队列对象"""
+        return self._queue
+
+    @property
+    def is_running(self):
+        """返回是否还有未完成的任务"""
+        p = self._queue.progress()
+        return p['waiting'] + p['running'] > 0
+
+    def add(self, file_url, goal_path=None, rename=None, file_exists=None, split=None, **kwargs):
+        """添加一个下载任务并返回其id
+        :param file_url: 文件网址
+        :param goal_path: 保存路径
+        :param rename: 重命名的文件名
+        :param file_exists: 遇到同名文件时的处理方式，可选 'skip', 'overwrite', 'rename', 'add'，默认跟随执行进程
+        :param split: 是否允许多线程分块下载，默认跟随执行进程
+        :param kwargs: 连接参数，须能转换为json
+        :return: 任务id
+        """
+        return self._queue.put(file_url, goal_path, rename, file_exists, split, kwargs)
+
+    def start(self, idle_timeout=10):
+        """启动本机执行进程
+        :param idle_timeout: 执行进程在队列为空多少秒后退出
+        :return: None
+        """
+        for i in range(self._workers_num - len([p for p in self._processes if p.is_alive()])):
+            p = Process(target=run_worker, args=(self._queue.path, self._goal_path, self._roads,
+                                                 self._block_size, idle_timeout), daemon=True)
+            p.start()
+            self._processes.append(p)
+
+    def progress(self):
+        """返回汇总进度，包括各状态任务数、已下载字节数和已知总大小"""
+        return self._queue.progress()
+
+    def results(self, state=None):
+        """返回任务信息列表
+        :param state: 只返回指定状态的任务，可选 'waiting', 'running', 'done'，为None返回全部
+        :return: 任务信息dict组成的列表
+        """
+        return self._queue.results(state)
+
+    def wait(self, show=False, timeout=None):
+        """等待所有任务完成
+        :param show: 是否显示进度
+        :param timeout: 超时时间，None或0为无限
+        :return: 是否全部完成
+        """
+        end_time = perf_counter() + timeout if timeout else None
+        while True:
+            self._queue.requeue_stale(self._stale_timeout)
+            p = self._queue.progress()
+            if show:
+                rate = round(p['downloaded'] / p['size'] * 100, 2) if p['size'] else 0
+                print(f'\r等待：{p["waiting"]} 运行：{p["running"]} 完成：{p["done"]} 失败：{p["failed"]} '
+                      f'执行进程：{p["workers"]} {rate}%', end='')
+
+            if p['waiting'] + p['running'] == 0:
+                if show:
+                    print()
+                return True
+            if self._processes and not any(i.is_alive() for i in self._processes):
+                self.start()
+            if end_time and perf_counter() > end_time:
+                if show:
+                    print()
+                return False
+            sleep(.5)
+
+    def stop(self):
+        """结束本机执行进程，未完成的任务会在超时后重新放回队列"""
+        for p in self._processes:
+            if p.is_alive():
+                p.terminate()
+        for p in self._processes:
+            p.join()
+        self._processes = []
+
+
+def main(args=None):
+    """命令行启动执行进程"""
+    from argparse import ArgumentParser
+    parser = ArgumentParser(prog='python -m DownloadKit.cluster', description='连接本机的共享队列并执行下载任务。')
+    parser.add_argument('queue', help='队列数据库文件路径')
+    parser.add_argument('-p', '--goal-path', default='.', help='默认保存路径')
+    parser.add_argument('-r', '--roads', type=int, default=10, help='可同时运行的线程数')
+    parser.add_argument('-b', '--block-size', default='50M', help='分块大小')
+    parser.add_argument('--idle-timeout', type=float, default=0, help='队列为空多少秒后退出，0为不退出')
+    args = parser.parse_args(args)
+    run_worker(args.queue, args.goal_path, args.roads, args.block_size, args.idle_timeout)
+
+
+if __name__ == '__main__':
+    main()
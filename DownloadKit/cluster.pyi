@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from multiprocessing import Process
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Union, Optional, List, Literal
+
+FILE_EXISTS = Literal['add', 'skip', 'rename', 'overwrite']
+
+
+class SQLiteQueue(object):
+    _path: str = ...
+    _conn: Connection = ...
+
+    def __init__(self, path: Union[str, Path], timeout: float = 30): ...
+
+    @property
+    def path(self) -> str: ...
+
+    def put(self,
+            file_url: str,
+            goal_path: Union[str, Path, None] = None,
+            rename: Optional[str] = None,
+            file_exists: Optional[FILE_EXISTS] = None,
+            split: Optional[bool] = None,
+            kwargs: Optional[dict] = None) -> int: ...
+
+    def take(self, worker: str, num: int = 1) -> List[dict]: ...
+
+    def report(self, progress: List[tuple], worker: Optional[str] = None) -> List[int]: ...
+
+    def finish(self,
+               ID: int,
+               result: Union[str, bool, None],
+               info: str,
+               path: Union[str, Path, None] = None,
+               size: Optional[int] = None,
+               downloaded: int = 0,
+               worker: Optional[str] = None) -> bool: ...
+
+    def requeue_stale(self, seconds: float) -> int: ...
+
+    def progress(self) -> dict: ...
+
+    def results(self, state: Optional[str] = None) -> List[dict]: ...
+
+    def close(self) -> None: ...
+
+
+def run_worker(queue_path: Union[str, Path],
+               goal_path: Union[str, Path] = '.',
+               roads: int = 10,
+               block_size: Union[str, int] = '50M',
+               idle_timeout: float = 10,
+               name: Optional[str] = None) -> None: ...
+
+
+class Cluster(object):
+    _queue: SQLiteQueue = ...
+    _workers_num: int = ...
+    _goal_path: str = ...
+    _roads: int = ...
+    _block_size: Union[str, int] = ...
+    _stale_timeout: float = ...
+    _processes: List[Process] = ...
+
+    def __init__(self,
+                 queue_path: Union[str, Path],
+                 workers: Optional[int] = None,
+                 goal_path: Union[str, Path] = '.',
+                 roads: int = 10,
+                 block_size: Union[str, int] = '50M',
+                 stale_timeout: float = 120): ...
+
+    @property
+    def queue(self) -> SQLiteQueue: ...
+
+    @property
+    def is_running(self) -> bool: ...
+
+    def add(self,
+            file_url: str,
+            goal_path: Union[str, Path, None] = None,
+            rename: Optional[str] = None,
+            file_exists: Optional[FILE_EXISTS] = None,
+            split: Optional[bool] = None,
+            **kwargs) -> int: ...
+
+    def start(self, idle_timeout: float = 10) -> None: ...
+
+    def progress(self) -> dict: ...
+
+    def results(self, state: Optional[str] = None) -> List[dict]: ...
+
+    def wait(self, show: bool = False, timeout: Optional[float] = None) -> bool: ...
+
+    def stop(self) -> None: ...
+
+
+def main(args: Optional[list] = None) -> None: ...
@@ -0,0 +1,181 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   delta.py
+"""
+import hashlib
+from itertools import accumulate
+from json import loads
+
+
+class BlockIndex(object):
+    def __init__(self, size, block_size, checksums, hash_name, checksum_bytes=None, rsums=None, rsum_bytes=4,
+                 file_hash=None, file_name=None, url=None):
+        """目标文件的分块校验信息
+        :param size: 文件大小
+        :param block_size: 分块大小
+        :param checksums: 每块的校验值（bytes）列表
+        :param hash_name: 校验算法，hashlib支持的名称
+        :param checksum_bytes: 校验值只取前多少字节，None为全部
+        :param rsums: zsync的每块弱校验值列表，强校验算法不可用时使用
+        :param rsum_bytes: 弱校验值字节数
+        :param file_hash: (算法, 十六进制值)，整个文件的校验值
+        :param file_name: 文件名
+        :param url: 文件url
+        """
+        self.size = size
+        self.block_size = block_size
+        self.checksums = checksums
+        self.hash_name = hash_name
+        self.checksum_bytes = checksum_bytes
+        self.rsums = rsums
+        self.rsum_bytes = rsum_bytes
+        self.file_hash = file_hash
+        self.file_name = file_name
+        self.url = url
+        self.pad = False  # 最后一块是否补0到完整块大小再计算
+        try:
+            hashlib.new(hash_name)
+            self._strong = True
+        except ValueError:  # 如OpenSSL 3默认不提供md4
+            if rsums is None:
+                raise ValueError(f'不支持的校验算法：{hash_name}')
+            self._strong = False
+
+    @property
+    def blocks_count(self):
+        """返回分块数"""
+        return len(self.checksums)
+
+    def block_range(self, ind):
+        """返回一个分块在文件中的位置
+        :param ind: 分块序号
+        :return: [开始, 结束]，结束位置包含在内
+        """
+        start = ind * self.block_size
+        return [start, min(start + self.block_size, self.size) - 1]
+
+    def key(self, data):
+        """计算一块数据用于比较的校验值
+        :param data: 块数据
+        :return: 校验值
+        """
+        if self.pad and len(data) < self.block_size:
+            data = data + b'\x00' * (self.block_size - len(data))
+        if self._strong:
+            h = hashlib.new(self.hash_name, data).digest()
+            return h[:self.checksum_bytes] if self.checksum_bytes else h
+        return _rsum(data)[4 - self.rsum_bytes:]
+
+    def expected(self, ind):
+        """返回一个分块应有的校验值
+        :param ind: 分块序号
+        :return: 校验值
+        """
+        return self.checksums[ind] if self._strong else self.rsums[ind]
+
+    def match(self, path):
+        """按块比较本地文件，找出可直接使用的块
+        :param path: 本地文件路径
+        :return: 与各分块数据相同的本地文件位置列表，没有相同数据的块为None
+        """
+        wanted = {}
+        for ind in range(self.blocks_count):
+            wanted.setdefault(self.expected(ind), []).append(ind)
+
+        result = [None] * self.blocks_count
+        with open(path, 'rb') as f:
+            pos = 0
+            while True:
+                data = f.read(self.block_size)
+                if not data:
+                    break
+                for ind in wanted.get(self.key(data), ()):  # 数据块移动到其它对齐位置时也能使用
+                    start, end = self.block_range(ind)
+                    if result[ind] is None and (end - start + 1 == len(data) or self.pad):
+                        result[ind] = pos
+                pos += len(data)
+        return result
+
+    def check_file(self, path):
+        """校验整个文件
+        :param path: 文件路径
+        :return: 是否一致，没有整个文件的校验值时返回None
+        """
+        if not self.file_hash:
+            return None
+        name, value = self.file_hash
+        h = hashlib.new(name)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(1048576)
+                if not data:
+                    break
+                h.update(data)
+        return h.hexdigest().lower() == value.lower()
+
+
+def load_index(content):
+    """解析.zsync控制文件或json格式的分块校验文件
+    json格式：{"size": 文件大小, "block_size": 分块大小, "hash": "sha1", "blocks": [每块校验值十六进制],
+              "file_hash": ["sha256", "整个文件校验值"], "name": 文件名}
+    :param content: 文件内容bytes
+    :return: BlockIndex对象
+    """
+    if content.startswith(b'zsync:'):
+        return _load_zsync(content)
+
+    data = loads(content.decode('utf-8'))
+    file_hash = data.get('file_hash', None)
+    return BlockIndex(int(data['size']), int(data['block_size']),
+                      [bytes.fromhex(i) for i in data['blocks']],
+                      data.get('hash', 'sha1'),
+                      file_hash=tuple(file_hash) if file_hash else None,
+                      file_name=data.get('name', None),
+                      url=data.get('url', None))
+
+
+def _load_zsync(content):
+    """解析.zsync控制文件
+    :param content: 文件内容bytes
+    :return: BlockIndex对象
+    """
+    headers = {}
+    pos = 0
+    while True:
+        end = content.index(b'\n', pos)
+        line = content[pos:end].decode('utf-8').rstrip('\r')
+        pos = end + 1
+        if not line:
+            break
+        k, v = line.split(':', 1)
+        headers[k.strip().lower()] = v.strip()
+
+    size = int(headers['length'])
+    block_size = int(headers['blocksize'])
+    seq, rsum_bytes, checksum_bytes = (int(i) for i in headers.get('hash-lengths', '1,4,16').split(','))
+    count = (size + block_size - 1) // block_size
+    step = rsum_bytes + checksum_bytes
+    rsums, checksums = [], []
+    for i in range(count):
+        item = content[pos + i * step:pos + (i + 1) * step]
+        rsums.append(item[:rsum_bytes])
+        checksums.append(item[rsum_bytes:])
+
+    index = BlockIndex(size, block_size, checksums, 'md4', checksum_bytes, rsums, rsum_bytes,
+                       file_hash=('sha1', headers['sha-1']) if 'sha-1' in headers else None,
+                       file_name=headers.get('filename', None),
+                       url=headers.get('url', None))
+    index.pad = True
+    return index
+
+
+def _rsum(data):
+    """计算zsync的弱校验值
+    :param data: 块数据
+    :return: 4字节校验值
+    """
+    a = sum(data) & 0xffff
+    b = sum(accumulate(data)) & 0xffff
+    return bytes((a >> 8, a & 0xff, b >> 8, b & 0xff))
@@ -0,0 +1,56 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+
+class BlockIndex(object):
+    size: int = ...
+    block_size: int = ...
+    checksums: List[bytes] = ...
+    hash_name: str = ...
+    checksum_bytes: Optional[int] = ...
+    rsums: Optional[List[bytes]] = ...
+    rsum_bytes: int = ...
+    file_hash: Optional[Tuple[str, str]] = ...
+    file_name: Optional[str] = ...
+    url: Optional[str] = ...
+    pad: bool = ...
+    _strong: bool = ...
+
+    def __init__(self,
+                 size: int,
+                 block_size: int,
+                 checksums: List[bytes],
+                 hash_name: str,
+                 checksum_bytes: Optional[int] = None,
+                 rsums: Optional[List[bytes]] = None,
+                 rsum_bytes: int = 4,
+                 file_hash: Optional[Tuple[str, str]] = None,
+                 file_name: Optional[str] = None,
+                 url: Optional[str] = None): ...
+
+    @property
+    def blocks_count(self) -> int: ...
+
+    def block_range(self, ind: int) -> List[int]: ...
+
+    def key(self, data: bytes) -> bytes: ...
+
+    def expected(self, ind: int) -> bytes: ...
+
+    def match(self, path: Union[str, Path]) -> List[Optional[int]]: ...
+
+    def check_file(self, path: Union[str, Path]) -> Optional[bool]: ...
+
+
+def load_index(content: bytes) -> BlockIndex: ...
+
+
+def _load_zsync(content: bytes) -> BlockIndex: ...
+
+
+def _rsum(data: bytes) -> bytes: ...
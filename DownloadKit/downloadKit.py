@@ -5,18 +5,35 @@
 @File    :   downloadKit.py
 """
 from copy import copy
+from datetime import datetime
+from functools import partial
+from os import replace
 from pathlib import Path
 from queue import Queue
 from re import sub
+from shutil import copyfileobj
+from tempfile import TemporaryFile
 from threading import Thread, Lock
 from time import sleep, perf_counter
+from urllib.parse import urlparse, unquote
 
 from requests import Response
+from requests.exceptions import RequestException
 from requests.structures import CaseInsensitiveDict
 
-from ._funcs import FileExistsSetter, PathSetter, BlockSizeSetter, set_charset, get_file_info
+from ._funcs import (FileExistsSetter, PathSetter, BlockSizeSetter, FileNames, ByteCounter, CookiesCache,
+                     set_charset, get_file_info, get_full_name, read_small, save_file, _get_file_name,
+                     _url_file_name)
 from .mission import Task, Mission
+from .postprocess import PostProcessor
+from .protocols import default_handlers
+from .delta import load_index
+from .encoding import get_encoding, iter_body
+from .extract import archive_kind, extract_tar, extract_zip, ResponseStream, RangeFile, ExtractStopped
+from .ranges import range_header, resolve_ranges, merge_ranges, read_parts, cut_parts
 from .setter import Setter
+from .store import StreamHasher
+from .transport import RequestsTransport
 
 
 class DownloadKit(object):
@@ -36,14 +53,35 @@ class DownloadKit(object):
         self._threads = {i: None for i in range(self._roads)}
         self._waiting_list = Queue()
         self._missions_num = 0
-        self._running_count = 0  # 正在运行的任务数
+        self._running_count = ByteCounter()  # 正在运行的任务数
+        self._done_count = ByteCounter()  # 已结束的任务数
+        self._total_size = ByteCounter()  # 已知大小的任务总字节数
+        self._counter = ByteCounter()  # 已接收字节数
         self._stop_printing = False  # 用于控制显示线程停止
         self._lock = Lock()
+        self._print_lock = Lock()
+        self._file_names = FileNames()
         self.page = None
         self._retry = None
         self._interval = None
         self._timeout = None
         self._copy_cookies = False
+        self._check_etag = False
+        self._cookies_cache = CookiesCache(self)
+        self._transport = RequestsTransport()
+        self._writer = None
+        self._small_file_size = 65536
+        self._tracer = None
+        self._disk_space = None
+        self._proxy_pool = None
+        self._prefetcher = None
+        self._post_processor = None
+        self._encoding_mode = 'decode'  # 压缩响应的处理方式
+        self._decompress = False  # 'raw'模式下载成功后是否解压文件
+        self._protocols = default_handlers()  # 非http协议的处理器
+        self._store = None  # 内容仓库
+        self._volumes = None  # 多个存储卷
+        self._memory = None  # 全局内存额度
 
         self._setter = None
         self._print_mode = None
@@ -124,31 +162,64 @@ class DownloadKit(object):
     @property
     def is_running(self):
         """返回是否有线程还在运行"""
-        return self._running_count > 0
+        return self._running_count.value > 0
 
     @property
     def missions(self):
         """用list方式返回所有任务对象"""
         return self._missions
 
-    def add(self, file_url, goal_path=None, rename=None, file_exists=None, split=None, **kwargs):
+    def progress(self):
+        """返回所有任务的进度快照，包括各状态任务数、已知总大小、已接收字节数、速度（字节/秒）和预计剩余秒数"""
+        downloaded = self._counter.value
+        total = self._total_size.value
+        speed = self._counter.speed() if self.is_running else None
+        eta = (total - downloaded) / speed if speed and total > downloaded else None
+        return {'missions': self._missions_num,
+                'waiting': self._waiting_list.qsize(),
+                'running': self._running_count.value,
+                'done': self._done_count.value,
+                'size': total,
+                'downloaded': downloaded,
+                'speed': speed,
+                'eta': eta}
+
+    def add(self, file_url, goal_path=None, rename=None, file_exists=None, split=None,
+            ranges=None, to_memory=False, delta=None, then=None, extract=False, **kwargs):
         """添加一个下载任务并将其返回
-        :param file_url: 文件网址
+        :param file_url: 文件网址，传入list或tuple时第一个为主地址，其余为镜像，分块会按速度分配到各个地址
         :param goal_path: 保存路径
         :param rename: 重命名的文件名
         :param file_exists: 遇到同名文件时的处理方式，可选 'skip', 'overwrite', 'rename', 'add'，默认跟随实例属性
         :param split: 是否允许多线程分块下载，为None则使用对象属性
+        :param ranges: 只下载指定的数据范围，(开始, 结束)组成的列表，结束位置包含在内，为None表示到文件末尾，
+                       开始为负数表示文件最后多少字节
+        :param to_memory: 指定ranges时，是否把数据保存在任务对象的content属性中而不写入文件
+        :param delta: 分块校验文件（.zsync或json格式）的url、路径或内容，指定后只下载与本地同名文件不同的块，
+                      本地文件不存在时下载整个文件
+        :param then: 下载成功后处理文件的函数，接收文件路径，在set.post_process()设置的进程池中执行，
+                     未设置时在线程池中执行，返回值保存在任务对象的post_result属性，为None时使用set.post_process()设置的函数
+        :param extract: 是否边下载边解压tar或zip文件，压缩包本身不保存，为True时解压到保存路径，
+                        传入str时解压到保存路径下的该文件夹
         :param kwargs: 连接参数
         :return: 任务对象
         """
-        self._missions_num += 1
-        self._running_count += 1
-        mission = Mission(self._missions_num, self, file_url,
+        volume_sub = None
+        if self._volumes is not None and (goal_path is None or not Path(goal_path).is_absolute()):
+            volume_sub = str(goal_path or '')  # 开始下载时再选择卷，相对路径保存在卷文件夹下
+            goal_path = self._volumes.roots[0] / volume_sub
+
+        with self._lock:
+            self._missions_num += 1
+            ID = self._missions_num
+        self._running_count.add(1)
+        mission = Mission(ID, self, file_url,
                           str(goal_path or self.goal_path),
                           rename, file_exists or self.file_exists,
                           self.split if split is None else split,
-                          kwargs)
-        self._missions[self._missions_num] = mission
+                          kwargs, ranges, to_memory, delta, then, extract)
+        mission._volume_sub = volume_sub
+        self._missions[ID] = mission
         self._run_or_wait(mission)
         return mission
 
@@ -202,11 +273,29 @@ class DownloadKit(object):
                     break
 
             self._threads[ID]['mission'] = mission
+            if self._tracer is not None:
+                self._tracer.set_road(ID)
             self._download(mission, ID)
             mission = None
 
         self._threads[ID] = None
 
+    def refresh_cookies(self):
+        """清除缓存的页面cookies和user agent，之后的任务会重新从页面对象获取"""
+        self._cookies_cache.clear()
+
+    def proxy_stats(self):
+        """返回代理池中各代理的速度、出错次数、正在使用数、累计字节数和是否已停用，未设置代理池时返回None"""
+        return None if self._proxy_pool is None else self._proxy_pool.stats
+
+    def volume_stats(self):
+        """返回各存储卷的剩余空间、正在写入的任务数和测得的速度，未设置多个存储卷时返回None"""
+        return None if self._volumes is None else self._volumes.stats()
+
+    def memory_stats(self):
+        """返回内存额度、已使用和峰值字节数、等待和强制写入次数，未设置内存额度时返回None"""
+        return None if self._memory is None else self._memory.stats()
+
     def get_mission(self, mission_or_id):
         """根据id值获取一个任务
         :param mission_or_id: 任务或任务id
@@ -230,18 +319,31 @@ class DownloadKit(object):
             return self.get_mission(mission).wait(show, timeout)
 
         else:
+            end_time = perf_counter() + timeout
             if show:
                 self.show(False)
             else:
-                end_time = perf_counter() + timeout
-                while self.is_running or (perf_counter() < end_time or timeout == 0):
+                while self.is_running and (perf_counter() < end_time or timeout == 0):
                     sleep(0.1)
 
+            if self._post_processor is not None:  # 等待下载后处理结束
+                self._post_processor.wait(None if timeout == 0 else max(0., end_time - perf_counter()))
+
     def cancel(self):
         """取消所有等待中或执行中的任务"""
         for m in self._missions.values():
             m.cancel()
 
+    def pause_all(self):
+        """暂停所有未结束的任务，已下载的数据保留，线程可用于之后添加的任务"""
+        for m in list(self._missions.values()):
+            m.pause()
+
+    def resume_all(self):
+        """继续所有已暂停的任务"""
+        for m in list(self._missions.values()):
+            m.resume()
+
     def show(self, asyn=True, keep=False):
         """实时显示所有线程进度
         :param asyn: 是否以异步方式显示
@@ -288,11 +390,12 @@ class DownloadKit(object):
 
         print()
 
-    def _connect(self, url, session, method, **kwargs):
+    def _connect(self, url, session, method, mission=None, **kwargs):
         """生成response对象
         :param url: 目标url
         :param session: 用于连接的Session对象
         :param method: 请求方式
+        :param mission: 所属任务对象，用于记录重试次数
         :param kwargs: 连接参数
         :return: tuple，第一位为Response或None，第二位为出错信息或'Success'
         """
@@ -300,14 +403,21 @@ class DownloadKit(object):
             kwargs['headers'] = CaseInsensitiveDict(kwargs['headers'])
         else:
             kwargs['headers'] = CaseInsensitiveDict()
+        if self._encoding_mode == 'identity':  # 请求不压缩的数据，使分块位置和文件大小可靠
+            kwargs['headers']['Accept-Encoding'] = 'identity'
 
         r = err = None
+        synced = False
         for i in range(self.retry + 1):
             try:
-                if method == 'get':
-                    r = session.get(url, **kwargs)
-                elif method == 'post':
-                    r = session.post(url, **kwargs)
+                r = self._request(url, session, method, **kwargs)
+                if r is not None and r.status_code in (401, 403) and self.page is not None and not synced:
+                    # 页面登录状态可能已改变，重新同步cookies后立即再试一次
+                    synced = True
+                    r.close()
+                    self._cookies_cache.clear()
+                    self._cookies_cache.set_session(session)
+                    r = self._request(url, session, method, **kwargs)
 
                 if r:
                     return set_charset(r), 'Success'
@@ -315,10 +425,12 @@ class DownloadKit(object):
             except Exception as e:
                 err = e
 
-            if r and r.status_code in (403, 404):
+            if r is not None and r.status_code in (403, 404):
                 break
             if i < self.retry:
                 sleep(self.interval)
+                if mission is not None:
+                    mission.retries += 1
 
         # 返回失败结果
         if r is None:
@@ -326,6 +438,48 @@ class DownloadKit(object):
         if not r.ok:
             return r, f'状态码：{r.status_code}'
 
+    def _request(self, url, session, method, **kwargs):
+        """通过传输层发送一次请求
+        :param url: 目标url
+        :param session: 用于连接的Session对象
+        :param method: 请求方式
+        :param kwargs: 连接参数
+        :return: Response对象
+        """
+        handler = self._protocols.get(url.split(':', 1)[0].lower(), None)
+        if handler is not None:  # file://、ftp://、s3://等由协议处理器使用原生客户端
+            return handler.request(url, session, method, **kwargs)
+        if self._proxy_pool is None:
+            return self._transport.request(url, session, method, **kwargs)
+
+        lease = self._proxy_pool.acquire()
+        if lease is None:
+            raise ConnectionError('没有可用的代理')
+        kwargs['proxies'] = {'http': lease.proxy, 'https': lease.proxy}
+        try:
+            r = self._transport.request(url, session, method, **kwargs)
+        except Exception:
+            lease.done(0, False)
+            raise
+
+        if r.ok:  # 传输结束后再归还
+            r._proxy_lease = lease
+        else:
+            lease.done(0, r.status_code not in self._proxy_pool.ERROR_CODES)
+        return r
+
+    @staticmethod
+    def _proxy_done(r, size, success=True):
+        """使用代理池时，传输结束后归还响应所用的代理
+        :param r: Response对象
+        :param size: 传输的字节数
+        :param success: 是否成功
+        :return: None
+        """
+        lease = getattr(r, '_proxy_lease', None)
+        if lease is not None:
+            lease.done(size, success)
+
     def _get_usable_thread(self):
         """获取可用线程，没有则返回None"""
         for k, v in self._threads.items():
@@ -342,17 +496,97 @@ class DownloadKit(object):
         :param mission: 完结的任务
         :return: None
         """
-        self._running_count -= 1
         if self._print_mode == 'all' or (self._print_mode == 'failed' and mission.result is False):
-            print(f'[{mission.RESULT_TEXTS[mission.result]}] {mission.data.url} {mission.info}')
+            with self._print_lock:
+                print(f'[{mission.RESULT_TEXTS[mission.result]}] {mission.data.url} {mission.info}')
 
         if self._log_mode == 'all' or (self._log_mode == 'failed' and mission.result is False):
-            data = ('下载结果',
-                    mission.data.url,
-                    mission.data.goal_path,
-                    mission.data.rename,
-                    mission.data.kwargs)
-            self._logger.add_data(data)
+            self._logger.add(self._log_record(mission, '下载结果'))
+
+        self._trace('mission', mission, mission._add_time, mission._end_time,
+                    result=mission.result, bytes=mission.downloaded_size, url=mission.data.url)
+
+        if self._disk_space is not None:
+            for m in self._disk_space.release(mission):
+                self._run_or_wait(m)
+        if self._volumes is not None:
+            for m in self._volumes.release(mission):
+                self._run_or_wait(m)
+
+        if mission.result == 'success' and mission.path is not None:
+            processor = self._post_processor
+            func = mission.data.then or (processor.func if processor is not None else None)
+            if func is not None:  # 处理队列已满时在此等待，使下载不会远快于处理
+                if processor is None:
+                    with self._lock:  # 未设置时用线程池，then可以是lambda等不能传给子进程的函数
+                        if self._post_processor is None:
+                            self._post_processor = PostProcessor(kind='thread')
+                        processor = self._post_processor
+                try:
+                    processor.submit(mission, func)
+                except Exception as e:
+                    mission.info = f'{mission.info} 处理失败 {e}'
+
+        self._running_count.add(-1)
+        self._done_count.add(1)
+
+    def _trace(self, phase, item, start, end=None, **args):
+        """开启阶段记录时记录一个阶段
+        :param phase: 阶段名称
+        :param item: 所属Mission或Task对象
+        :param start: 开始时间
+        :param end: 结束时间，为None时为当前时间
+        :param args: 附加信息
+        :return: None
+        """
+        if self._tracer is not None:
+            self._tracer.add(phase, item, start, end, **args)
+
+    def _trace_curl(self, response, item):
+        """开启阶段记录时记录pycurl连接的细分阶段
+        :param response: 响应对象
+        :param item: 所属Mission或Task对象
+        :return: None
+        """
+        if self._tracer is not None:
+            self._tracer.add_curl_phases(response, item)
+
+    def export_trace(self, path, fmt='chrome'):
+        """导出记录的各阶段时间，须先用set.trace()开启记录
+        :param path: 保存文件路径
+        :param fmt: 'chrome'为Chrome trace事件格式，'json'为阶段记录列表
+        :return: 文件路径
+        """
+        if self._tracer is None:
+            raise RuntimeError('未开启阶段记录，请先使用set.trace(True)。')
+        return self._tracer.export(path, fmt)
+
+    @staticmethod
+    def _log_record(mission, event):
+        """生成一条日志记录
+        :param mission: 任务对象
+        :param event: 事件名称
+        :return: 记录内容dict
+        """
+        duration = speed = None
+        if mission._start_time is not None:
+            duration = (mission._end_time or perf_counter()) - mission._start_time
+            speed = round(mission.downloaded_size / duration, 2) if duration else None
+            duration = round(duration, 3)
+        return {'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'event': event,
+                'id': mission.id,
+                'url': mission.data.url,
+                'result': mission.result,
+                'info': str(mission.info),
+                'path': None if mission.path is None else str(mission.path),
+                'size': mission.size,
+                'bytes': mission.downloaded_size,
+                'duration': duration,
+                'speed': speed,
+                'retries': mission.retries,
+                'goal_path': mission.data.goal_path,
+                'rename': mission.data.rename}
 
     def _download(self, mission_or_task, thread_id):
         """此方法是执行下载的线程方法，用于根据任务下载文件
@@ -365,17 +599,56 @@ class DownloadKit(object):
         if mission_or_task.state == 'cancel':
             mission_or_task.state = 'done'
             return
+        mission = mission_or_task.mission if isinstance(mission_or_task, Task) else mission_or_task
+        if mission._paused:  # 已暂停的任务停下，让出线程
+            mission._park(mission_or_task)
+            return
 
         file_url = mission_or_task.data.url
 
         if isinstance(mission_or_task, Task):
-            kwargs = copy(mission_or_task.data.kwargs)
             task = mission_or_task
-            kwargs['headers']['Range'] = f"bytes={task.range[0]}-{task.range[1]}"
-            r, inf = self._connect(file_url, task.mission.session, task.mission.method, **kwargs)
+            self._trace('queue', task, task._queue_time)
+            if task.mission.mirrors and task.range is not None:
+                t = perf_counter()
+                self._download_from_mirrors(task)
+                self._trace('transfer', task, t, bytes=task._downloaded_size)
+                return
+
+            kwargs = copy(task.data.kwargs)
+            kwargs['headers'] = CaseInsensitiveDict(kwargs['headers'])
+            if task.range is None and task._downloaded_size and task.mission.content_encoding \
+                    and self._encoding_mode != 'raw':
+                task._add_size(-task._downloaded_size)  # 已解压的数据与压缩数据的位置不对应，从头下载
+            if task.range is not None:  # 从已下载的位置继续
+                kwargs['headers']['Range'] = f"bytes={task.range[0] + task._downloaded_size}-{task.range[1]}"
+            elif task._downloaded_size:  # 暂停后继续的不分块任务
+                kwargs['headers']['Range'] = f'bytes={task._downloaded_size}-'
+            t = perf_counter()
+            r, inf = self._connect(file_url, task.mission.session, task.mission.method, task.mission, **kwargs)
+            self._trace('connect', task, t)
+            skip = 0
+            if r and task.range is None and task._downloaded_size and r.status_code != 206:
+                task._add_size(-task._downloaded_size)  # 服务器不支持续传，从头下载
+            elif r and task.range is not None and r.status_code != 206:
+                if r.status_code != 200 or r.headers.get('Content-Length', None) != str(task.mission.size):
+                    r.close()
+                    self._proxy_done(r, 0)
+                    task._set_done(False, f'服务器不支持分块下载。{r.status_code}')
+                    return
+                skip = task.range[0] + task._downloaded_size  # 服务器忽略了Range，返回整个文件，丢弃分块之前的数据
+            elif r and task.range is not None and get_encoding(r) != task.mission.content_encoding:
+                r.close()
+                self._proxy_done(r, 0)
+                task._set_done(False, f'分块的压缩方式与文件不一致：{get_encoding(r)}')
+                return
 
             if r:
-                _do_download(r, task, False)
+                t = perf_counter()
+                retry = _do_download(r, task, False, skip=skip)
+                self._proxy_done(r, task._downloaded_size, task.result is not False and not retry)
+                self._trace('transfer', task, t, bytes=task._downloaded_size)
+                self._trace_curl(r, task)
             else:
                 task._set_done(False, inf)
 
@@ -383,13 +656,34 @@ class DownloadKit(object):
 
         # ===================开始处理mission====================
         mission = mission_or_task
+        if mission._volume_sub is not None and mission._volume is None:
+            # 在所有卷中查找同名文件，已存在时跳过，或使用该文件所在的卷，使覆盖、追加和重命名以它为准
+            root = name = None
+            for name in dict.fromkeys((mission.data.rename, _guess_name(mission))):
+                root = self._volumes.locate(mission._volume_sub, name) if name else None
+                if root is not None:
+                    break
+            if root is not None and mission.data.file_exists == 'skip':
+                mission.file_name = name
+                mission._set_path(root / mission._volume_sub / name)
+                mission._set_done('skipped', str(mission.path))
+                return
+            root = self._volumes.choose(mission, mission.head_info['size'] if mission.head_info else None, root)
+            if root is None:  # 等其它任务写完后重新加入运行
+                mission.set_states(result=None, info='等待存储卷', state='waiting')
+                return
+            mission.data.goal_path = str(root / mission._volume_sub)
+
         mission.info = '下载中'
         mission.state = 'running'
+        mission._start_time = perf_counter()
+        self._trace('queue', mission, mission._add_time, mission._start_time)
         kwargs = mission_or_task.data.kwargs
         if self._print_mode == 'all':
-            print(f'开始下载：{mission.data.url}')
+            with self._print_lock:
+                print(f'开始下载：{mission.data.url}')
         if self._log_mode == 'all':
-            self._logger.add_data(('开始下载', mission.data.url))
+            self._logger.add(self._log_record(mission, '开始下载'))
 
         rename = mission.data.rename
         goal_path = mission.data.goal_path
@@ -400,7 +694,11 @@ class DownloadKit(object):
         # 按windows规则去除路径中的非法字符
         goal_path = goal_Path.anchor + sub(r'[*:|<>?"]', '', goal_path.lstrip(goal_Path.anchor)).strip()
         goal_Path = Path(goal_path).absolute()
-        goal_Path.mkdir(parents=True, exist_ok=True)
+        try:  # 每次都检查，文件夹可能已被其它程序删除
+            goal_Path.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            mission._break_mission(result=False, info=f'写入失败 {e}')
+            return
         goal_path = str(goal_Path)
 
         if file_exists == 'skip' and rename and (goal_Path / rename).exists():
@@ -409,27 +707,143 @@ class DownloadKit(object):
             mission._set_done('skipped', str(mission.path))
             return
 
-        r, inf = self._connect(file_url, mission.session, mission.method, **kwargs)
+        if mission.data.delta:
+            t = perf_counter()
+            if self._download_delta(mission, goal_Path, thread_id):
+                self._trace('transfer', mission, t, bytes=mission.downloaded_size)
+                return
 
+        if mission.data.ranges:
+            t = perf_counter()
+            self._download_ranges(mission, goal_path, thread_id)
+            self._trace('transfer', mission, t, bytes=mission.downloaded_size)
+            return
+
+        t = perf_counter()
+        r, inf = self._connect(file_url, mission.session, mission.method, mission, **kwargs)
+        if not r and mission.mirrors:  # 主地址连接失败时依次尝试镜像
+            for url in mission.mirrors.urls[1:]:
+                if mission.is_done:
+                    break
+                r, inf = self._connect(url, mission.session, mission.method, mission,
+                                       **self._mirror_kwargs(mission, url))
+                if r:
+                    file_url = url
+                    break
+
+        self._trace('connect', mission, t)
         if mission.is_done:
+            if r:
+                r.close()
+                self._proxy_done(r, 0)
             return
 
         if not r:
             mission._break_mission(result=False, info=inf)
             return
 
+        if mission.data.extract:
+            t = perf_counter()
+            self._download_extract(mission, r, file_url, goal_Path, thread_id)
+            self._trace('transfer', mission, t, bytes=mission.downloaded_size)
+            return
+
+        if mission._volume is not None:  # 按服务器给出的文件名再查找一次，同名文件在其它卷上时以它为准
+            name = get_full_name(_get_file_name(r), rename)
+            root = self._volumes.locate(mission._volume_sub, name)
+            if root is not None and root != mission._volume:
+                if file_exists == 'skip':
+                    r.close()
+                    self._proxy_done(r, 0)
+                    mission.file_name = name
+                    mission._set_path(root / mission._volume_sub / name)
+                    mission._set_done('skipped', str(mission.path))
+                    return
+                self._volumes.move(mission, root)
+                mission.data.goal_path = goal_path = str(root / mission._volume_sub)
+                goal_Path = Path(goal_path)
+                goal_path = goal_Path.anchor + sub(r'[*:|<>?"]', '', goal_path.lstrip(goal_Path.anchor)).strip()
+                goal_Path = Path(goal_path).absolute()
+                goal_path = str(goal_Path)
+
+        # -------------------小文件一次读完-------------------
+        t = perf_counter()
+        body = prefix = None
+        if self._small_file_size and file_exists != 'add':
+            try:
+                body, prefix = read_small(r, self._small_file_size, self._encoding_mode == 'raw')
+            except Exception as e:
+                r.close()
+                self._proxy_done(r, 0, False)
+                mission._break_mission(result=False, info=f'下载失败。{r.status_code} {e}')
+                return
+
         # -------------------获取文件信息-------------------
-        file_info = get_file_info(r, goal_path, rename, file_exists, self._lock)
+        try:
+            file_info = get_file_info(r, goal_path, rename, file_exists, self._file_names, body is None)
+        except OSError as e:  # 无权限等原因无法创建文件
+            r.close()
+            self._proxy_done(r, 0)
+            mission._break_mission(result=False, info=f'写入失败 {e}')
+            return
         file_size = file_info['size']
         full_path = file_info['path']
+        mission.content_encoding = get_encoding(r)
+        if mission.content_encoding and self._encoding_mode != 'raw':
+            file_size = None  # Content-Length是压缩数据的大小，与写入的解压数据不同，不能用于分块和检查
         mission._set_path(full_path)
         mission.file_name = full_path.name
         mission.size = file_size
+        if file_size:
+            self._total_size.add(file_size)
+        if mission.mirrors:
+            mission.mirrors.set_reference(file_size, r.headers.get('ETag', None))
 
         if file_info['skip']:
+            r.close()
+            self._proxy_done(r, 0)
             mission._set_done('skipped', str(mission.path))
             return
 
+        mission._etag = r.headers.get('ETag', None)
+        if self._store is not None and file_exists != 'add':  # 仓库中已有相同文件时不下载
+            digest = self._store.lookup(file_size, r.headers)
+            if digest is not None:
+                try:
+                    self._store.link_to(digest, full_path)
+                except Exception:
+                    pass
+                else:
+                    r.close()
+                    self._proxy_done(r, 0)
+                    mission.content_hash = digest
+                    mission.store_hit = True
+                    self._trace('store', mission, t)
+                    mission._set_done('success', str(mission.path))
+                    return
+
+        if body is not None:
+            r.close()
+            self._proxy_done(r, len(body))
+            self._save_small(mission, body)
+            self._trace('transfer', mission, t, bytes=len(body))
+            return
+
+        # -------------------预留硬盘空间-------------------
+        if self._disk_space is not None and file_size:
+            state = self._disk_space.reserve(mission, full_path, file_size, file_exists != 'add')
+            if state != 'ok':
+                r.close()
+                self._proxy_done(r, 0)
+                self._total_size.add(-file_size)
+                if file_exists != 'add':
+                    mission.del_file()
+                if state == 'full':
+                    mission._set_done(False, '硬盘空间不足')
+                else:  # 等同一文件系统上的任务结束后重新加入运行
+                    mission.set_states(result=None, info='等待硬盘空间', state='waiting')
+                return
+
         full_Path = Path(full_path)
         if file_exists == 'add' and full_Path.exists():
             mission.data.offset = full_Path.stat().st_size
@@ -455,93 +869,671 @@ class DownloadKit(object):
         else:  # 不分块
             task1 = Task(mission, None, '1/1', file_size)
             mission.tasks.append(task1)
+            if self._store is not None and file_exists != 'add':  # 数据按顺序到达，可边下载边计算哈希
+                mission._hasher = StreamHasher(self._store.hash_name)
+                if prefix:
+                    mission._hasher.update(prefix, 0)
+            if prefix:  # 判断是否小文件时已读取的数据
+                try:
+                    with open(full_path, 'rb+') as f:
+                        f.seek(mission.data.offset)
+                        f.write(prefix)
+                except Exception as e:
+                    r.close()
+                    self._proxy_done(r, len(prefix))
+                    mission._break_mission(result=False, info=f'写入失败 {e}')
+                    return
+                task1._add_size(len(prefix))
 
         self._threads[thread_id]['mission'] = task1
-        _do_download(r, task1, first)
+        t = perf_counter()
+        if first and mission.mirrors:
+            self._download_from_mirrors(task1, r, file_url, True)
+        else:
+            retry = _do_download(r, task1, first)
+            self._proxy_done(r, task1._downloaded_size, task1.result is not False and not retry)
+        self._trace('transfer', task1, t, bytes=task1._downloaded_size)
+        self._trace_curl(r, task1)
+
+    def _download_ranges(self, mission, goal_path, thread_id):
+        """下载指定的数据范围，多个范围先合并为一个请求，服务器不支持时逐个请求
+        :param mission: 任务对象
+        :param goal_path: 保存文件夹
+        :param thread_id: 线程号
+        :return: None
+        """
+        task = Task(mission, None, '1/1', None)
+        mission.tasks.append(task)
+        self._threads[thread_id]['mission'] = task
+        task.set_states(result=None, info='下载中', state='running')
+
+        if mission.data.to_memory:
+            contents, total, resolved, r, info = self._fetch_ranges(mission, mission.data.ranges)
+            if contents is None:
+                if not mission.is_done:
+                    task._set_done(False, info)
+                return
+            mission.ranges = resolved
+            mission.size = sum(len(i) for i in contents)
+            self._total_size.add(mission.size)
+            mission.content = contents
+            task._add_size(mission.size)
+            task._set_done('success', f'已读取{len(contents)}段数据')
+            return
+
+        files = []  # 收到第一个可用的响应时按其确定文件名并打开，数据边接收边写入
+
+        def writer(response):
+            if not files:
+                file_info = get_file_info(response, goal_path, mission.data.rename, mission.data.file_exists,
+                                          self._file_names)
+                mission._set_path(file_info['path'])
+                if file_info['skip']:
+                    raise _RangesSkipped()
+                files.append(open(mission.path, 'rb+'))
+            return _file_writer(files[0], task, response)
+
+        try:
+            contents, total, resolved, r, info = self._fetch_ranges(mission, mission.data.ranges, writer)
+            if contents is not None:
+                if not files:  # 所有范围都没有数据
+                    writer(r)
+                if total and files[0].seek(0, 2) < total:  # 预留整个文件大小，未下载部分为空洞
+                    files[0].truncate(total)
+        except _RangesSkipped:  # 不经过task通知任务，否则会被当作成功
+            task.set_states(result='skipped', info=str(mission.path), state='done')
+            mission._set_done('skipped', str(mission.path))
+            return
+        except Exception as e:
+            contents, info = None, f'写入失败 {e}'
+        finally:
+            if files:
+                files[0].close()
+
+        if contents is None:
+            if files:
+                mission.del_file()
+            if not mission.is_done:
+                task._set_done(False, info)
+            return
+
+        mission.ranges = resolved
+        mission.size = sum(contents)
+        self._total_size.add(mission.size)
+        task._set_done('success', str(mission.path))
+
+    def _download_extract(self, mission, r, file_url, goal_Path, thread_id):
+        """边下载边解压，压缩包不保存，成员直接写入解压文件夹
+        tar按顺序流式解压；zip先读取末尾的中央目录，再用一个连接按顺序读取各成员，服务器不支持Range时先缓存到临时文件
+        解压不能从中间继续，暂停后继续时重新下载
+        :param mission: 任务对象
+        :param r: 已连接的Response对象
+        :param file_url: 连接的网址
+        :param goal_Path: 保存文件夹
+        :param thread_id: 线程号
+        :return: None
+        """
+        name = mission.data.rename or _get_file_name(r)
+        dest = goal_Path if mission.data.extract is True else goal_Path / mission.data.extract
+        size = r.headers.get('Content-Length', None)
+        size = int(size) if size and size.isdigit() and not get_encoding(r) else None
+        mission._set_path(dest)
+        mission.file_name = name
+        mission.size = size
+        if size:
+            self._total_size.add(size)
+
+        task = Task(mission, None, '1/1', size)
+        mission.tasks = [task]
+        self._threads[thread_id]['mission'] = task
+        task.set_states(result=None, info='下载中', state='running')
+        callback = partial(_count_size, task)
+        try:
+            if archive_kind(name) == 'tar':
+                mission.extracted = extract_tar(ResponseStream(r, callback), dest)
+
+            elif size and r.headers.get('Accept-Ranges') == 'bytes':
+                r.close()
+                self._proxy_done(r, 0)
+                f = RangeFile(partial(self._open_range, mission, file_url), size, callback, release=self._proxy_done)
+                try:
+                    mission.extracted = extract_zip(f, dest)
+                finally:
+                    f.close()
+
+            else:  # 不能按位置读取，先缓存到临时文件
+                dest.mkdir(parents=True, exist_ok=True)
+                with TemporaryFile(dir=dest) as f:
+                    copyfileobj(ResponseStream(r, callback), f, 1048576)
+                    mission.extracted = extract_zip(f, dest)
+
+        except ExtractStopped:
+            r.close()
+            self._proxy_done(r, task._downloaded_size)
+            if _stop_reason(task) == 'paused':  # 丢弃已下载的数据，继续时重新开始
+                if size:
+                    self._total_size.add(-size)
+                task._add_size(-task._downloaded_size)
+                mission.tasks = []
+                task.set_states(result=None, info='已暂停', state='paused')
+                mission._park(mission)
+            return
+
+        except Exception as e:
+            r.close()
+            self._proxy_done(r, task._downloaded_size, False)
+            task._set_done(False, f'解压失败 {e}')
+            return
+
+        r.close()
+        self._proxy_done(r, task._downloaded_size)
+        task._set_done('success', str(dest))
+
+    def _open_range(self, mission, url, start):
+        """为边下载边解压的zip文件发送从指定位置到末尾的请求
+        :param mission: 任务对象
+        :param url: 文件网址
+        :param start: 开始位置
+        :return: Response对象
+        """
+        kwargs = copy(mission.data.kwargs)
+        kwargs['headers'] = CaseInsensitiveDict(kwargs['headers'])
+        kwargs['headers']['Range'] = f'bytes={start}-'
+        r, inf = self._connect(url, mission.session, mission.method, mission, **kwargs)
+        if not r:
+            raise IOError(inf)
+        if r.status_code != 206:
+            r.close()
+            self._proxy_done(r, 0)
+            raise IOError(f'服务器不支持分块下载。{r.status_code}')
+        return r
+
+    def _download_delta(self, mission, goal_Path, thread_id):
+        """按分块校验文件与本地文件比较，只下载不同的块，组装成新文件后替换本地文件
+        :param mission: 任务对象
+        :param goal_Path: 保存文件夹，Path对象
+        :param thread_id: 线程号
+        :return: 是否已处理，为False时按普通方式下载整个文件
+        """
+        # -------------------读取校验文件-------------------
+        control = mission.data.delta
+        try:
+            if isinstance(control, bytes):
+                content = control
+            elif str(control).lower().startswith(('http://', 'https://')):
+                kwargs = self._mirror_kwargs(mission, control)
+                r, inf = self._connect(control, mission.session, 'get', mission, **kwargs)
+                if not r:
+                    mission._set_done(False, f'获取校验文件失败。{inf}')
+                    return True
+                try:
+                    content = r.content
+                except Exception:
+                    self._proxy_done(r, 0, False)
+                    raise
+                self._proxy_done(r, len(content))
+            else:
+                content = Path(control).read_bytes()
+            index = load_index(content)
+        except Exception as e:
+            mission._set_done(False, f'校验文件不能使用。{e}')
+            return True
+
+        name = mission.data.rename or index.file_name or unquote(urlparse(mission.data.url).path.rsplit('/', 1)[-1])
+        path = goal_Path / name
+        if not path.is_file():
+            return False
+
+        # -------------------比较本地文件-------------------
+        task = Task(mission, None, '1/1', None)
+        mission.tasks.append(task)
+        self._threads[thread_id]['mission'] = task
+        task.set_states(result=None, info='比较本地文件', state='running')
+        tmp = path.with_name(f'.{path.name}.delta')
+        mission._set_path(tmp)  # 失败或取消时只删除临时文件，不删除本地旧文件
+        mission.file_name = path.name
+        try:
+            local = index.match(path)
+        except Exception as e:
+            task._set_done(False, f'读取本地文件失败 {e}')
+            return True
+
+        missing = merge_ranges([index.block_range(i) for i, pos in enumerate(local) if pos is None])
+        mission.size = sum(e - s + 1 for s, e in missing)
+        self._total_size.add(mission.size)
+        mission.delta_info = {'blocks': index.blocks_count,
+                              'reused': index.blocks_count - local.count(None),
+                              'fetch_size': mission.size}
+
+        # -------------------组装新文件-------------------
+        task.set_states(result=None, info='下载中', state='running')
+        try:
+            with open(path, 'rb') as src, open(tmp, 'wb+') as f:
+                f.truncate(index.size)
+                for ind, pos in enumerate(local):
+                    if pos is not None:
+                        start, end = index.block_range(ind)
+                        src.seek(pos)
+                        f.seek(start)
+                        f.write(src.read(end - start + 1))
+
+                batch, batch_size = [], 0
+                for num, range_ in enumerate(missing, 1):
+                    batch.append(range_)
+                    batch_size += range_[1] - range_[0] + 1
+                    if batch_size < self.block_size and len(batch) < 64 and num < len(missing):
+                        continue
+
+                    if mission.is_done:
+                        raise _DeltaError(None)
+                    contents, _, _, _, info = self._fetch_ranges(mission, batch, partial(_file_writer, f, task))
+                    if contents is None:
+                        raise _DeltaError(info)
+                    for start, end in batch:  # 数据已写入临时文件，读回逐块校验
+                        for b in range(start, end + 1, index.block_size):
+                            ind = b // index.block_size
+                            f.seek(b)
+                            if index.key(f.read(min(index.block_size, end - b + 1))) != index.expected(ind):
+                                raise _DeltaError(f'下载的数据与校验文件不一致，位置：{b}')
+                    batch, batch_size = [], 0
+
+        except Exception as e:
+            if tmp.exists():
+                tmp.unlink()
+            if not mission.is_done:
+                info = e.args[0] if isinstance(e, _DeltaError) else f'增量更新失败 {e}'
+                task._set_done(False, info)
+            return True
+
+        # -------------------校验并替换-------------------
+        if index.check_file(tmp) is False:
+            tmp.unlink()
+            if not index._strong:  # 只有弱校验时可能误判相同的块，改为下载整个文件
+                mission.tasks = []
+                mission._counter = ByteCounter()
+                self._total_size.add(-mission.size)
+                mission.size = None
+                mission.delta_info = None
+                mission.data.file_exists = 'overwrite'
+                return False
+            task._set_done(False, '组装后的文件校验不一致')
+            return True
+
+        replace(tmp, path)
+        mission._set_path(path)
+        task._set_done('success', str(path))
+        return True
+
+    def _fetch_ranges(self, mission, ranges, writer=None):
+        """获取多个数据范围，先合并为一个请求，服务器不支持时逐个请求
+        :param mission: 任务对象
+        :param ranges: [开始, 结束]组成的列表
+        :param writer: 接收Response对象、返回写入函数的函数，写入函数接收(位置, 数据)；
+                       指定时数据边接收边写入，不保存在内存中
+        :return: (各范围数据列表, 文件总大小, 换算后的实际位置, 最后的Response对象, 出错信息)，出错时第一位为None，
+                 指定writer时数据列表换为各范围的字节数
+        """
+        total = r = None
+        parts = []
+        kwargs = copy(mission.data.kwargs)
+        kwargs['headers'] = CaseInsensitiveDict(kwargs['headers'])
+        kwargs['headers']['Range'] = range_header(ranges)
+        try:
+            r = self._request(mission.data.url, mission.session, mission.method, **kwargs)
+        except Exception:
+            pass
+        if r is not None and r.status_code in (200, 206):
+            write = self._ranges_writer(r, writer)
+            try:
+                total, parts = read_parts(r, ranges, write)
+                self._proxy_done(r, _parts_size(parts))
+            except Exception:
+                parts = []
+                r.close()
+                self._proxy_done(r, 0, False)
+        elif r is not None:  # 不能使用的响应，关闭后逐个请求
+            r.close()
+            self._proxy_done(r, 0, False)
+
+        resolved = resolve_ranges(ranges, total)
+        contents = cut_parts(parts, resolved)
+        for ind, data in enumerate(contents):  # 未取得的范围逐个请求
+            if data is not None:
+                continue
+            if mission.is_done:
+                return None, total, resolved, r, '已取消'
+
+            range_ = [resolved[ind]] if resolved[ind] else [ranges[ind]]
+            kwargs['headers']['Range'] = range_header(range_)
+            r, inf = self._connect(mission.data.url, mission.session, mission.method, mission, **kwargs)
+            if not r:
+                if r is not None:
+                    r.close()
+                if r is not None and r.status_code == 416:  # 范围超出文件大小
+                    contents[ind] = b'' if writer is None else 0
+                    continue
+                return None, total, resolved, r, inf
+
+            write = self._ranges_writer(r, writer)
+            try:
+                t, p = read_parts(r, range_, write)
+                self._proxy_done(r, _parts_size(p))
+            except Exception as e:
+                r.close()
+                self._proxy_done(r, 0, False)
+                return None, total, resolved, r, f'下载失败。{r.status_code} {e}'
+            total = total or t
+            parts.extend(p)
+            resolved = resolve_ranges(ranges, total)
+            contents[ind] = cut_parts(p, [resolved[ind]])[0]
+            if contents[ind] is None:
+                return None, total, resolved, r, f'服务器返回的数据不完整：{range_header(range_)}'
+
+        return contents, total, resolved, r, None
+
+    def _ranges_writer(self, r, writer):
+        """从writer获取写入函数，writer出错（包括文件已存在而跳过）时先关闭响应并归还代理再抛出
+        :param r: Response对象
+        :param writer: 接收Response对象、返回写入函数的函数，为None时返回None
+        :return: 写入函数或None
+        """
+        if writer is None:
+            return None
+        try:
+            return writer(r)
+        except Exception:
+            r.close()
+            self._proxy_done(r, 0)
+            raise
+
+    def _save_small(self, mission, data):
+        """一次性保存已完整读取的小文件
+        :param mission: 任务对象
+        :param data: 文件数据
+        :return: None
+        """
+        task = Task(mission, None, '1/1', len(data))
+        mission.tasks.append(task)
+        task.set_states(result=None, info='下载中', state='running')
+        file_exists = mission.data.file_exists
+        while True:
+            try:  # 只有'overwrite'可以替换已有文件，其它方式下文件可能刚由其它程序创建
+                save_file(mission.path, data, file_exists != 'overwrite')
+                break
+            except FileExistsError:
+                if file_exists == 'rename':
+                    mission._set_path(self._file_names.reserve(mission.path, True)[0])
+                    continue
+                task.set_states(result='skipped', info=str(mission.path), state='done')
+                mission._set_done('skipped', str(mission.path))
+                return
+            except Exception as e:
+                self._file_names.release(mission.path)
+                task._set_done(False, f'写入失败 {e}')
+                return
+
+        task._add_size(len(data))
+        task._set_done('success', str(mission.path))
+
+    def _mirror_kwargs(self, mission, url, range_=None):
+        """生成连接某个来源所用的参数
+        :param mission: 任务对象
+        :param url: 来源url
+        :param range_: 要获取的数据范围，为None时获取整个文件
+        :return: 连接参数dict
+        """
+        kwargs = copy(mission.data.kwargs)
+        headers = CaseInsensitiveDict(kwargs['headers'])
+        if url != mission.data.url and headers.get('Host', None) == urlparse(mission.data.url).hostname:
+            headers.pop('Host')  # 自动添加的Host只适用于主地址
+        if range_:
+            headers['Range'] = f'bytes={range_[0]}-{range_[1]}'
+        kwargs['headers'] = headers
+        return kwargs
+
+    def _download_from_mirrors(self, task, r=None, url=None, first=False):
+        """从多个来源下载一个分块，连接或下载出错时换用其它来源继续下载剩余部分
+        :param task: 子任务对象
+        :param r: 已建立连接的Response对象，为None时按速度选择来源
+        :param url: r所用的来源url
+        :param first: 是否第一个分块
+        :return: None
+        """
+        mission = task.mission
+        mirrors = mission.mirrors
+        begin, end = task.range
+        tried = set()
+        info = '没有可用的来源'
+
+        while not task.is_done and not mission.is_done:
+            if r is None:
+                url = mirrors.choose(tried)
+                if url is None:
+                    break
+
+                r, info = self._connect(url, mission.session, mission.method, mission,
+                                        **self._mirror_kwargs(mission, url, [begin + task._downloaded_size, end]))
+                if r and not mirrors.check(r):
+                    r.close()
+                    self._proxy_done(r, 0)
+                    r, info = None, f'来源文件不一致：{url}'
+                    mirrors.mark_bad(url)
+                elif not r:
+                    r = None
+                    mirrors.record(url, 0, 0, False)
+
+                if r is None:
+                    tried.add(url)
+                    continue
+
+            size, t = task._downloaded_size, perf_counter()
+            result = _do_download(r, task, first, False)
+            if result is None:
+                return
+            result, info = result
+            self._proxy_done(r, task._downloaded_size - size, result is not False)
+            mirrors.record(url, task._downloaded_size - size, perf_counter() - t, result is not False)
+            if result is not False:
+                task._set_done(result, info)
+                return
+
+            tried.add(url)
+            r = None
+            first = False
+
+        task._set_done(False, info)
+
+
+class _DeltaError(Exception):
+    """增量更新出错，参数为出错信息，为None时表示已取消"""
+
 
+class _RangesSkipped(Exception):
+    """下载数据范围时遇到同名文件，按设置跳过"""
 
-def _do_download(r: Response, task: Task, first: bool = False):
+
+def _do_download(r: Response, task: Task, first: bool = False, set_done: bool = True, skip: int = 0):
     """执行下载任务
     :param r: Response对象
     :param task: 任务
     :param first: 是否第一个分块
-    :return: None
+    :param set_done: 结束后是否把任务设为done状态，为False时返回结果和信息；为True时传输中途断开会重新排队重试
+    :param skip: 响应数据开头要丢弃的字节数，服务器忽略Range返回整个文件时使用
+    :return: set_done为False时返回任务结果和信息组成的tuple，否则返回None；任务暂停时返回None；重新排队时返回True
     """
     if task.is_done or task.mission.is_done:
         return
 
     task.set_states(result=None, info='下载中', state='running')
     block_size = 131072  # 128k
+    raw = task.mission.download_kit._encoding_mode == 'raw'  # 保存未解压的数据
     result = None
 
     try:
-        if first:  # 分块是第一块
-            if task.range[1] <= block_size or task.range[1] % block_size != 0:
-                r_content = r.iter_content(chunk_size=task.range[1] + 1)
+        if _stop_reason(task):  # 连接期间已暂停
+            result = _stop_reason(task)
+
+        elif hasattr(r, 'write_into') and not skip:  # 传输层支持直接写入文件
+            begin = (task.range[0] if task.range else 0) + task._downloaded_size + task.mission.data.offset
+            result = r.write_into(task.path, begin, lambda size: _count_size(task, size),
+                                  task.range[1] + 1 if first else None)
+            if result == 'canceled':
+                result = _stop_reason(task) or result
+
+        elif first:  # 分块是第一块
+            # 设置了内存额度时按小块读取，不一次读入整个分块
+            if task.range[1] <= block_size or \
+                    (task.range[1] % block_size != 0 and task.mission.download_kit._memory is None):
+                r_content = iter_body(r, task.range[1] + 1, raw)
                 task.add_data(next(r_content), seek=0 + task.mission.data.offset)
-                if task.state in ('cancel', 'done'):
-                    result = 'canceled'
-                    task.clear_cache()
+                result = _stop_reason(task)
 
             else:
                 blocks = task.range[1] // block_size
                 remainder = task.range[1] % block_size
-                r_content = r.iter_content(chunk_size=block_size)
+                r_content = iter_body(r, block_size, raw)
                 for b in range(blocks):
                     task.add_data(next(r_content), seek=b * block_size + task.mission.data.offset)
-                    if task.state in ('cancel', 'done'):
-                        result = 'canceled'
-                        task.clear_cache()
+                    result = _stop_reason(task)
+                    if result:
                         break
 
-                if task.state in ('cancel', 'done'):
-                    result = 'canceled'
-                    task.clear_cache()
-                else:
+                if not result:
                     task.add_data(next(r_content)[:remainder + 1], blocks * block_size + task.mission.data.offset)
 
-        else:
-            if task.range is None:  # 不分块
-                for chunk in r.iter_content(chunk_size=block_size):
-                    if task.state in ('cancel', 'done'):
-                        result = 'canceled'
-                        task.clear_cache()
-                        break
-                    if chunk:
-                        task.add_data(chunk, None)
-
-            elif task.range[1] == '':  # 结尾的数据块
-                begin = task.range[0]
-                for chunk in r.iter_content(chunk_size=block_size):
-                    if task.state in ('cancel', 'done'):
-                        result = 'canceled'
-                        task.clear_cache()
-                        break
-                    if chunk:
-                        task.add_data(chunk, seek=begin + task.mission.data.offset)
-                        begin += len(chunk)
-
-            else:  # 有始末数字的数据块
-                begin, end = task.range
-                num = (end - begin) // block_size
-                for ind, chunk in enumerate(r.iter_content(chunk_size=block_size), 1):
-                    if task.state in ('cancel', 'done'):
-                        result = 'canceled'
-                        task.clear_cache()
-                        break
-                    if chunk:
-                        task.add_data(chunk, seek=begin + task.mission.data.offset)
-                        if ind <= num:
-                            begin += block_size
+        else:  # 不分块或其它数据块，从已下载的位置继续写入，文件已预先分配空间时也能正确写入
+            begin = (task.range[0] if task.range else 0) + task._downloaded_size + task.mission.data.offset
+            left = _left_size(task) if skip else None  # 响应是整个文件时，写到分块末尾为止
+            for chunk in iter_body(r, block_size, raw):
+                result = _stop_reason(task)
+                if result:
+                    break
+                if skip:
+                    n = min(skip, len(chunk))
+                    chunk = chunk[n:]
+                    skip -= n
+                if left is not None:
+                    chunk = chunk[:left]
+                    left -= len(chunk)
+                if chunk:
+                    task.add_data(chunk, seek=begin)
+                    begin += len(chunk)
+                if left == 0:
+                    break
 
     except Exception as e:
         result, info = False, f'下载失败。{r.status_code} {e}'
+        if set_done and _is_transfer_error(e) and _retry_later(task, info):
+            return True
 
     else:
-        result = 'success' if result is None else result
+        if result == 'paused' and _left_size(task) != 0:  # 保留已下载的数据，继续时从断点下载
+            task.set_states(result=None, info='已暂停', state='paused')
+            task.mission._park(task)
+            return
+        if result == 'canceled':
+            task.clear_cache()
+        result = 'success' if result in (None, 'paused') else result
         info = str(task.path)
 
     finally:
         r.close()
 
+    if not set_done:
+        return result, info
     task._set_done(result=result, info=info)
+
+
+def _parts_size(parts):
+    """返回read_parts()读到的字节数
+    :param parts: (开始位置, 数据或字节数)组成的列表
+    :return: 字节数
+    """
+    return sum(i[1] if isinstance(i[1], int) else len(i[1]) for i in parts)
+
+
+def _file_writer(f, task, response):
+    """生成把范围数据写入已打开文件的函数，供_fetch_ranges()使用
+    :param f: 文件对象
+    :param task: 子任务，用于记录已下载字节数
+    :param response: Response对象
+    :return: 接收(位置, 数据)的写入函数
+    """
+    def write(pos, data):
+        f.seek(pos)
+        f.write(data)
+        task._add_size(len(data))
+
+    return write
+
+
+def _is_transfer_error(e):
+    """判断下载中途的异常是否由连接断开、超时等传输问题引起，写入文件出错等不重试
+    :param e: 异常对象
+    :return: bool
+    """
+    return isinstance(e, RequestException) or (type(e) in (OSError, IOError) and e.errno is None)
+
+
+def _retry_later(task, info):
+    """下载中途连接出错时，把子任务重新加入队列，从已下载的位置重新连接
+    :param task: 子任务
+    :param info: 出错信息
+    :return: 是否已重新加入队列，重试次数用完或任务已停止时返回False
+    """
+    kit = task.mission.download_kit
+    if task._retries >= kit.retry or _stop_reason(task):
+        return False
+    task._retries += 1
+    task.mission.retries += 1
+    task.set_states(result=None, info=f'{info} 重试{task._retries}', state='waiting')
+    sleep(kit.interval)
+    kit._run_or_wait(task)
+    return True
+
+
+def _guess_name(mission):
+    """连接前推测保存用的文件名，有HEAD请求得到的文件名时使用它，否则从url获取
+    :param mission: 任务对象
+    :return: 文件名，无法推测时返回None
+    """
+    name = mission.head_info.get('name', None) if mission.head_info else None
+    name = name or unquote(_url_file_name(mission.data.url))
+    if not name:
+        return None
+    return get_full_name(name, mission.data.rename)
+
+
+def _stop_reason(task):
+    """返回子任务是否应停止下载
+    :param task: 任务
+    :return: 'canceled'、'paused'，继续下载时返回None
+    """
+    if task.state in ('cancel', 'done'):
+        return 'canceled'
+    if task.mission._paused:
+        return 'paused'
+
+
+def _left_size(task):
+    """返回子任务还未下载的字节数
+    :param task: 任务
+    :return: 字节数，未知时返回None
+    """
+    if task.range and task.range[1] != '':
+        end = task.range[1]
+    elif task.mission.size:
+        end = task.mission.size - 1
+    else:
+        return None
+    return max(0, end - (task.range[0] if task.range else 0) - task._downloaded_size + 1)
+
+
+def _count_size(task, size):
+    """记录直接写入文件的数据量
+    :param task: 任务
+    :param size: 字节数
+    :return: 是否继续下载
+    """
+    task._add_size(size)
+    return _stop_reason(task) is None
@@ -6,15 +6,24 @@
 from pathlib import Path
 from queue import Queue
 from threading import Lock
-from typing import Union, Tuple, Any, Literal, Optional
+from typing import Union, Tuple, Any, Literal, Optional, List, Callable, Dict, BinaryIO
 
-from DataRecorder import Recorder
 from DrissionPage.base import BasePage
 from requests import Session, Response
 
-from ._funcs import FileExistsSetter, PathSetter, BlockSizeSetter
+from ._funcs import FileExistsSetter, PathSetter, BlockSizeSetter, FileNames, ByteCounter, CookiesCache, DiskSpace
+from .logger import LogWriter, RecorderLog
+from .memory import MemoryBudget
 from .mission import Task, Mission, BaseTask
 from .setter import Setter
+from .postprocess import PostProcessor
+from .prefetch import Prefetcher
+from .proxies import ProxyPool
+from .store import ContentStore
+from .volumes import Volumes
+from .tracer import Tracer
+from .transport import RequestsTransport, CurlTransport
+from .writer import DiskWriter
 
 FILE_EXISTS = Literal['add', 'skip', 'rename', 'overwrite']
 
@@ -28,20 +37,41 @@ class DownloadKit(object):
     _setter: Optional[Setter] = ...
     _print_mode: Optional[str] = ...
     _log_mode: Optional[str] = ...
-    _logger: Optional[Recorder] = ...
+    _logger: Union[LogWriter, RecorderLog, None] = ...
     _retry: Optional[int] = ...
     _interval: Optional[float] = ...
     page: Optional[BasePage] = ...
     _waiting_list: Queue = ...
     _session: Session = ...
-    _running_count: int = ...
+    _running_count: ByteCounter = ...
+    _done_count: ByteCounter = ...
+    _total_size: ByteCounter = ...
+    _counter: ByteCounter = ...
     _missions_num: int = ...
     _missions: dict = ...
     _threads: dict = ...
     _timeout: Optional[int, float] = ...
     _stop_printing: bool = ...
     _lock: Lock = ...
+    _print_lock: Lock = ...
+    _file_names: FileNames = ...
     _copy_cookies: bool = ...
+    _check_etag: bool = ...
+    _cookies_cache: CookiesCache = ...
+    _transport: Union[RequestsTransport, CurlTransport] = ...
+    _writer: Optional[DiskWriter] = ...
+    _small_file_size: int = ...
+    _tracer: Optional[Tracer] = ...
+    _disk_space: Optional[DiskSpace] = ...
+    _proxy_pool: Optional[ProxyPool] = ...
+    _prefetcher: Optional[Prefetcher] = ...
+    _post_processor: Optional[PostProcessor] = ...
+    _encoding_mode: str = ...
+    _decompress: bool = ...
+    _protocols: Dict[str, Any] = ...
+    _store: Optional[ContentStore] = ...
+    _volumes: Optional[Volumes] = ...
+    _memory: Optional[MemoryBudget] = ...
     split: bool = ...
 
     def __init__(self,
@@ -98,12 +128,19 @@ class DownloadKit(object):
     @property
     def missions(self) -> dict: ...
 
+    def progress(self) -> dict: ...
+
     def add(self,
-            file_url: str,
+            file_url: Union[str, list, tuple],
             goal_path: Optional[str, Path] = None,
             rename: str = None,
             file_exists: FILE_EXISTS = None,
             split: bool = None,
+            ranges: Optional[List[tuple]] = None,
+            to_memory: bool = False,
+            delta: Union[str, Path, bytes, None] = None,
+            then: Optional[Callable[[str], Any]] = None,
+            extract: Union[bool, str] = False,
             timeout: Optional[float] = None,
             params: Optional[dict] = ...,
             data: Any = None,
@@ -144,6 +181,14 @@ class DownloadKit(object):
 
     def _run(self, ID: int, mission: BaseTask) -> None: ...
 
+    def refresh_cookies(self) -> None: ...
+
+    def proxy_stats(self) -> Optional[dict]: ...
+
+    def volume_stats(self) -> Optional[dict]: ...
+
+    def memory_stats(self) -> Optional[dict]: ...
+
     def get_mission(self, mission_or_id: Union[int, Mission]) -> Mission: ...
 
     def get_failed_missions(self) -> list: ...
@@ -155,11 +200,25 @@ class DownloadKit(object):
 
     def cancel(self) -> None: ...
 
+    def pause_all(self) -> None: ...
+
+    def resume_all(self) -> None: ...
+
     def show(self, asyn: bool = True, keep: bool = False) -> None: ...
 
     def _show(self, wait: float, keep: bool = False) -> None: ...
 
-    def _connect(self, url: str, session: Session, method: str, **kwargs) -> Tuple[Union[Response, None], str]: ...
+    def _connect(self,
+                 url: str,
+                 session: Session,
+                 method: str,
+                 mission: Optional[Mission] = None,
+                 **kwargs) -> Tuple[Union[Response, None], str]: ...
+
+    def _request(self, url: str, session: Session, method: str, **kwargs) -> Optional[Response]: ...
+
+    @staticmethod
+    def _proxy_done(r: Any, size: int, success: Optional[bool] = True) -> None: ...
 
     def _get_usable_thread(self) -> Optional[int]: ...
 
@@ -167,6 +226,82 @@ class DownloadKit(object):
 
     def _when_mission_done(self, mission: Mission) -> None: ...
 
+    @staticmethod
+    def _log_record(mission: Mission, event: str) -> dict: ...
+
+    def _trace(self,
+               phase: str,
+               item: Union[Mission, Task],
+               start: float,
+               end: Optional[float] = None,
+               **args) -> None: ...
+
+    def _trace_curl(self, response: Any, item: Union[Mission, Task]) -> None: ...
+
+    def export_trace(self, path: Union[str, Path], fmt: Literal['chrome', 'json'] = 'chrome') -> str: ...
+
     def _download(self,
                   mission_or_task: Union[Mission, Task],
                   thread_id: int) -> None: ...
+
+    def _download_ranges(self, mission: Mission, goal_path: str, thread_id: int) -> None: ...
+
+    def _download_extract(self, mission: Mission, r: Response, file_url: str, goal_Path: Path,
+                          thread_id: int) -> None: ...
+
+    def _open_range(self, mission: Mission, url: str, start: int) -> Response: ...
+
+    def _download_delta(self, mission: Mission, goal_Path: Path, thread_id: int) -> bool: ...
+
+    def _fetch_ranges(self,
+                      mission: Mission,
+                      ranges: List[list],
+                      writer: Optional[Callable[[Response], Callable[[int, bytes], None]]] = None) \
+            -> Tuple[Optional[List[Union[bytes, int]]], Optional[int], List[Optional[list]], Optional[Response],
+                     Optional[str]]: ...
+
+    def _ranges_writer(self,
+                       r: Response,
+                       writer: Optional[Callable[[Response], Callable[[int, bytes], None]]]) \
+            -> Optional[Callable[[int, bytes], None]]: ...
+
+    def _save_small(self, mission: Mission, data: bytes) -> None: ...
+
+    def _mirror_kwargs(self, mission: Mission, url: str, range_: Optional[list] = None) -> dict: ...
+
+    def _download_from_mirrors(self,
+                               task: Task,
+                               r: Optional[Response] = None,
+                               url: Optional[str] = None,
+                               first: bool = False) -> None: ...
+
+
+def _do_download(r: Response,
+                 task: Task,
+                 first: bool = False,
+                 set_done: bool = True,
+                 skip: int = 0) -> Union[tuple, bool, None]: ...
+
+
+def _parts_size(parts: List[tuple]) -> int: ...
+
+
+def _file_writer(f: BinaryIO, task: Task, response: Response) -> Callable[[int, bytes], None]: ...
+
+
+def _is_transfer_error(e: Exception) -> bool: ...
+
+
+def _retry_later(task: Task, info: str) -> bool: ...
+
+
+def _guess_name(mission: Mission) -> Optional[str]: ...
+
+
+def _stop_reason(task: Task) -> Optional[str]: ...
+
+
+def _left_size(task: Task) -> Optional[int]: ...
+
+
+def _count_size(task: Task, size: int) -> bool: ...
@@ -0,0 +1,197 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   encoding.py
+"""
+import zlib
+from os import replace
+from pathlib import Path
+
+ENCODING_MODES = ('decode', 'raw', 'identity')
+
+
+def get_encoding(response):
+    """返回响应的Content-Encoding，没有压缩时返回None
+    :param response: Response对象
+    :return: 小写的编码名称，多层压缩时用', '连接
+    """
+    value = response.headers.get('Content-Encoding', None)
+    if not value:
+        return None
+    names = [i.strip().lower() for i in value.split(',') if i.strip() and i.strip().lower() != 'identity']
+    return ', '.join(names) or None
+
+
+def iter_body(response, chunk_size, raw=False):
+    """逐块返回响应数据
+    :param response: Response对象
+    :param chunk_size: 每块字节数
+    :param raw: 是否返回未解压的原始数据，传输层已不解压时无效
+    :return: 生成器
+    """
+    if raw and getattr(response, 'raw', None) is not None:
+        return response.raw.stream(chunk_size, decode_content=False)
+    return response.iter_content(chunk_size=chunk_size)
+
+
+class Decoder(object):
+    def __init__(self, encoding):
+        """流式解压器，支持gzip、deflate、br（需安装brotli）、zstd（需安装zstandard）及其多层组合
+        :param encoding: Content-Encoding的值，如'gzip'、'gzip, br'
+        """
+        names = [i.strip().lower() for i in encoding.split(',') if i.strip() and i.strip().lower() != 'identity']
+        self._decoders = [_make_decoder(i) for i in reversed(names)]  # 最后压缩的先解压
+
+    def decompress(self, data):
+        """解压一段数据
+        :param data: 压缩的数据
+        :return: 已解压的数据
+        """
+        for d in self._decoders:
+            if not data:
+                break
+            data = d.decompress(data)
+        return data
+
+    def flush(self):
+        """结束解压，返回剩余数据"""
+        data = b''
+        for d in self._decoders:
+            data = (d.decompress(data) if data else b'') + d.flush()
+        return data
+
+
+def decode_file(path, encoding, offset=0, chunk_size=1048576):
+    """把保存了压缩数据的文件流式解压为原始内容，先写入临时文件再替换
+    :param path: 文件路径
+    :param encoding: Content-Encoding的值
+    :param offset: 压缩数据在文件中的开始位置，之前的数据原样保留
+    :param chunk_size: 每次读取字节数
+    :return: 解压后的文件大小
+    """
+    path = Path(path)
+    tmp = path.parent / f'.{path.name}.decode'
+    decoder = Decoder(encoding)
+    try:
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            left = offset
+            while left:
+                data = src.read(min(left, chunk_size))
+                if not data:
+                    break
+                dst.write(data)
+                left -= len(data)
+            while True:
+                data = src.read(chunk_size)
+                if not data:
+                    break
+                dst.write(decoder.decompress(data))
+            dst.write(decoder.flush())
+            size = dst.tell()
+        replace(tmp, path)
+    except Exception:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return size
+
+
+class _GzipDecoder(object):
+    """gzip解压器，支持多个连续的gzip成员"""
+
+    def __init__(self):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data):
+        result = b''
+        while data:
+            result += self._obj.decompress(data)
+            data = self._obj.unused_data
+            if not data:
+                break
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return result
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _DeflateDecoder(object):
+    """deflate解压器，兼容带zlib头和不带头的数据"""
+
+    def __init__(self):
+        self._obj = zlib.decompressobj()
+        self._first = True
+
+    def decompress(self, data):
+        if not self._first:
+            return self._obj.decompress(data)
+        self._first = False
+        try:
+            return self._obj.decompress(data)
+        except zlib.error:
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _BrotliDecoder(object):
+    """br解压器"""
+
+    def __init__(self):
+        try:
+            import brotli
+        except ModuleNotFoundError:
+            try:
+                import brotlicffi as brotli
+            except ModuleNotFoundError:
+                raise ModuleNotFoundError('解压br数据须先安装brotli：pip install brotli')
+        self._obj = brotli.Decompressor()
+        self._process = getattr(self._obj, 'process', None) or self._obj.decompress
+
+    def decompress(self, data):
+        return self._process(data)
+
+    def flush(self):
+        return b''
+
+
+class _ZstdDecoder(object):
+    """zstd解压器，支持多个连续的帧"""
+
+    def __init__(self):
+        try:
+            import zstandard
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError('解压zstd数据须先安装zstandard：pip install zstandard')
+        self._dctx = zstandard.ZstdDecompressor()
+        self._obj = self._dctx.decompressobj()
+
+    def decompress(self, data):
+        result = b''
+        while data:
+            result += self._obj.decompress(data)
+            data = self._obj.unused_data if self._obj.eof else b''
+            if data:
+                self._obj = self._dctx.decompressobj()
+        return result
+
+    def flush(self):
+        return b''
+
+
+_DECODERS = {'gzip': _GzipDecoder, 'x-gzip': _GzipDecoder, 'deflate': _DeflateDecoder,
+             'br': _BrotliDecoder, 'zstd': _ZstdDecoder}
+
+
+def _make_decoder(name):
+    """生成一种压缩方式的解压器
+    :param name: 压缩方式名称
+    :return: 解压器对象
+    """
+    if name not in _DECODERS:
+        raise ValueError(f'不支持的压缩方式：{name}')
+    return _DECODERS[name]()
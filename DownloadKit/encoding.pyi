@@ -0,0 +1,65 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from typing import Iterator, List, Optional, Union, Literal
+
+from requests import Response
+
+from .transport import CurlResponse
+
+ENCODING_MODES: tuple = ...
+ENCODING_MODE = Literal['decode', 'raw', 'identity']
+
+
+def get_encoding(response: Union[Response, CurlResponse]) -> Optional[str]: ...
+
+
+def iter_body(response: Union[Response, CurlResponse], chunk_size: int, raw: bool = False) -> Iterator[bytes]: ...
+
+
+class Decoder(object):
+    _decoders: List[Union[_GzipDecoder, _DeflateDecoder, _BrotliDecoder, _ZstdDecoder]] = ...
+
+    def __init__(self, encoding: str): ...
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def decode_file(path: Union[str, Path], encoding: str, offset: int = 0, chunk_size: int = 1048576) -> int: ...
+
+
+class _GzipDecoder(object):
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _DeflateDecoder(object):
+    _first: bool = ...
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _BrotliDecoder(object):
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _ZstdDecoder(object):
+    def decompress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+_DECODERS: dict = ...
+
+
+def _make_decoder(name: str) -> Union[_GzipDecoder, _DeflateDecoder, _BrotliDecoder, _ZstdDecoder]: ...
@@ -0,0 +1,213 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   extract.py
+"""
+import tarfile
+import zipfile
+from io import RawIOBase, SEEK_SET, SEEK_CUR, SEEK_END
+from pathlib import Path
+
+
+class ExtractStopped(Exception):
+    """回调函数要求停止读取"""
+
+
+def archive_kind(name):
+    """按文件名判断压缩包类型
+    :param name: 文件名
+    :return: 'zip'或'tar'，其它文件按tar处理，由解压时判断是否可用
+    """
+    name = name.lower()
+    if name.endswith('.zip'):
+        return 'zip'
+    return 'tar'
+
+
+class ResponseStream(RawIOBase):
+    def __init__(self, response, callback=None, chunk_size=131072):
+        """把响应数据包装为只能顺序读取的文件对象，供tarfile流式读取
+        :param response: Response对象
+        :param callback: 每收到一段数据调用，参数为字节数，返回False时抛出ExtractStopped
+        :param chunk_size: 每次从连接读取的字节数
+        """
+        self._iter = response.iter_content(chunk_size=chunk_size)
+        self._callback = callback
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self._buffer:
+            self._buffer = next(self._iter, b'')
+            if self._buffer and self._callback is not None and self._callback(len(self._buffer)) is False:
+                raise ExtractStopped()
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class RangeFile(RawIOBase):
+    def __init__(self, open_range, size, callback=None, max_skip=1048576, release=None):
+        """用带Range的请求读取远程文件的可随机访问文件对象，顺序读取时只使用一个连接
+        :param open_range: 接收开始位置、返回从该位置到文件末尾的Response对象的函数
+        :param size: 文件大小
+        :param callback: 每收到一段数据调用，参数为字节数，返回False时抛出ExtractStopped
+        :param max_skip: 向后移动不超过此字节数时读取丢弃，不重新连接
+        :param release: 每个连接关闭后调用，参数为Response对象、从该连接读取的字节数和读取时是否没有出错
+        """
+        self._open_range = open_range
+        self._size = size
+        self._callback = callback
+        self._max_skip = max_skip
+        self._release = release
+        self._pos = 0
+        self._response = None
+        self._iter = None
+        self._start_pos = None  # 当前连接的开始位置
+        self._stream_pos = None  # 当前连接读到的位置
+        self._failed = False  # 当前连接读取时是否出错
+        self._buffer = b''
+        self.requests = 0  # 发送的请求数
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=SEEK_SET):
+        if whence == SEEK_SET:
+            self._pos = offset
+        elif whence == SEEK_CUR:
+            self._pos += offset
+        elif whence == SEEK_END:
+            self._pos = self._size + offset
+        return self._pos
+
+    def readinto(self, b):
+        if self._pos >= self._size or not len(b):
+            return 0
+        self._prepare()
+        if not self._buffer:
+            self._fill()
+            if not self._buffer:
+                raise IOError('连接提前结束。')
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self._pos += size
+        self._stream_pos += size
+        return size
+
+    def close(self):
+        self._close_response()
+        super().close()
+
+    def _close_response(self):
+        """关闭当前连接"""
+        if self._response is None:
+            return
+        response, self._response = self._response, None
+        response.close()
+        if self._release is not None:
+            self._release(response, self._stream_pos - self._start_pos, not self._failed)
+
+    def _prepare(self):
+        """使当前连接位于读取位置，不在时向后读取丢弃或重新连接"""
+        if self._response is not None:
+            gap = self._pos - self._stream_pos
+            if gap == 0:
+                return
+            if 0 < gap <= self._max_skip:
+                while gap:
+                    if not self._buffer:
+                        self._fill()
+                        if not self._buffer:
+                            break
+                    n = min(gap, len(self._buffer))
+                    self._buffer = self._buffer[n:]
+                    self._stream_pos += n
+                    gap -= n
+                if not gap:
+                    return
+            self._close_response()
+
+        self._response = self._open_range(self._pos)
+        self.requests += 1
+        self._iter = self._response.iter_content(chunk_size=131072)
+        self._start_pos = self._stream_pos = self._pos
+        self._failed = False
+        self._buffer = b''
+
+    def _fill(self):
+        """从当前连接读取一段数据"""
+        try:
+            self._buffer = next(self._iter, b'')
+        except Exception:
+            self._failed = True
+            raise
+        if self._buffer and self._callback is not None and self._callback(len(self._buffer)) is False:
+            raise ExtractStopped()
+
+
+def extract_tar(fileobj, dest):
+    """从只能顺序读取的文件对象流式解压tar包，支持gz、bz2、xz压缩
+    :param fileobj: 文件对象
+    :param dest: 解压到的文件夹
+    :return: 解压出的文件路径列表
+    """
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    result = []
+    data_filter = getattr(tarfile, 'data_filter', None)
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if data_filter is None and not _safe_member(member, dest):
+                continue
+            if data_filter is not None:
+                try:
+                    member = data_filter(member, str(dest))
+                except tarfile.FilterError:  # 绝对路径、跳出文件夹的链接等不解压
+                    continue
+                tar.extract(member, dest, set_attrs=True, filter='fully_trusted')
+            else:
+                tar.extract(member, dest)
+            if member.isfile():
+                result.append(str(dest / member.name))
+    return result
+
+
+def extract_zip(fileobj, dest):
+    """从可随机访问的文件对象解压zip包，先读取末尾的中央目录，再按位置顺序读取各成员
+    :param fileobj: 文件对象
+    :param dest: 解压到的文件夹
+    :return: 解压出的文件路径列表
+    """
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    result = []
+    with zipfile.ZipFile(fileobj) as z:
+        for info in sorted(z.infolist(), key=lambda i: i.header_offset):  # 按位置顺序读取，连接可连续使用
+            path = z.extract(info, dest)
+            if not info.is_dir():
+                result.append(path)
+    return result
+
+
+def _safe_member(member, dest):
+    """没有tarfile.data_filter时检查成员是否可以安全解压
+    :param member: TarInfo对象
+    :param dest: 解压到的文件夹
+    :return: bool
+    """
+    if not (member.isfile() or member.isdir()):
+        return False
+    target = (dest / member.name).resolve()
+    return target == dest.resolve() or dest.resolve() in target.parents
@@ -0,0 +1,82 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from io import RawIOBase
+from pathlib import Path
+from tarfile import TarInfo
+from typing import Any, Callable, Iterator, List, Literal, Optional, Union
+
+from requests import Response
+
+
+class ExtractStopped(Exception): ...
+
+
+def archive_kind(name: str) -> Literal['zip', 'tar']: ...
+
+
+class ResponseStream(RawIOBase):
+    _iter: Iterator[bytes] = ...
+    _callback: Optional[Callable[[int], bool]] = ...
+    _buffer: bytes = ...
+
+    def __init__(self,
+                 response: Response,
+                 callback: Optional[Callable[[int], bool]] = None,
+                 chunk_size: int = 131072): ...
+
+    def readable(self) -> bool: ...
+
+    def readinto(self, b: Any) -> int: ...
+
+
+class RangeFile(RawIOBase):
+    _open_range: Callable[[int], Response] = ...
+    _size: int = ...
+    _callback: Optional[Callable[[int], bool]] = ...
+    _max_skip: int = ...
+    _release: Optional[Callable[[Response, int, bool], None]] = ...
+    _pos: int = ...
+    _response: Optional[Response] = ...
+    _iter: Optional[Iterator[bytes]] = ...
+    _start_pos: Optional[int] = ...
+    _stream_pos: Optional[int] = ...
+    _failed: bool = ...
+    _buffer: bytes = ...
+    requests: int = ...
+
+    def __init__(self,
+                 open_range: Callable[[int], Response],
+                 size: int,
+                 callback: Optional[Callable[[int], bool]] = None,
+                 max_skip: int = 1048576,
+                 release: Optional[Callable[[Response, int, bool], None]] = None): ...
+
+    def readable(self) -> bool: ...
+
+    def seekable(self) -> bool: ...
+
+    def tell(self) -> int: ...
+
+    def seek(self, offset: int, whence: int = 0) -> int: ...
+
+    def readinto(self, b: Any) -> int: ...
+
+    def close(self) -> None: ...
+
+    def _close_response(self) -> None: ...
+
+    def _prepare(self) -> None: ...
+
+    def _fill(self) -> None: ...
+
+
+def extract_tar(fileobj: Any, dest: Union[str, Path]) -> List[str]: ...
+
+
+def extract_zip(fileobj: Any, dest: Union[str, Path]) -> List[str]: ...
+
+
+def _safe_member(member: TarInfo, dest: Path) -> bool: ...
@@ -0,0 +1,362 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   faultserver.py
+"""
+from fnmatch import fnmatch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from re import match
+from socket import SOL_SOCKET, SO_LINGER
+from struct import pack
+from sys import exc_info
+from threading import Thread, Lock
+from time import sleep, perf_counter
+from urllib.parse import urlparse, unquote
+
+FAULTS = ('reset', 'truncate', 'stall', 'status', 'wrong_length', 'no_ranges', 'slow')
+
+
+class FaultServer(object):
+    def __init__(self, root=None, files=None, host='127.0.0.1', port=0):
+        """可按路径和数据范围注入故障的本地文件服务器，用于测试重试、分块和取消，以及测量故障对速度的影响
+        故障类型：
+        'reset'：发送after字节后用RST断开连接
+        'truncate'：发送after字节后正常关闭连接，响应体不完整
+        'stall'：发送after字节后停顿seconds秒
+        'status'：返回code状态码，可用retry_after设置Retry-After响应头
+        'wrong_length'：Content-Length比实际数据多delta字节（可为负数）
+        'no_ranges'：声明支持Range但忽略Range请求头，返回整个文件，accept_ranges为0时不声明
+        'slow'：限制发送速度为rate字节/秒
+        :param root: 文件所在文件夹，为None时只使用files中的数据
+        :param files: {路径: 字节数据}，路径如'/a.bin'
+        :param host: 监听地址
+        :param port: 端口，为0时自动选择
+        """
+        self.root = Path(root) if root else None
+        self.files = dict(files or {})
+        self.log = []  # 每个请求的记录
+        self._faults = []
+        self._lock = Lock()
+        self._server = _Server((host, port), _handler(self))
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def port(self):
+        """返回监听端口"""
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self):
+        """返回服务器地址"""
+        return f'http://{self._server.server_address[0]}:{self.port}'
+
+    def url(self, path):
+        """返回一个文件的url
+        :param path: 文件路径，如'/a.bin'
+        :return: url
+        """
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    def start(self):
+        """在后台线程启动服务器
+        :return: 当前对象
+        """
+        if self._thread is None:
+            self._thread = Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def add_file(self, path, data):
+        """添加一个内存中的文件
+        :param path: 文件路径，如'/a.bin'
+        :param data: 字节数据
+        :return: None
+        """
+        self.files['/' + path.lstrip('/')] = data
+
+    def add_fault(self, path, kind, times=None, ranged=None, range_=None, **params):
+        """添加一个故障规则，一个请求只使用最先添加的匹配规则
+        :param path: 文件路径，可使用通配符，如'*.bin'
+        :param kind: 故障类型，见FAULTS
+        :param times: 生效多少次后失效，为None时一直有效
+        :param ranged: True只对带Range的请求生效，False只对不带Range的请求生效，None都生效
+        :param range_: (开始, 结束)，只对开始位置在此范围内的Range请求生效
+        :param params: 故障参数：after、seconds、code、retry_after、delta、rate、accept_ranges
+        :return: 规则dict，其中'hits'为已生效次数
+        """
+        if kind not in FAULTS:
+            raise ValueError(f'kind参数只能是{FAULTS}之一。')
+        rule = {'path': '/' + path.lstrip('/'), 'kind': kind, 'times': times, 'ranged': ranged,
+                'range': range_, 'params': params, 'hits': 0}
+        with self._lock:
+            self._faults.append(rule)
+        return rule
+
+    def clear_faults(self):
+        """清除所有故障规则"""
+        with self._lock:
+            self._faults = []
+
+    def stats(self):
+        """返回请求数、发送字节数、发送用时和各类故障生效次数"""
+        with self._lock:
+            log = list(self.log)
+        faults = {}
+        for i in log:
+            if i['fault']:
+                faults[i['fault']] = faults.get(i['fault'], 0) + 1
+        return {'requests': len(log),
+                'bytes': sum(i['bytes'] for i in log),
+                'seconds': round(sum(i['seconds'] for i in log), 6),
+                'faults': faults}
+
+    def _get_data(self, path):
+        """获取文件数据
+        :param path: 请求路径
+        :return: 字节数据，不存在时返回None
+        """
+        if path in self.files:
+            return self.files[path]
+        if self.root is not None:
+            file = (self.root / path.lstrip('/')).resolve()
+            if self.root.resolve() in file.parents and file.is_file():
+                return file.read_bytes()
+
+    def _take_fault(self, path, start):
+        """找出对本次请求生效的故障规则
+        :param path: 请求路径
+        :param start: Range开始位置，没有Range时为None
+        :return: 规则dict或None
+        """
+        with self._lock:
+            for rule in self._faults:
+                if not fnmatch(path, rule['path']):
+                    continue
+                if rule['times'] is not None and rule['hits'] >= rule['times']:
+                    continue
+                if rule['ranged'] is not None and rule['ranged'] != (start is not None):
+                    continue
+                if rule['range'] and (start is None or not rule['range'][0] <= start <= rule['range'][1]):
+                    continue
+                rule['hits'] += 1
+                return rule
+
+    def _record(self, path, range_, status, fault, size, seconds):
+        """记录一个请求"""
+        with self._lock:
+            self.log.append({'path': path, 'range': range_, 'status': status, 'fault': fault,
+                             'bytes': size, 'seconds': seconds})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """客户端断开连接是测试中的正常情况，不打印"""
+        if not isinstance(exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+def _handler(fault_server):
+    """生成请求处理类
+    :param fault_server: FaultServer对象
+    :return: BaseHTTPRequestHandler子类
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = 'FaultServer'
+
+        def do_GET(self):
+            self._handle(True)
+
+        def do_HEAD(self):
+            self._handle(False)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _handle(self, body):
+            """处理一个请求
+            :param body: 是否发送响应体
+            :return: None
+            """
+            begin = perf_counter()
+            path = unquote(urlparse(self.path).path)
+            data = fault_server._get_data(path)
+            if data is None:
+                self._send_empty(404)
+                fault_server._record(path, None, 404, None, 0, perf_counter() - begin)
+                return
+
+            range_ = _parse_range(self.headers.get('Range', None), len(data))
+            rule = fault_server._take_fault(path, range_[0] if range_ else None)
+            kind = rule['kind'] if rule else None
+            params = rule['params'] if rule else {}
+
+            if kind == 'status':
+                self._send_empty(params.get('code', 503), params.get('retry_after', None))
+                fault_server._record(path, range_, params.get('code', 503), kind, 0, perf_counter() - begin)
+                return
+
+            if range_ and kind != 'no_ranges':
+                if range_[0] >= len(data):
+                    self._send_empty(416)
+                    fault_server._record(path, range_, 416, kind, 0, perf_counter() - begin)
+                    return
+                part = data[range_[0]:range_[1] + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {range_[0]}-{range_[0] + len(part) - 1}/{len(data)}')
+            else:
+                part = data
+                self.send_response(200)
+
+            length = len(part) + params.get('delta', 0) if kind == 'wrong_length' else len(part)
+            self.send_header('Content-Length', str(max(0, length)))
+            if kind != 'no_ranges' or params.get('accept_ranges', 1):
+                self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Type', 'application/octet-stream')
+            if kind in ('reset', 'truncate', 'wrong_length'):
+                self.send_header('Connection', 'close')
+                self.close_connection = True
+            self.end_headers()
+
+            sent = 0
+            if body:
+                sent = self._send_body(part, kind, params)
+            fault_server._record(path, range_, 206 if range_ and kind != 'no_ranges' else 200, kind, sent,
+                                 perf_counter() - begin)
+
+        def _send_body(self, part, kind, params):
+            """按故障规则发送响应体
+            :param part: 要发送的数据
+            :param kind: 故障类型
+            :param params: 故障参数
+            :return: 已发送字节数
+            """
+            after = params.get('after', 0)
+            rate = params.get('rate', None)
+            step = 16384
+            sent = 0
+            stalled = False
+            start = perf_counter()
+            try:
+                while sent < len(part):
+                    if kind in ('reset', 'truncate') and sent >= after:
+                        if kind == 'reset':  # SO_LINGER为0时关闭连接会发送RST
+                            self.connection.setsockopt(SOL_SOCKET, SO_LINGER, pack('ii', 1, 0))
+                        break
+                    if kind == 'stall' and not stalled and sent >= after:
+                        stalled = True
+                        sleep(params.get('seconds', 10))
+
+                    end = sent + step
+                    if kind in ('reset', 'truncate', 'stall') and sent < after:
+                        end = min(end, after)
+                    self.wfile.write(part[sent:end])
+                    sent = min(end, len(part))
+
+                    if kind == 'slow' and rate:
+                        wait = sent / rate - (perf_counter() - start)
+                        if wait > 0:
+                            sleep(wait)
+                self.wfile.flush()
+            except (ConnectionError, OSError):  # 客户端已断开
+                self.close_connection = True
+            return sent
+
+        def _send_empty(self, code, retry_after=None):
+            """发送没有响应体的响应
+            :param code: 状态码
+            :param retry_after: Retry-After响应头的值
+            :return: None
+            """
+            self.send_response(code)
+            if retry_after is not None:
+                self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    return Handler
+
+
+def _parse_range(txt, total):
+    """解析Range请求头，多个范围时只使用第一个
+    :param txt: Range请求头的值
+    :param total: 文件大小
+    :return: [开始, 结束]，没有或不能解析时返回None
+    """
+    if not txt:
+        return None
+    r = match(r'\s*bytes=\s*(\d*)-(\d*)', txt)
+    if not r or (not r.group(1) and not r.group(2)):
+        return None
+    if not r.group(1):  # 文件最后多少字节
+        return [max(0, total - int(r.group(2))), total - 1]
+    start = int(r.group(1))
+    end = int(r.group(2)) if r.group(2) else total - 1
+    return [start, min(end, total - 1)]
+
+
+def _parse_fault(txt):
+    """解析命令行的故障规则，格式为'路径:类型[:参数=值...]'，如'/a.bin:reset:after=65536:times=2'
+    :param txt: 规则文本
+    :return: add_fault()的参数dict
+    """
+    parts = txt.split(':')
+    if len(parts) < 2:
+        raise ValueError(f'故障规则格式不正确：{txt}')
+    kwargs = {'path': parts[0], 'kind': parts[1]}
+    for item in parts[2:]:
+        k, v = item.split('=', 1)
+        if k == 'range':
+            s, e = v.split('-', 1)
+            kwargs['range_'] = (int(s), int(e))
+        elif k == 'ranged':
+            kwargs['ranged'] = v.lower() in ('1', 'true', 'yes')
+        else:
+            kwargs[k] = float(v) if '.' in v else int(v)
+    return kwargs
+
+
+def main(args=None):
+    """命令行启动故障注入服务器"""
+    from argparse import ArgumentParser
+    parser = ArgumentParser(prog='python -m DownloadKit.faultserver', description='可注入故障的本地文件服务器。')
+    parser.add_argument('root', help='文件所在文件夹')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='端口')
+    parser.add_argument('-f', '--fault', action='append', default=[],
+                        help="故障规则，格式为'路径:类型[:参数=值...]'，如'*.bin:reset:after=65536:times=2'，可多次使用")
+    args = parser.parse_args(args)
+
+    server = FaultServer(args.root, host=args.host, port=args.port)
+    for i in args.fault:
+        server.add_fault(**_parse_fault(i))
+    print(f'服务器地址：{server.base_url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(server.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread, Lock
+from typing import Union, Optional, Dict, List, Tuple, Type, Literal
+
+FAULTS: tuple = ...
+FAULT_KIND = Literal['reset', 'truncate', 'stall', 'status', 'wrong_length', 'no_ranges', 'slow']
+
+
+class FaultServer(object):
+    root: Optional[Path] = ...
+    files: Dict[str, bytes] = ...
+    log: List[dict] = ...
+    _faults: List[dict] = ...
+    _lock: Lock = ...
+    _server: _Server = ...
+    _thread: Optional[Thread] = ...
+
+    def __init__(self,
+                 root: Union[str, Path, None] = None,
+                 files: Optional[Dict[str, bytes]] = None,
+                 host: str = '127.0.0.1',
+                 port: int = 0): ...
+
+    def __enter__(self) -> FaultServer: ...
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None: ...
+
+    @property
+    def port(self) -> int: ...
+
+    @property
+    def base_url(self) -> str: ...
+
+    def url(self, path: str) -> str: ...
+
+    def start(self) -> FaultServer: ...
+
+    def stop(self) -> None: ...
+
+    def add_file(self, path: str, data: bytes) -> None: ...
+
+    def add_fault(self,
+                  path: str,
+                  kind: FAULT_KIND,
+                  times: Optional[int] = None,
+                  ranged: Optional[bool] = None,
+                  range_: Optional[Tuple[int, int]] = None,
+                  **params) -> dict: ...
+
+    def clear_faults(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+    def _get_data(self, path: str) -> Optional[bytes]: ...
+
+    def _take_fault(self, path: str, start: Optional[int]) -> Optional[dict]: ...
+
+    def _record(self, path: str, range_: Optional[list], status: int, fault: Optional[str], size: int,
+                seconds: float) -> None: ...
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads: bool = ...
+
+    def handle_error(self, request, client_address) -> None: ...
+
+
+def _handler(fault_server: FaultServer) -> Type[BaseHTTPRequestHandler]: ...
+
+
+def _parse_range(txt: Optional[str], total: int) -> Optional[List[int]]: ...
+
+
+def _parse_fault(txt: str) -> dict: ...
+
+
+def main(args: Optional[list] = None) -> None: ...
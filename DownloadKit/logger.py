@@ -0,0 +1,190 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   logger.py
+"""
+from atexit import register, unregister
+from csv import writer
+from datetime import datetime
+from io import StringIO
+from json import dumps
+from pathlib import Path
+from queue import Queue, Empty
+from threading import Thread, Lock
+from time import perf_counter
+
+from DataRecorder import Recorder
+
+WRITER_SUFFIXES = ('.jsonl', '.csv', '.log')  # 由LogWriter写入的日志格式
+RECORDER_SUFFIXES = ('.xlsx', '.txt', '.json')  # 由DataRecorder写入的日志格式
+
+
+class LogWriter(object):
+    FIELDS = ('time', 'event', 'id', 'url', 'result', 'info', 'path', 'size',
+              'bytes', 'duration', 'speed', 'retries', 'goal_path', 'rename')
+
+    def __init__(self, path, max_size=None, interval=None, queue_size=10000, batch=500, flush_interval=1):
+        """在后台线程中批量写入日志的记录器，支持jsonl和csv格式，格式由文件后缀名决定
+        :param path: 日志文件路径，后缀为.csv时使用csv格式，否则使用jsonl格式
+        :param max_size: 文件超过多少字节时另起新文件，None为不限制
+        :param interval: 文件使用超过多少秒时另起新文件，None为不限制
+        :param queue_size: 等待写入的记录最大条数，超过时添加记录会等待
+        :param batch: 每次最多写入多少条
+        :param flush_interval: 最长多少秒写入一次
+        """
+        self._path = Path(path).absolute()
+        self._csv = self._path.suffix.lower() == '.csv'
+        self.max_size = max_size
+        self.interval = interval
+        self._batch = batch
+        self._flush_interval = flush_interval
+        self._queue = Queue(queue_size)
+        self._file = None
+        self._size = 0
+        self._open_time = 0
+        self._closed = False
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        register(self.close)
+
+    @property
+    def path(self):
+        """返回当前日志文件路径"""
+        return self._path
+
+    def add(self, record):
+        """添加一条记录
+        :param record: 记录内容dict，键见FIELDS
+        :return: None
+        """
+        if not self._closed:
+            self._queue.put(record)
+
+    def flush(self):
+        """等待已添加的记录全部写入文件"""
+        self._queue.join()
+
+    def close(self):
+        """写入剩余记录并关闭文件"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        unregister(self.close)
+
+    def _run(self):
+        """后台线程函数，批量取出记录并写入文件"""
+        while True:
+            try:
+                records = [self._queue.get(timeout=self._flush_interval)]
+            except Empty:
+                continue
+
+            while len(records) < self._batch:
+                try:
+                    records.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            end = records[-1] is None
+            if end:
+                records.pop()
+            if records:
+                try:
+                    self._write(records)
+                except Exception as e:
+                    print(f'日志写入失败：{e}')
+
+            for _ in range(len(records) + end):
+                self._queue.task_done()
+            if end:
+                if self._file:
+                    self._file.close()
+                return
+
+    def _write(self, records):
+        """把一批记录写入文件，必要时先另起新文件
+        :param records: 记录dict组成的列表
+        :return: None
+        """
+        if self._file is None:
+            self._open()
+        elif (self.max_size and self._size >= self.max_size) \
+                or (self.interval and perf_counter() - self._open_time >= self.interval):
+            self._rotate()
+
+        if self._csv:
+            buffer = StringIO()
+            w = writer(buffer)
+            for r in records:
+                w.writerow(['' if r.get(k, None) is None else r[k] for k in self.FIELDS])
+            txt = buffer.getvalue()
+        else:
+            txt = ''.join(f'{dumps(r, ensure_ascii=False, default=str)}\n' for r in records)
+
+        self._file.write(txt)
+        self._file.flush()
+        self._size += len(txt.encode('utf-8'))
+
+    def _open(self):
+        """打开日志文件，新的csv文件会写入表头"""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._path, 'a', encoding='utf-8', newline='')
+        self._size = self._file.tell()
+        self._open_time = perf_counter()
+        if self._csv and self._size == 0:
+            w = writer(self._file)
+            w.writerow(self.FIELDS)
+
+    def _rotate(self):
+        """把当前文件改名保存，另起新文件"""
+        self._file.close()
+        name = f'{self._path.stem}_{datetime.now().strftime("%Y%m%d%H%M%S")}{self._path.suffix}'
+        target = self._path.with_name(name)
+        num = 1
+        while target.exists():
+            target = self._path.with_name(f'{self._path.stem}_{datetime.now().strftime("%Y%m%d%H%M%S")}_{num}'
+                                          f'{self._path.suffix}')
+            num += 1
+        self._path.rename(target)
+        self._open()
+
+
+class RecorderLog(object):
+    def __init__(self, path):
+        """用DataRecorder的Recorder写入日志，用于xlsx、txt、json等LogWriter不支持的格式，接口与LogWriter相同
+        :param path: 日志文件路径
+        """
+        self._path = Path(path).absolute()
+        self._recorder = Recorder(str(self._path))
+        self._recorder.show_msg = False
+        if self._path.suffix.lower() == '.xlsx':
+            self._recorder.set.head(LogWriter.FIELDS)
+        self._lock = Lock()
+        register(self.close)
+
+    @property
+    def path(self):
+        """返回日志文件路径"""
+        return self._path
+
+    def add(self, record):
+        """添加一条记录
+        :param record: 记录内容dict，键见LogWriter.FIELDS
+        :return: None
+        """
+        with self._lock:
+            self._recorder.add_data([record.get(k, None) for k in LogWriter.FIELDS])
+
+    def flush(self):
+        """把缓存的记录写入文件"""
+        with self._lock:
+            self._recorder.record()
+
+    def close(self):
+        """写入剩余记录"""
+        self.flush()
+        unregister(self.close)
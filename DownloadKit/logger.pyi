@@ -0,0 +1,73 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from io import TextIOWrapper
+from pathlib import Path
+from queue import Queue
+from threading import Thread, Lock
+from typing import Union, Optional, List, Tuple
+
+from DataRecorder import Recorder
+
+WRITER_SUFFIXES: Tuple[str, ...] = ...
+RECORDER_SUFFIXES: Tuple[str, ...] = ...
+
+
+class LogWriter(object):
+    FIELDS: Tuple[str, ...] = ...
+    _path: Path = ...
+    _csv: bool = ...
+    max_size: Optional[int] = ...
+    interval: Optional[float] = ...
+    _batch: int = ...
+    _flush_interval: float = ...
+    _queue: Queue = ...
+    _file: Optional[TextIOWrapper] = ...
+    _size: int = ...
+    _open_time: float = ...
+    _closed: bool = ...
+    _thread: Thread = ...
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 max_size: Optional[int] = None,
+                 interval: Optional[float] = None,
+                 queue_size: int = 10000,
+                 batch: int = 500,
+                 flush_interval: float = 1): ...
+
+    @property
+    def path(self) -> Path: ...
+
+    def add(self, record: dict) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+    def _run(self) -> None: ...
+
+    def _write(self, records: List[dict]) -> None: ...
+
+    def _open(self) -> None: ...
+
+    def _rotate(self) -> None: ...
+
+
+class RecorderLog(object):
+    _path: Path = ...
+    _recorder: Recorder = ...
+    _lock: Lock = ...
+
+    def __init__(self, path: Union[str, Path]): ...
+
+    @property
+    def path(self) -> Path: ...
+
+    def add(self, record: dict) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
@@ -0,0 +1,89 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   memory.py
+"""
+from threading import Condition
+
+
+class MemoryBudget(object):
+    def __init__(self, limit):
+        """所有任务共用的内存额度，记录器缓存和后台写入队列中的数据都计入，超出时强制写入或让下载线程等待
+        :param limit: 最多缓存多少字节
+        """
+        self.limit = limit
+        self.mission_size = max(1, min(limit // 4, 13107200))  # 一个任务的记录器缓存到此大小时写入文件
+        self._cond = Condition()
+        self._recorders = {}  # {任务: 记录器中缓存的字节数}
+        self._flushing = set()  # 正在被强制写入的任务
+        self._writer_size = 0  # 后台写入队列中的字节数
+        self.peak = 0
+        self.waits = 0  # 下载线程等待的次数
+        self.forced = 0  # 强制写入的次数
+
+    @property
+    def used(self):
+        """返回已使用的字节数"""
+        return sum(self._recorders.values()) + self._writer_size
+
+    def acquire(self, mission, size, recorder=True):
+        """登记将要缓存的数据，超出额度时先强制写入缓存最多的任务，仍不够时等待其它数据写入
+        :param mission: 数据所属任务
+        :param size: 字节数
+        :param recorder: 数据放入记录器还是后台写入队列
+        :return: None
+        """
+        with self._cond:
+            while True:
+                used = self.used
+                if not used or used + size <= self.limit:  # 单块数据超过额度时也放行，避免永远等待
+                    break
+                victim = max((m for m in self._recorders if m not in self._flushing and self._recorders[m]),
+                             key=self._recorders.get, default=None)
+                if victim is None:
+                    self.waits += 1
+                    self._cond.wait(.1)
+                    continue
+                self._flushing.add(victim)
+                self.forced += 1
+                self._cond.release()
+                try:
+                    victim._record_buffer()
+                except Exception:  # 写入错误留给任务自己结束时处理
+                    pass
+                finally:
+                    self._cond.acquire()
+                    self._flushing.discard(victim)
+
+            if recorder:
+                self._recorders[mission] = self._recorders.get(mission, 0) + size
+            else:
+                self._writer_size += size
+            self.peak = max(self.peak, self.used)
+
+    def release(self, mission, size, recorder=True):
+        """归还已写入或已丢弃的数据占用的额度
+        :param mission: 数据所属任务
+        :param size: 字节数
+        :param recorder: 数据来自记录器还是后台写入队列
+        :return: None
+        """
+        with self._cond:
+            if recorder:
+                left = self._recorders.get(mission, 0) - size
+                if left > 0:
+                    self._recorders[mission] = left
+                else:
+                    self._recorders.pop(mission, None)
+            else:
+                self._writer_size -= size
+            self._cond.notify_all()
+
+    def stats(self):
+        """返回额度、已使用、峰值、记录器和后台写入队列中的字节数、等待和强制写入次数"""
+        with self._cond:
+            recorders = sum(self._recorders.values())
+            return {'limit': self.limit, 'used': recorders + self._writer_size, 'peak': self.peak,
+                    'recorders': recorders, 'writer': self._writer_size,
+                    'missions': len(self._recorders), 'waits': self.waits, 'forced': self.forced}
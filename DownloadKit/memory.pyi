@@ -0,0 +1,32 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from threading import Condition
+from typing import Dict, Set
+
+from .mission import Mission
+
+
+class MemoryBudget(object):
+    limit: int = ...
+    mission_size: int = ...
+    _cond: Condition = ...
+    _recorders: Dict[Mission, int] = ...
+    _flushing: Set[Mission] = ...
+    _writer_size: int = ...
+    peak: int = ...
+    waits: int = ...
+    forced: int = ...
+
+    def __init__(self, limit: int): ...
+
+    @property
+    def used(self) -> int: ...
+
+    def acquire(self, mission: Mission, size: int, recorder: bool = True) -> None: ...
+
+    def release(self, mission: Mission, size: int, recorder: bool = True) -> None: ...
+
+    def stats(self) -> dict: ...
@@ -0,0 +1,113 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   mirrors.py
+"""
+from random import choices
+from re import search
+from threading import Lock
+
+
+class Mirrors(object):
+    def __init__(self, urls, check_etag=False):
+        """管理一个文件的多个下载来源，按实测速度分配分块，并记录出错情况
+        :param urls: 来源url列表，第一个为主地址
+        :param check_etag: 是否要求各来源ETag一致
+        """
+        self._urls = list(urls)
+        self._stats = {u: {'speed': None, 'errors': 0, 'running': 0, 'bad': False} for u in self._urls}
+        self._lock = Lock()
+        self.check_etag = check_etag
+        self.size = None
+        self.etag = None
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def urls(self):
+        """返回所有来源url"""
+        return self._urls
+
+    @property
+    def stats(self):
+        """返回各来源的速度（字节/秒）、出错次数、正在使用数和是否已停用"""
+        with self._lock:
+            return {u: s.copy() for u, s in self._stats.items()}
+
+    def set_reference(self, size, etag):
+        """设置用于校验其它来源的文件大小和ETag
+        :param size: 文件大小
+        :param etag: ETag
+        :return: None
+        """
+        self.size = size
+        self.etag = etag
+
+    def choose(self, exclude=()):
+        """按速度加权选择一个来源，速度越快、出错越少、正在使用越少的来源越容易被选中
+        :param exclude: 不参与选择的url
+        :return: url，没有可用来源时返回None
+        """
+        with self._lock:
+            candidates = [u for u in self._urls if u not in exclude and not self._stats[u]['bad']]
+            if not candidates:
+                return None
+
+            known = [self._stats[u]['speed'] for u in candidates if self._stats[u]['speed']]
+            default = max(known) if known else 1.  # 未测速的来源按最快的计算，使其有机会被测速
+            weights = [(self._stats[u]['speed'] or default)
+                       / (1 + self._stats[u]['errors'])
+                       / (1 + self._stats[u]['running']) for u in candidates]
+            url = choices(candidates, weights)[0]
+            self._stats[url]['running'] += 1
+            return url
+
+    def record(self, url, size, seconds, success):
+        """记录一次下载的结果
+        :param url: 来源url
+        :param size: 下载的字节数
+        :param seconds: 用时
+        :param success: 是否成功
+        :return: None
+        """
+        with self._lock:
+            s = self._stats[url]
+            s['running'] = max(0, s['running'] - 1)
+            if size and seconds > 0:
+                speed = size / seconds
+                s['speed'] = speed if s['speed'] is None else s['speed'] * .7 + speed * .3
+            if success:
+                s['errors'] = max(0, s['errors'] - 1)
+            else:
+                s['errors'] += 1
+                if s['errors'] >= 3:
+                    s['bad'] = True
+
+    def mark_bad(self, url):
+        """停用一个来源
+        :param url: 来源url
+        :return: None
+        """
+        with self._lock:
+            self._stats[url]['bad'] = True
+            self._stats[url]['running'] = max(0, self._stats[url]['running'] - 1)
+
+    def check(self, response):
+        """检查某个来源返回的分块数据是否与参考文件一致
+        :param response: 带Range请求返回的Response对象
+        :return: 是否一致
+        """
+        if response.status_code != 206:  # 不支持分块的来源不能用于下载分块
+            return False
+
+        r = search(r'/(\d+)', response.headers.get('Content-Range', ''))
+        if self.size and r and int(r.group(1)) != self.size:
+            return False
+
+        etag = response.headers.get('ETag', None)
+        if self.check_etag and self.etag and etag and etag != self.etag:
+            return False
+
+        return True
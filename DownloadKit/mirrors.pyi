@@ -0,0 +1,38 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from threading import Lock
+from typing import List, Dict, Optional, Iterable
+
+from requests import Response
+
+
+class Mirrors(object):
+    _urls: List[str] = ...
+    _stats: Dict[str, dict] = ...
+    _lock: Lock = ...
+    check_etag: bool = ...
+    size: Optional[int] = ...
+    etag: Optional[str] = ...
+
+    def __init__(self, urls: Iterable[str], check_etag: bool = False): ...
+
+    def __len__(self) -> int: ...
+
+    @property
+    def urls(self) -> List[str]: ...
+
+    @property
+    def stats(self) -> Dict[str, dict]: ...
+
+    def set_reference(self, size: Optional[int], etag: Optional[str]) -> None: ...
+
+    def choose(self, exclude: Iterable[str] = ()) -> Optional[str]: ...
+
+    def record(self, url: str, size: int, seconds: float, success: bool) -> None: ...
+
+    def mark_bad(self, url: str) -> None: ...
+
+    def check(self, response: Response) -> bool: ...
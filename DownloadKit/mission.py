@@ -4,17 +4,22 @@
 @Contact :   g1879@qq.com
 """
 from pathlib import Path
+from threading import Lock
 from time import sleep, perf_counter
 from urllib.parse import quote, urlparse
 
 from DataRecorder import ByteRecorder
 from requests.structures import CaseInsensitiveDict
 
-from ._funcs import copy_session, set_session_cookies
+from ._funcs import copy_session, ByteCounter
+from .encoding import decode_file
+from .mirrors import Mirrors
+from .ranges import parse_ranges
 
 
 class MissionData(object):
-    def __init__(self, url, goal_path, rename, file_exists, split, kwargs, offset=0):
+    def __init__(self, url, goal_path, rename, file_exists, split, kwargs, offset=0, mirrors=None,
+                 ranges=None, to_memory=False, delta=None, then=None, extract=False):
         """保存任务数据的对象
         :param url: 下载文件url
         :param goal_path: 保存文件夹
@@ -23,14 +28,26 @@ class MissionData(object):
         :param split: 是否允许分块下载
         :param kwargs: requests其它参数
         :param offset: 文件存储偏移量
+        :param mirrors: 镜像url列表
+        :param ranges: 要下载的数据范围列表，None为下载整个文件
+        :param to_memory: 是否把数据范围保存在内存中
+        :param delta: 分块校验文件的url、路径或内容，用于只下载与本地文件不同的块
+        :param then: 下载成功后处理文件的函数
+        :param extract: 是否边下载边解压，为str时是解压到的文件夹
         """
         self.url = quote(url, safe='/:&?=%;#@+![]')
+        self.mirrors = [quote(i, safe='/:&?=%;#@+![]') for i in mirrors] if mirrors else []
         self.goal_path = goal_path
         self.rename = rename
         self.file_exists = file_exists
         self.split = split
         self.kwargs = kwargs
         self.offset = offset
+        self.ranges = parse_ranges(ranges) if ranges is not None else None
+        self.to_memory = to_memory
+        self.delta = delta
+        self.then = then
+        self.extract = extract
 
 
 class BaseTask(object):
@@ -42,7 +59,7 @@ class BaseTask(object):
         :param ID: 任务id
         """
         self._id = ID
-        self.state = 'waiting'  # 'waiting'、'running'、'done'
+        self.state = 'waiting'  # 'waiting'、'running'、'paused'、'done'
         self.result = None  # 'success'、'skipped'、'canceled'、False、None
         self.info = '等待下载'  # 信息
 
@@ -65,7 +82,7 @@ class BaseTask(object):
         """设置任务结果值
         :param result: 结果：'success'、'skipped'、'canceled'、False、None
         :param info: 任务信息
-        :param state: 任务状态：'waiting'、'running'、'done'
+        :param state: 任务状态：'waiting'、'running'、'paused'、'done'
         :return: None
         """
         self.result = result
@@ -75,16 +92,21 @@ class BaseTask(object):
 
 class Mission(BaseTask):
     def __init__(self, ID, download_kit, file_url, goal_path, rename,
-                 file_exists, split, kwargs):
+                 file_exists, split, kwargs, ranges=None, to_memory=False, delta=None, then=None, extract=False):
         """任务类
         :param ID: 任务id
         :param download_kit: 所属DownloadKit对象
-        :param file_url: 文件网址
+        :param file_url: 文件网址，传入list或tuple时第一个为主地址，其余为镜像
         :param goal_path: 保存文件夹路径
         :param rename: 重命名
         :param file_exists: 存在同名文件处理方式
         :param split: 是否分块下载
         :param kwargs: 连接参数
+        :param ranges: 只下载的数据范围列表
+        :param to_memory: 是否把数据范围保存在content属性中而不写入文件
+        :param delta: 分块校验文件的url、路径或内容
+        :param then: 下载成功后处理文件的函数，接收文件路径
+        :param extract: 是否边下载边解压，为str时是解压到的文件夹
         """
         super().__init__(ID)
         self.download_kit = download_kit
@@ -97,10 +119,47 @@ class Mission(BaseTask):
         self.file_name = None
         self._path = None  # 文件完整路径，Path对象
         self._recorder = None
+        self._buffered = 0  # 记录器中缓存的字节数，只在设置了内存额度时统计
+        self._buffer_lock = Lock()
+        self._writer = download_kit._writer
+        self._writer_device = None
+        self._counter = ByteCounter()
+        self.retries = 0  # 连接重试次数
+        self._add_time = perf_counter()
+        self._space_device = None  # 预留硬盘空间的文件系统
+        self._preallocated = False  # 文件是否已预先分配空间
+        self._prefetched = False  # 是否已预先建立连接
+        self.head_info = None  # 预先发送HEAD请求获取的信息
+        self.delta_info = None  # 增量更新时的分块统计
+        self._start_time = None
+        self._end_time = None
+        self.ranges = None  # 指定数据范围时，换算后的实际位置
+        self.content = None  # 数据范围保存在内存时的数据列表
+        self._paused = False
+        self._parked = []  # 暂停时停下的任务或子任务，继续时重新加入运行
+        self._pause_lock = Lock()
+        self._post_future = None  # 下载后处理的Future对象
+        self.content_encoding = None  # 响应的Content-Encoding
+        self.content_hash = None  # 使用内容仓库时文件的哈希值
+        self.store_hit = False  # 是否直接使用了内容仓库中的文件
+        self._hasher = None  # 边下载边计算哈希的对象
+        self._etag = None
+        self._volume = None  # 使用多个存储卷时所在的卷
+        self._volume_sub = None  # 使用多个存储卷时卷文件夹下的相对路径，不使用时为None
+        self.extracted = None  # 边下载边解压时解压出的文件路径列表
+
+        if isinstance(file_url, (list, tuple)):
+            file_url, mirrors = file_url[0], file_url[1:]
+        else:
+            mirrors = None
 
         self.session = self._set_session()
         kwargs = self._handle_kwargs(file_url, kwargs)
-        self._data = MissionData(file_url, goal_path, rename, file_exists, split, kwargs)
+        self._data = MissionData(file_url, goal_path, rename, file_exists, split, kwargs, mirrors=mirrors,
+                                 ranges=ranges, to_memory=to_memory, delta=delta, then=then,
+                                 extract=extract)
+        self.mirrors = Mirrors([self._data.url] + self._data.mirrors, download_kit._check_etag) \
+            if self._data.mirrors else None
         self.method = 'post' if (self._data.kwargs.get('data', None) is not None or
                                  self._data.kwargs.get('json', None) is not None) else 'get'
 
@@ -121,8 +180,11 @@ class Mission(BaseTask):
     def recorder(self):
         """返回记录器对象"""
         if self._recorder is None:
-            self._recorder = ByteRecorder(cache_size=100)
+            # 设置了内存额度时由任务按缓存大小写入文件
+            self._recorder = _MissionRecorder(self, 100 if self.download_kit._memory is None else 0)
             self._recorder.show_msg = False
+            if self._path is not None:
+                self._recorder.set.path(self._path)
         return self._recorder
 
     @property
@@ -130,20 +192,107 @@ class Mission(BaseTask):
         """返回下载进度百分比"""
         if not self.size:
             return None
-        c = 0
-        for t in self.tasks:
-            c += t._downloaded_size if t._downloaded_size else 0
-        return round((c / self.size) * 100, 2)
+        return round((self._counter.value / self.size) * 100, 2)
 
-    def cancel(self) -> None:
-        """取消该任务，停止未下载完的task"""
-        self._break_mission('canceled', '已取消')
+    @property
+    def downloaded_size(self):
+        """返回已接收的字节数"""
+        return self._counter.value
+
+    @property
+    def is_paused(self):
+        """返回任务是否已暂停"""
+        return self._paused
+
+    @property
+    def post_state(self):
+        """返回下载后处理的状态，'waiting'、'running'、'done'，没有处理时返回None"""
+        f = self._post_future
+        if f is None:
+            return None
+        return 'done' if f.done() else 'running' if f.running() else 'waiting'
+
+    @property
+    def post_result(self):
+        """返回下载后处理函数的返回值，未结束或出错时返回None"""
+        f = self._post_future
+        return f.result() if f is not None and f.done() and not f.cancelled() and f.exception() is None else None
+
+    @property
+    def post_error(self):
+        """返回下载后处理时发生的异常，没有异常时返回None"""
+        f = self._post_future
+        if f is None or not f.done():
+            return None
+        return f.exception() if not f.cancelled() else RuntimeError('处理已取消')
+
+    def wait_post(self, timeout=None):
+        """等待下载后处理结束
+        :param timeout: 超时时间，None为无限
+        :return: 处理函数的返回值，没有处理、超时或出错时返回None
+        """
+        while self._post_future is None and not self.is_done:  # 下载未结束时先等下载
+            sleep(.1)
+        if self._post_future is None:
+            return None
+        try:
+            return self._post_future.result(timeout)
+        except Exception:
+            return None
+
+    def progress(self):
+        """返回任务进度快照，包括状态、大小、已接收字节数、进度百分比、速度（字节/秒）和预计剩余秒数"""
+        downloaded = self._counter.value
+        speed = self._counter.speed() if not self.is_done else None
+        eta = (self.size - downloaded) / speed if speed and self.size else None
+        return {'id': self.id,
+                'state': self.state,
+                'result': self.result,
+                'size': self.size,
+                'downloaded': downloaded,
+                'rate': round((downloaded / self.size) * 100, 2) if self.size else None,
+                'speed': speed,
+                'eta': eta}
+
+    def cancel(self, del_file=True) -> None:
+        """取消该任务，停止未下载完的task
+        :param del_file: 是否删除已下载的文件，文件已由其它进程接手时应为False
+        :return: None
+        """
+        self._break_mission('canceled', '已取消', del_file)
+
+    def pause(self):
+        """暂停该任务，正在下载的子任务在当前数据块结束后停下并让出线程，已下载的数据保留"""
+        if self.is_done or self._paused:
+            return
+        with self._pause_lock:
+            self._paused = True
+            self.set_states(result=None, info='已暂停', state='paused')
+
+        while any(i.state == 'running' for i in self.tasks):
+            sleep(.1)
+        if not self.is_done:
+            self._flush()
+
+    def resume(self):
+        """继续已暂停的任务，子任务从已下载的位置继续"""
+        with self._pause_lock:
+            if not self._paused:
+                return
+            self._paused = False
+            parked, self._parked = self._parked, []
+            if not self.is_done:
+                self.set_states(result=None, info='下载中' if self.tasks else '等待下载',
+                                state='running' if self.tasks else 'waiting')
+        for i in parked:
+            self.download_kit._run_or_wait(i)
 
     def del_file(self):
         """删除下载的文件"""
         if self.path and self.path.exists():
             try:
                 self.path.unlink()
+                self.download_kit._file_names.release(self.path)
             except Exception:
                 pass
 
@@ -166,11 +315,7 @@ class Mission(BaseTask):
         t1 = perf_counter()
         while not self.is_done and (perf_counter() - t1 < timeout or timeout == 0):
             if show and self.size:
-                try:
-                    rate = round((self.path.stat().st_size / self.size) * 100, 2)
-                    print(f'\r{rate}% ', end='')
-                except FileNotFoundError:
-                    pass
+                print(f'\r{self.rate}% ', end='')
 
             sleep(0.1)
 
@@ -189,9 +334,7 @@ class Mission(BaseTask):
     def _set_session(self):
         """复制Session对象，并设置coookies"""
         session = copy_session(self.download_kit.session)
-        if self.download_kit.page:
-            set_session_cookies(session, self.download_kit.page.get_cookies())
-            session.headers.update({"User-Agent": self.download_kit.page.user_agent})
+        self.download_kit._cookies_cache.set_session(session)
         return session
 
     def _handle_kwargs(self, url, kwargs):
@@ -224,7 +367,8 @@ class Mission(BaseTask):
             self.file_name = path.name
 
         self._path = path
-        self.recorder.set.path(path)
+        if self._recorder is not None:
+            self._recorder.set.path(path)
 
     def _set_done(self, result, info):
         """设置一个任务为done状态
@@ -232,23 +376,111 @@ class Mission(BaseTask):
         :param info: 任务信息
         :return: None
         """
+        self._end_time = perf_counter()
         if result == 'skipped':
             self.set_states(result=result, info=info, state=self._DONE)
 
         elif result == 'canceled' or result is False:
-            self.recorder.clear()
+            self._clear_cache()
             self.set_states(result=result, info=info, state=self._DONE)
 
         elif result == 'success':
-            self.recorder.record()
-            if self.size and self.path.stat().st_size < self.size:
+            try:
+                self._flush()
+            except Exception as e:
                 self.del_file()
-                self.set_states(False, '下载失败', self._DONE)
+                self.set_states(False, f'写入失败 {e}', self._DONE)
             else:
-                self.set_states('success', info, self._DONE)
+                if self.size and not self.data.extract and self._counter.value < self.size \
+                        and (self._preallocated or self.path.stat().st_size < self.size):
+                    self.del_file()
+                    self.set_states(False, '下载失败', self._DONE)
+                else:
+                    err = self._finish_file()
+                    if err:
+                        self.del_file()
+                        self.set_states(False, err, self._DONE)
+                    else:
+                        self.set_states('success', info, self._DONE)
 
         self.download_kit._when_mission_done(self)
 
+    def _finish_file(self):
+        """下载成功后解压文件，放入内容仓库
+        :return: 出错信息，没有出错时返回None
+        """
+        kit = self.download_kit
+        if self.content_encoding and kit._decompress and kit._encoding_mode == 'raw':
+            t = perf_counter()
+            try:  # 保存的是压缩数据，解压为原始内容
+                decode_file(self.path, self.content_encoding, self.data.offset)
+            except Exception as e:
+                return f'解压失败 {e}'
+            kit._trace('decode', self, t)
+
+        if kit._store is not None and not self.store_hit and self.data.ranges is None \
+                and not self.data.extract and self.data.file_exists != 'add' and self.path:
+            t = perf_counter()
+            try:
+                self.content_hash = kit._store.put(self.path, headers={'ETag': self._etag}, hasher=self._hasher)
+            except Exception:  # 放入仓库失败不影响已下载的文件，content_hash为None
+                pass
+            kit._trace('store', self, t)
+
+    def _write(self, data, seek=None):
+        """把数据交给记录器或后台写入器
+        :param data: 文件字节数据
+        :param seek: 在文件中的位置，None表示最后
+        :return: None
+        """
+        if self._hasher is not None:
+            self._hasher.update(data, seek)
+        if self._writer is not None:
+            self._writer.write(self, data, seek)
+            return
+
+        budget = self.download_kit._memory
+        if budget is None:
+            self.recorder.add_data(data, seek)
+            return
+
+        budget.acquire(self, len(data))
+        with self._buffer_lock:
+            self.recorder.add_data(data, seek)
+            self._buffered += len(data)
+            full = self._buffered >= budget.mission_size
+        if full:
+            self._record_buffer()
+
+    def _record_buffer(self):
+        """把记录器缓存的数据写入文件，归还占用的内存额度"""
+        with self._buffer_lock:
+            size, self._buffered = self._buffered, 0
+            try:
+                if self._recorder is not None:
+                    self._recorder.record()
+            finally:
+                if size:
+                    self.download_kit._memory.release(self, size)
+
+    def _flush(self):
+        """把缓存的数据全部写入文件"""
+        if self._writer is not None:
+            self._writer.flush(self)
+        elif self._recorder is not None:
+            self._record_buffer()
+
+    def _clear_cache(self):
+        """清除未写入文件的缓存"""
+        if self._writer is not None:
+            self._writer.discard(self)
+        elif self._recorder is not None:
+            with self._buffer_lock:
+                size, self._buffered = self._buffered, 0
+                self._recorder.clear()
+            if size:
+                self.download_kit._memory.release(self, size)
+
     def _a_task_done(self, is_success, info):
         """当一个task完成时调用
         :param is_success: 该task是否成功
@@ -266,10 +498,11 @@ class Mission(BaseTask):
         if self.done_tasks_count == self.tasks_count:
             self._set_done('success', info)
 
-    def _break_mission(self, result, info):
+    def _break_mission(self, result, info, del_file=True):
         """中止该任务，停止未下载完的task
         :param result: 结果：'success'、'skipped'、'canceled'、False、None
         :param info: 任务信息
+        :param del_file: 是否删除已下载的文件
         :return: None
         """
         if self.is_done:
@@ -282,8 +515,23 @@ class Mission(BaseTask):
         while any((not i.is_done for i in self.tasks)):
             sleep(.3)
 
+        with self._pause_lock:
+            self._paused = False
+            self._parked = []
         self._set_done(result, info)
-        self.del_file()
+        if del_file:
+            self.del_file()
+
+    def _park(self, item):
+        """暂停时停下一个任务或子任务，已继续时直接重新加入运行
+        :param item: Mission或Task对象
+        :return: None
+        """
+        with self._pause_lock:
+            if self._paused:
+                self._parked.append(item)
+                return
+        self.download_kit._run_or_wait(item)
 
 
 class Task(BaseTask):
@@ -298,6 +546,8 @@ class Task(BaseTask):
         self.range = range_
         self.size = size
         self._downloaded_size = 0
+        self._retries = 0  # 下载中途断开后重新连接的次数
+        self._queue_time = perf_counter()
 
     def __repr__(self):
         return f'<Task M{self.mid} T{self._id} {self.rate}% {self.info} {self.file_name}>'
@@ -333,12 +583,21 @@ class Task(BaseTask):
         :param seek: 在文件中的位置，None表示最后
         :return: None
         """
-        self._downloaded_size += len(data)
-        self.mission.recorder.add_data(data, seek)
+        self._add_size(len(data))
+        self.mission._write(data, seek)
+
+    def _add_size(self, size):
+        """记录已接收的字节数
+        :param size: 字节数
+        :return: None
+        """
+        self._downloaded_size += size
+        self.mission._counter.add(size)
+        self.mission.download_kit._counter.add(size)
 
     def clear_cache(self):
         """清除以接收但未写入硬盘的缓存"""
-        self.mission.recorder.clear()
+        self.mission._clear_cache()
 
     def _set_done(self, result, info):
         """设置一个子任务为done状态
@@ -348,3 +607,23 @@ class Task(BaseTask):
         """
         self.set_states(result=result, info=info, state=self._DONE)
         self.mission._a_task_done(result, info)
+
+
+class _MissionRecorder(ByteRecorder):
+    def __init__(self, mission, cache_size):
+        """任务使用的记录器，每次把缓存写入文件都记录为'flush'阶段
+        :param mission: 所属Mission对象
+        :param cache_size: 每接收多少条记录写入文件，0为不自动写入
+        """
+        super().__init__(cache_size=cache_size)
+        self._mission = mission
+
+    def record(self):
+        """把缓存的数据写入文件，返回文件路径"""
+        if not self._data or self._mission.download_kit._tracer is None:
+            return super().record()
+        size = sum(len(i[0]) for i in self._data)
+        t = perf_counter()
+        path = super().record()
+        self._mission.download_kit._trace('flush', self._mission, t, bytes=size)
+        return path
@@ -1,11 +1,17 @@
 # -*- coding:utf-8 -*-
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Union, List, Optional
+from threading import Lock
+from typing import Union, List, Optional, Callable, Any
 
 from DataRecorder import ByteRecorder
 from requests import Session
 
+from ._funcs import ByteCounter
 from .downloadKit import DownloadKit
+from .mirrors import Mirrors
+from .store import StreamHasher
+from .writer import DiskWriter
 
 
 class MissionData(object):
@@ -17,9 +23,21 @@ class MissionData(object):
     split: bool = ...
     kwargs: dict = ...
     offset: int = ...
+    mirrors: List[str] = ...
+    ranges: Optional[List[list]] = ...
+    to_memory: bool = ...
+    delta: Union[str, Path, bytes, None] = ...
+    then: Optional[Callable[[str], Any]] = ...
+    extract: Union[bool, str] = ...
 
     def __init__(self, url: str, goal_path: Union[str, Path], rename: Optional[str],
-                 file_exists: str, split: bool, kwargs: dict, offset: int = 0): ...
+                 file_exists: str, split: bool, kwargs: dict, offset: int = 0,
+                 mirrors: Optional[List[str]] = None,
+                 ranges: Optional[List[tuple]] = None,
+                 to_memory: bool = False,
+                 delta: Union[str, Path, bytes, None] = None,
+                 then: Optional[Callable[[str], Any]] = None,
+                 extract: Union[bool, str] = False): ...
 
 
 class BaseTask(object):
@@ -55,6 +73,20 @@ class Mission(BaseTask):
     _data: MissionData = ...
     _path: Optional[str, Path] = ...
     _recorder: Optional[ByteRecorder] = ...
+    _buffered: int = ...
+    _buffer_lock: Lock = ...
+    _counter: ByteCounter = ...
+    _writer: Optional[DiskWriter] = ...
+    _writer_device: Optional[int] = ...
+    retries: int = ...
+    _add_time: float = ...
+    _space_device: Optional[int] = ...
+    _preallocated: bool = ...
+    _prefetched: bool = ...
+    head_info: Optional[dict] = ...
+    delta_info: Optional[dict] = ...
+    _start_time: Optional[float] = ...
+    _end_time: Optional[float] = ...
     size: Optional[float] = ...
     done_tasks_count: int = ...
     tasks_count: int = ...
@@ -62,9 +94,28 @@ class Mission(BaseTask):
     download_kit: DownloadKit = ...
     session: Session = ...
     method: str = ...
-
-    def __init__(self, ID: int, download_kit: DownloadKit, file_url: str, goal_path: Union[str, Path], rename: str,
-                 file_exists: str, split: bool, kwargs: dict): ...
+    mirrors: Optional[Mirrors] = ...
+    ranges: Optional[List[list]] = ...
+    content: Optional[List[bytes]] = ...
+    _paused: bool = ...
+    _parked: List[Union[Mission, Task]] = ...
+    _pause_lock: Lock = ...
+    _post_future: Optional[Future] = ...
+    content_encoding: Optional[str] = ...
+    content_hash: Optional[str] = ...
+    store_hit: bool = ...
+    _hasher: Optional[StreamHasher] = ...
+    _etag: Optional[str] = ...
+    _volume: Optional[Path] = ...
+    _volume_sub: Optional[str] = ...
+    extracted: Optional[List[str]] = ...
+
+    def __init__(self, ID: int, download_kit: DownloadKit, file_url: Union[str, list, tuple],
+                 goal_path: Union[str, Path], rename: str, file_exists: str, split: bool, kwargs: dict,
+                 ranges: Optional[List[tuple]] = None, to_memory: bool = False,
+                 delta: Union[str, Path, bytes, None] = None,
+                 then: Optional[Callable[[str], Any]] = None,
+                 extract: Union[bool, str] = False): ...
 
     def __repr__(self) -> str: ...
 
@@ -86,13 +137,48 @@ class Mission(BaseTask):
     @property
     def rate(self) -> Optional[float]: ...
 
+    @property
+    def downloaded_size(self) -> int: ...
+
+    @property
+    def is_paused(self) -> bool: ...
+
+    @property
+    def post_state(self) -> Optional[str]: ...
+
+    @property
+    def post_result(self) -> Any: ...
+
+    @property
+    def post_error(self) -> Optional[BaseException]: ...
+
+    def wait_post(self, timeout: Optional[float] = None) -> Any: ...
+
+    def progress(self) -> dict: ...
+
     def _set_done(self, result: Optional[bool, str], info: str) -> None: ...
 
+    def _finish_file(self) -> Optional[str]: ...
+
+    def _write(self, data: bytes, seek: Optional[int] = None) -> None: ...
+
+    def _record_buffer(self) -> None: ...
+
+    def _flush(self) -> None: ...
+
+    def _clear_cache(self) -> None: ...
+
     def _a_task_done(self, is_success: bool, info: str) -> None: ...
 
-    def _break_mission(self, result: Optional[bool, str], info: str) -> None: ...
+    def _break_mission(self, result: Optional[bool, str], info: str, del_file: bool = True) -> None: ...
+
+    def cancel(self, del_file: bool = True) -> None: ...
+
+    def pause(self) -> None: ...
 
-    def cancel(self) -> None: ...
+    def resume(self) -> None: ...
+
+    def _park(self, item: Union[Mission, Task]) -> None: ...
 
     def del_file(self): ...
 
@@ -105,6 +191,8 @@ class Task(BaseTask):
     range: Optional[list] = ...
     size: Optional[int] = ...
     _downloaded_size: int = 0
+    _retries: int = ...
+    _queue_time: float = ...
 
     def __init__(self, mission: Mission, range_: Optional[list], ID: str, size: Optional[int]): ...
 
@@ -127,6 +215,16 @@ class Task(BaseTask):
 
     def add_data(self, data: bytes, seek: int = None) -> None: ...
 
+    def _add_size(self, size: int) -> None: ...
+
     def clear_cache(self) -> None: ...
 
     def _set_done(self, result: Optional[bool, str], info: str) -> None: ...
+
+
+class _MissionRecorder(ByteRecorder):
+    _mission: Mission = ...
+
+    def __init__(self, mission: Mission, cache_size: int): ...
+
+    def record(self) -> str: ...
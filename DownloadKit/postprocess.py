@@ -0,0 +1,85 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   postprocess.py
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from os import cpu_count
+from threading import Lock, Semaphore
+from time import perf_counter
+
+
+class PostProcessor(object):
+    def __init__(self, func=None, workers=None, kind='process', max_queue=None):
+        """下载成功后在进程池或线程池中处理文件，与下载同时进行
+        :param func: 默认处理函数，接收文件路径，使用进程池时须为模块顶层函数
+        :param workers: 进程或线程数，为None时使用cpu核数
+        :param kind: 'process'使用进程池，'thread'使用线程池
+        :param max_queue: 最多有多少个文件等待或正在处理，达到时下载线程等待，为None时为workers的2倍
+        """
+        if kind not in ('process', 'thread'):
+            raise ValueError("kind参数只能是'process'或'thread'。")
+        self.func = func
+        self.kind = kind
+        self.workers = workers or cpu_count() or 1
+        self.max_queue = max_queue or self.workers * 2
+        executor = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+        self._executor = executor(max_workers=self.workers)
+        self._slots = Semaphore(self.max_queue)
+        self._futures = set()
+        self._lock = Lock()
+
+    @property
+    def pending(self):
+        """返回等待或正在处理的文件数"""
+        return len(self._futures)
+
+    def submit(self, mission, func=None):
+        """把一个已下载的文件交给处理函数，等待处理的文件已达上限时阻塞
+        :param mission: 任务对象
+        :param func: 处理函数，为None时使用默认函数
+        :return: None
+        """
+        func = func or self.func
+        if func is None:
+            return
+        self._slots.acquire()
+        start = perf_counter()
+        try:
+            future = self._executor.submit(func, str(mission.path))
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.add(future)
+        mission._post_future = future
+        future.add_done_callback(lambda f: self._on_done(mission, f, start))
+
+    def wait(self, timeout=None):
+        """等待所有文件处理结束
+        :param timeout: 超时时间，None为无限
+        :return: 是否全部结束
+        """
+        with self._lock:
+            futures = list(self._futures)
+        return not wait(futures, timeout).not_done
+
+    def shutdown(self, wait_done=True):
+        """关闭进程池或线程池
+        :param wait_done: 是否等待已提交的文件处理结束
+        :return: None
+        """
+        self._executor.shutdown(wait_done)
+
+    def _on_done(self, mission, future, start):
+        """一个文件处理结束时调用
+        :param mission: 任务对象
+        :param future: Future对象
+        :param start: 提交时间
+        :return: None
+        """
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+        mission.download_kit._trace('post', mission, start, error=mission.post_error is not None)
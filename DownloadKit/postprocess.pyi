@@ -0,0 +1,38 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock, Semaphore
+from typing import Callable, Any, Optional, Literal, Union, Set
+
+from .mission import Mission
+
+
+class PostProcessor(object):
+    func: Optional[Callable[[str], Any]] = ...
+    kind: str = ...
+    workers: int = ...
+    max_queue: int = ...
+    _executor: Union[ProcessPoolExecutor, ThreadPoolExecutor] = ...
+    _slots: Semaphore = ...
+    _futures: Set[Future] = ...
+    _lock: Lock = ...
+
+    def __init__(self,
+                 func: Optional[Callable[[str], Any]] = None,
+                 workers: Optional[int] = None,
+                 kind: Literal['process', 'thread'] = 'process',
+                 max_queue: Optional[int] = None): ...
+
+    @property
+    def pending(self) -> int: ...
+
+    def submit(self, mission: Mission, func: Optional[Callable[[str], Any]] = None) -> None: ...
+
+    def wait(self, timeout: Optional[float] = None) -> bool: ...
+
+    def shutdown(self, wait_done: bool = True) -> None: ...
+
+    def _on_done(self, mission: Mission, future: Future, start: float) -> None: ...
@@ -0,0 +1,86 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   prefetch.py
+"""
+from threading import Thread
+from time import sleep
+from urllib.parse import urlparse
+
+from ._funcs import _get_file_name
+from .mission import Mission
+from .transport import DNS_CACHE, use_dns_cache
+
+
+class Prefetcher(object):
+    def __init__(self, download_kit, num=5, head=False):
+        """在当前任务下载时，为等待队列中的前几个任务预先解析域名并建立连接
+        :param download_kit: 所属DownloadKit对象
+        :param num: 处理等待队列中前多少个任务
+        :param head: 是否发送HEAD请求获取文件大小、文件名和是否支持分块，结果保存在任务的head_info属性
+        """
+        self._download_kit = download_kit
+        self.num = num
+        self.head = head
+        self._running = True
+        Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        """停止预处理线程"""
+        self._running = False
+
+    def _run(self):
+        """线程函数，不断检查等待队列前端的任务"""
+        queue = self._download_kit._waiting_list
+        while self._running:
+            with queue.mutex:
+                items = [i for i in list(queue.queue)[:self.num]
+                         if isinstance(i, Mission) and not i._prefetched]
+            if not items:
+                sleep(.1)
+                continue
+
+            for mission in items:
+                if not self._running:
+                    return
+                mission._prefetched = True
+                if not mission.is_done:
+                    try:
+                        self._prefetch(mission)
+                    except Exception:
+                        pass
+
+    def _prefetch(self, mission):
+        """为一个任务解析域名、建立连接或发送HEAD请求
+        :param mission: 任务对象
+        :return: None
+        """
+        kit = self._download_kit
+        url = mission.data.url
+        parsed = urlparse(url)
+        if parsed.scheme.lower() in kit._protocols:  # 非http协议
+            return
+        if DNS_CACHE.enabled and parsed.hostname:
+            DNS_CACHE.resolve(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+
+        if kit._proxy_pool is not None:  # 使用代理池时，连接时才能确定代理
+            return
+
+        if not self.head and kit._transport.name != 'requests':  # 其它传输层不使用Session的连接池
+            return
+
+        # HEAD请求用完的连接回到Session的连接池，任务开始时直接使用
+        use_dns_cache(mission.session)
+        kwargs = mission.data.kwargs
+        r = mission.session.head(url, headers=kwargs['headers'], timeout=kwargs.get('timeout', kit.timeout),
+                                 allow_redirects=self.head)
+        if self.head:
+            size = r.headers.get('Content-Length', None)
+            mission.head_info = {'status': r.status_code,
+                                 'size': None if size is None else int(size),
+                                 'name': _get_file_name(r) if r.ok else None,
+                                 'accept_ranges': r.headers.get('Accept-Ranges', None) == 'bytes',
+                                 'url': r.url}
+        r.content  # 读完空的响应体，连接才放回连接池而不是被关闭
+        r.close()
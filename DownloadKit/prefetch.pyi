@@ -0,0 +1,22 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from .downloadKit import DownloadKit
+from .mission import Mission
+
+
+class Prefetcher(object):
+    _download_kit: DownloadKit = ...
+    num: int = ...
+    head: bool = ...
+    _running: bool = ...
+
+    def __init__(self, download_kit: DownloadKit, num: int = 5, head: bool = False): ...
+
+    def stop(self) -> None: ...
+
+    def _run(self) -> None: ...
+
+    def _prefetch(self, mission: Mission) -> None: ...
@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from requests import Session
+from requests.structures import CaseInsensitiveDict
+
+
+class ProtocolResponse(object):
+    url: str = ...
+    status_code: int = ...
+    reason: str = ...
+    headers: CaseInsensitiveDict = ...
+    encoding: Optional[str] = ...
+    _stream: Any = ...
+    _left: Optional[int] = ...
+    _on_close: Optional[Callable[[bool], None]] = ...
+    _content: Optional[bytes] = ...
+    _closed: bool = ...
+    _eof: bool = ...
+
+    def __init__(self,
+                 url: str,
+                 status_code: int,
+                 headers: Optional[dict] = None,
+                 stream: Any = None,
+                 length: Optional[int] = None,
+                 on_close: Optional[Callable[[bool], None]] = None): ...
+
+    def __bool__(self) -> bool: ...
+
+    @property
+    def ok(self) -> bool: ...
+
+    @property
+    def apparent_encoding(self) -> str: ...
+
+    @property
+    def content(self) -> bytes: ...
+
+    def iter_content(self, chunk_size: int = 1, decode_unicode: bool = False) -> Iterator[bytes]: ...
+
+    def close(self) -> None: ...
+
+    def _read(self, size: int) -> bytes: ...
+
+
+class FileResponse(ProtocolResponse):
+    def write_into(self,
+                   path: Union[str, Path],
+                   offset: int,
+                   callback: Optional[Callable[[int], bool]] = None,
+                   limit: Optional[int] = None) -> str: ...
+
+
+class FileHandler(object):
+    schemes: Tuple[str, ...] = ...
+
+    def request(self, url: str, session: Session, method: str, **kwargs) -> Union[FileResponse, ProtocolResponse]: ...
+
+
+class FTPHandler(object):
+    schemes: Tuple[str, ...] = ...
+    passive: bool = ...
+    encoding: str = ...
+    timeout: Optional[float] = ...
+
+    def __init__(self, passive: bool = True, encoding: str = 'utf-8', timeout: Optional[float] = None): ...
+
+    def request(self, url: str, session: Session, method: str, **kwargs) -> ProtocolResponse: ...
+
+
+class S3Handler(object):
+    schemes: Tuple[str, ...] = ...
+    _client: Any = ...
+    _client_kwargs: dict = ...
+    _lock: Lock = ...
+
+    def __init__(self, client: Any = None, **client_kwargs): ...
+
+    @property
+    def client(self) -> Any: ...
+
+    def request(self, url: str, session: Session, method: str, **kwargs) -> ProtocolResponse: ...
+
+
+def default_handlers() -> Dict[str, Union[FileHandler, FTPHandler, S3Handler]]: ...
+
+
+def _get_range(kwargs: dict) -> Optional[str]: ...
+
+
+def _resolve_range(txt: Optional[str], size: Optional[int]) -> Tuple[int, int, Optional[int]]: ...
+
+
+def _make_headers(status: int, start: int, end: Optional[int], size: Optional[int]) -> dict: ...
+
+
+def _local_path(url: str) -> Path: ...
+
+
+def _copy(src: int, dst: int, src_pos: int, dst_pos: int, size: int) -> int: ...
@@ -0,0 +1,149 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   proxies.py
+"""
+from random import choices
+from threading import Condition
+from time import perf_counter
+
+
+class ProxyPool(object):
+    ERROR_CODES = (407, 429, 502, 503, 504)  # 视为代理出错的状态码
+
+    def __init__(self, proxies, max_conn=4, max_errors=3, cooldown=300, timeout=30):
+        """代理池，每个连接按实测速度选择代理，限制每个代理的并发数，停用出错过多的代理
+        :param proxies: 代理地址列表，如'http://127.0.0.1:1080'
+        :param max_conn: 每个代理最多同时使用的连接数
+        :param max_errors: 连续出错多少次后停用代理
+        :param cooldown: 停用多少秒后再给代理一次机会，为None时不再使用
+        :param timeout: 所有代理都达到并发上限时，最多等待多少秒
+        """
+        self.max_conn = max_conn
+        self.max_errors = max_errors
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self._cond = Condition()
+        self._stats = {}
+        for p in proxies:
+            self.add(p)
+
+    def __len__(self):
+        return len(self._stats)
+
+    @property
+    def stats(self):
+        """返回各代理的速度（字节/秒）、连续出错次数、正在使用数、累计字节数和是否已停用"""
+        with self._cond:
+            return {p: {k: v for k, v in s.items() if k != 'bad_time'} for p, s in self._stats.items()}
+
+    def add(self, proxy):
+        """添加一个代理
+        :param proxy: 代理地址
+        :return: None
+        """
+        with self._cond:
+            if proxy not in self._stats:
+                self._stats[proxy] = {'speed': None, 'errors': 0, 'running': 0, 'bytes': 0,
+                                      'bad': False, 'bad_time': None}
+            self._cond.notify_all()
+
+    def remove(self, proxy):
+        """移除一个代理，正在使用它的连接不受影响
+        :param proxy: 代理地址
+        :return: None
+        """
+        with self._cond:
+            self._stats.pop(proxy, None)
+            self._cond.notify_all()
+
+    def acquire(self):
+        """按速度加权选择一个代理，所有代理都达到并发上限时等待
+        :return: _Lease对象，没有可用代理时返回None
+        """
+        end_time = perf_counter() + self.timeout
+        with self._cond:
+            while True:
+                self._revive()
+                alive = [p for p, s in self._stats.items() if not s['bad']]
+                if not alive:
+                    return None
+
+                candidates = [p for p in alive if self._stats[p]['running'] < self.max_conn]
+                if candidates:
+                    break
+                left = end_time - perf_counter()
+                if left <= 0:
+                    return None
+                self._cond.wait(min(left, 1))
+
+            known = [self._stats[p]['speed'] for p in candidates if self._stats[p]['speed']]
+            default = max(known) if known else 1.  # 未测速的代理按最快的计算，使其有机会被测速
+            weights = [(self._stats[p]['speed'] or default)
+                       / (1 + self._stats[p]['errors'])
+                       / (1 + self._stats[p]['running']) for p in candidates]
+            proxy = choices(candidates, weights)[0]
+            self._stats[proxy]['running'] += 1
+            return _Lease(self, proxy)
+
+    def release(self, proxy, size, seconds, success):
+        """归还代理并记录本次使用结果
+        :param proxy: 代理地址
+        :param size: 传输的字节数
+        :param seconds: 用时
+        :param success: 是否成功
+        :return: None
+        """
+        with self._cond:
+            s = self._stats.get(proxy, None)
+            if s is not None:
+                s['running'] = max(0, s['running'] - 1)
+                s['bytes'] += size
+                if size and seconds > 0:
+                    speed = size / seconds
+                    s['speed'] = speed if s['speed'] is None else s['speed'] * .7 + speed * .3
+                if success:
+                    s['errors'] = 0
+                elif success is False:
+                    s['errors'] += 1
+                    if s['errors'] >= self.max_errors and not s['bad']:
+                        s['bad'] = True
+                        s['bad_time'] = perf_counter()
+            self._cond.notify_all()
+
+    def _revive(self):
+        """停用时间超过cooldown的代理重新启用，再出错一次即再次停用"""
+        if self.cooldown is None:
+            return
+        now = perf_counter()
+        for s in self._stats.values():
+            if s['bad'] and now - s['bad_time'] >= self.cooldown:
+                s['bad'] = False
+                s['bad_time'] = None
+                s['errors'] = self.max_errors - 1
+
+
+class _Lease(object):
+    def __init__(self, pool, proxy):
+        """一次代理使用，结束时须调用done()归还，对象被回收时会自动归还
+        :param pool: 所属ProxyPool对象
+        :param proxy: 代理地址
+        """
+        self._pool = pool
+        self.proxy = proxy
+        self._start = perf_counter()
+        self._done = False
+
+    def __del__(self):
+        self.done(0, None)
+
+    def done(self, size=0, success=True):
+        """归还代理，重复调用无效
+        :param size: 传输的字节数
+        :param success: 是否成功，为None时不影响出错计数
+        :return: None
+        """
+        if not self._done:
+            self._done = True
+            self._pool.release(self.proxy, size, perf_counter() - self._start, success)
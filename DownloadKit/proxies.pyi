@@ -0,0 +1,52 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from threading import Condition
+from typing import Dict, List, Optional, Tuple
+
+
+class ProxyPool(object):
+    ERROR_CODES: Tuple[int, ...] = ...
+    max_conn: int = ...
+    max_errors: int = ...
+    cooldown: Optional[float] = ...
+    timeout: float = ...
+    _cond: Condition = ...
+    _stats: Dict[str, dict] = ...
+
+    def __init__(self,
+                 proxies: List[str],
+                 max_conn: int = 4,
+                 max_errors: int = 3,
+                 cooldown: Optional[float] = 300,
+                 timeout: float = 30): ...
+
+    def __len__(self) -> int: ...
+
+    @property
+    def stats(self) -> Dict[str, dict]: ...
+
+    def add(self, proxy: str) -> None: ...
+
+    def remove(self, proxy: str) -> None: ...
+
+    def acquire(self) -> Optional[_Lease]: ...
+
+    def release(self, proxy: str, size: int, seconds: float, success: Optional[bool]) -> None: ...
+
+    def _revive(self) -> None: ...
+
+
+class _Lease(object):
+    _pool: ProxyPool = ...
+    proxy: str = ...
+    _start: float = ...
+    _done: bool = ...
+
+    def __init__(self, pool: ProxyPool, proxy: str): ...
+
+    def __del__(self) -> None: ...
+
+    def done(self, size: int = 0, success: Optional[bool] = True) -> None: ...
@@ -0,0 +1,247 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   ranges.py
+"""
+from re import search
+
+
+def parse_ranges(ranges):
+    """检查并整理用户传入的数据范围
+    :param ranges: (开始, 结束)组成的列表，结束位置包含在内，为None表示到文件末尾；开始为负数表示文件最后多少字节
+    :return: [开始, 结束]组成的列表
+    """
+    if not isinstance(ranges, (list, tuple)) or not ranges:
+        raise ValueError('ranges参数须为非空的list或tuple。')
+    result = []
+    for i in ranges:
+        if not isinstance(i, (list, tuple)) or len(i) != 2:
+            raise ValueError(f'数据范围格式不正确：{i}')
+        start, end = i
+        if not isinstance(start, int) or (end is not None and not isinstance(end, int)):
+            raise ValueError(f'数据范围格式不正确：{i}')
+        if start < 0 and end is not None:
+            raise ValueError(f'开始位置为负数时结束位置须为None：{i}')
+        if start >= 0 and end is not None and end < start:
+            raise ValueError(f'结束位置不能小于开始位置：{i}')
+        result.append([start, end])
+    return result
+
+
+def range_header(ranges):
+    """生成Range请求头的值
+    :param ranges: [开始, 结束]组成的列表
+    :return: Range请求头的值
+    """
+    txt = []
+    for start, end in ranges:
+        if start < 0:
+            txt.append(f'{start}')
+        else:
+            txt.append(f'{start}-{"" if end is None else end}')
+    return f'bytes={",".join(txt)}'
+
+
+def resolve_ranges(ranges, total):
+    """把数据范围换算成文件中的实际位置
+    :param ranges: [开始, 结束]组成的列表
+    :param total: 文件总大小，为None时不能换算的范围返回None
+    :return: [开始, 结束]或None组成的列表
+    """
+    result = []
+    for start, end in ranges:
+        if total is None:
+            result.append([start, end] if start >= 0 and end is not None else None)
+        elif start < 0:
+            result.append([max(0, total + start), total - 1])
+        elif start >= total:
+            result.append([start, start - 1])  # 超出文件范围，结果为空数据
+        else:
+            result.append([start, total - 1 if end is None else min(end, total - 1)])
+    return result
+
+
+def merge_ranges(ranges):
+    """合并重叠或相连的数据范围，用于减少请求数
+    :param ranges: 实际位置[开始, 结束]组成的列表
+    :return: 合并后按开始位置排序的列表
+    """
+    result = []
+    for start, end in sorted(i for i in ranges if i[1] >= i[0]):
+        if result and start <= result[-1][1] + 1:
+            result[-1][1] = max(result[-1][1], end)
+        else:
+            result.append([start, end])
+    return result
+
+
+def read_parts(response, ranges=None, write=None):
+    """读取带Range请求返回的数据
+    :param response: Response对象，状态码为206或200
+    :param ranges: 状态码为200时需要保留的数据范围列表，为None时保留全部数据
+    :param write: 接收(位置, 数据)的函数，指定时数据边接收边交给它，不保存在内存中
+    :return: (文件总大小或None, (开始位置, 数据)组成的列表)，指定write时数据换为字节数
+    """
+    info = {'total': None}
+    parts = []  # [开始位置, 数据或字节数]，相连的数据合并
+    for pos, data in _iter_parts(response, ranges, info):
+        if not data:
+            continue
+        if write is not None:
+            write(pos, data)
+            if parts and parts[-1][0] + parts[-1][1] == pos:
+                parts[-1][1] += len(data)
+            else:
+                parts.append([pos, len(data)])
+        elif parts and parts[-1][0] + len(parts[-1][1]) == pos:
+            parts[-1][1] += data
+        else:
+            parts.append([pos, bytearray(data)])
+    return info['total'], [(p, d if write is not None else bytes(d)) for p, d in parts]
+
+
+def cut_parts(parts, ranges):
+    """从收到的数据中取出每个范围的数据
+    :param parts: (开始位置, 数据或字节数)组成的列表
+    :param ranges: 实际位置[开始, 结束]或None组成的列表
+    :return: 与ranges对应的数据列表，parts中是字节数时为各范围的字节数，数据不完整的位置为None
+    """
+    result = []
+    for i in ranges:
+        if i is None:
+            result.append(None)
+            continue
+        start, end = i
+        if end < start:
+            result.append(0 if parts and isinstance(parts[0][1], int) else b'')
+            continue
+
+        data = bytearray()
+        pos = start
+        for s, d in sorted(parts, key=lambda p: p[0]):
+            length = d if isinstance(d, int) else len(d)
+            if s <= pos < s + length:
+                if not isinstance(d, int):
+                    data += d[pos - s:min(end + 1, s + length) - s]
+                pos = min(end + 1, s + length)
+                if pos > end:
+                    break
+        if pos <= end:
+            result.append(None)
+        elif parts and isinstance(parts[0][1], int):
+            result.append(end - start + 1)
+        else:
+            result.append(bytes(data))
+    return result
+
+
+def _iter_parts(response, ranges, info):
+    """逐段返回响应中的数据及其在文件中的位置
+    :param response: Response对象，状态码为206或200
+    :param ranges: 状态码为200时需要保留的数据范围列表，为None时保留全部数据
+    :param info: 用于记录文件总大小的dict
+    :return: (位置, 数据)的生成器
+    """
+    content_type = response.headers.get('Content-Type', '')
+    if response.status_code == 206 and 'multipart/byteranges' in content_type.lower():
+        r = search(r'boundary="?([^";]+)"?', content_type)
+        if not r:
+            raise ValueError('multipart响应缺少boundary。')
+        yield from _iter_multipart(response.iter_content(chunk_size=65536), r.group(1).strip(), info)
+        return
+
+    if response.status_code == 206:
+        start, info['total'] = _parse_content_range(response.headers.get('Content-Range', ''))
+        if start is None:
+            raise ValueError('响应缺少Content-Range。')
+        for chunk in response.iter_content(chunk_size=65536):
+            yield start, chunk
+            start += len(chunk)
+        return
+
+    # 服务器忽略了Range，从完整数据中截取需要的部分
+    total = response.headers.get('Content-Length', None)
+    total = int(total) if total is not None and 'Content-Encoding' not in response.headers else None
+    if ranges is None or total is None:
+        pos = 0
+        for chunk in response.iter_content(chunk_size=65536):
+            yield pos, chunk
+            pos += len(chunk)
+        info['total'] = pos
+        return
+
+    info['total'] = total
+    ranges = merge_ranges(resolve_ranges(ranges, total))
+    last = max(i[1] for i in ranges) if ranges else -1
+    pos = 0
+    for chunk in response.iter_content(chunk_size=65536):
+        end = pos + len(chunk)
+        for s, e in ranges:
+            if s < end and e >= pos:
+                yield max(s, pos), chunk[max(s, pos) - pos:min(e + 1, end) - pos]
+        pos = end
+        if pos > last:
+            break
+    response.close()
+
+
+def _parse_content_range(txt):
+    """解析Content-Range响应头
+    :param txt: 响应头的值
+    :return: (开始位置, 文件总大小)，不能解析的为None
+    """
+    r = search(r'bytes\s+(\d+)-(\d+)/(\d+|\*)', txt)
+    if not r:
+        r = search(r'bytes\s+\*/(\d+)', txt)
+        return None, int(r.group(1)) if r else None
+    return int(r.group(1)), None if r.group(3) == '*' else int(r.group(3))
+
+
+def _iter_multipart(chunks, boundary, info):
+    """流式解析multipart/byteranges格式的数据，每段数据不整段读入内存
+    :param chunks: 响应数据块的迭代器
+    :param boundary: 分隔标记
+    :param info: 用于记录文件总大小的dict
+    :return: (位置, 数据)的生成器
+    """
+    delimiter = f'--{boundary}'.encode()
+    chunks = iter(chunks)
+    buffer = b''
+    while True:
+        # 找到分隔标记和这一段的头部
+        while True:
+            pos = buffer.find(delimiter)
+            if pos != -1:
+                after = pos + len(delimiter)
+                if buffer[after:after + 2] == b'--':  # 结束标记
+                    return
+                head_end = buffer.find(b'\r\n\r\n', after)
+                if head_end != -1 and len(buffer) >= after + 2:
+                    break
+            elif len(buffer) > len(delimiter):  # 只保留可能是分隔标记开头的部分
+                buffer = buffer[-len(delimiter):]
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            buffer += chunk
+
+        head = buffer[after:head_end].decode('iso-8859-1')
+        r = search(r'(?i)content-range:\s*bytes\s+(\d+)-(\d+)/(\d+|\*)', head)
+        if not r:
+            raise ValueError('multipart数据缺少Content-Range。')
+        start, left = int(r.group(1)), int(r.group(2)) - int(r.group(1)) + 1
+        if r.group(3) != '*':
+            info['total'] = int(r.group(3))
+
+        buffer = buffer[head_end + 4:]
+        while left:
+            if not buffer:
+                buffer = next(chunks, None)
+                if buffer is None:
+                    return
+            data = buffer[:left]
+            buffer = buffer[len(data):]
+            yield start, data
+            start += len(data)
+            left -= len(data)
@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from requests import Response
+
+
+def parse_ranges(ranges: Union[List[tuple], Tuple[tuple, ...]]) -> List[list]: ...
+
+
+def range_header(ranges: List[list]) -> str: ...
+
+
+def resolve_ranges(ranges: List[list], total: Optional[int]) -> List[Optional[list]]: ...
+
+
+def merge_ranges(ranges: List[list]) -> List[list]: ...
+
+
+def read_parts(response: Response,
+               ranges: Optional[List[list]] = None,
+               write: Optional[Callable[[int, bytes], None]] = None) \
+        -> Tuple[Optional[int], List[Tuple[int, Union[bytes, int]]]]: ...
+
+
+def cut_parts(parts: List[Tuple[int, Union[bytes, int]]],
+              ranges: List[Optional[list]]) -> List[Union[bytes, int, None]]: ...
+
+
+def _iter_parts(response: Response, ranges: Optional[List[list]], info: dict) -> Iterator[Tuple[int, bytes]]: ...
+
+
+def _parse_content_range(txt: str) -> Tuple[Optional[int], Optional[int]]: ...
+
+
+def _iter_multipart(chunks: Iterable[bytes], boundary: str, info: dict) -> Iterator[Tuple[int, bytes]]: ...
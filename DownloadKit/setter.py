@@ -4,9 +4,23 @@
 @Contact :   g1879@qq.com
 @File    :   setter.py
 """
-from DataRecorder import Recorder
+from pathlib import Path
+
 from requests import Session
 
+from ._funcs import parse_size, DiskSpace
+from .encoding import ENCODING_MODES
+from .logger import LogWriter, RecorderLog, WRITER_SUFFIXES, RECORDER_SUFFIXES
+from .memory import MemoryBudget
+from .postprocess import PostProcessor
+from .prefetch import Prefetcher
+from .proxies import ProxyPool
+from .store import ContentStore
+from .tracer import Tracer
+from .volumes import Volumes
+from .transport import RequestsTransport, CurlTransport, DNS_CACHE
+from .writer import DiskWriter
+
 
 class Setter(object):
     def __init__(self, downloadKit):
@@ -31,6 +45,7 @@ class Setter(object):
         :return: None
         """
         self._downloadKit._copy_cookies = False
+        self._downloadKit._cookies_cache.clear()
         if isinstance(driver, Session):
             self._downloadKit._session = driver
             return
@@ -122,6 +137,152 @@ class Setter(object):
         """
         self._downloadKit.block_size = size
 
+    def transport(self, name):
+        """设置发送请求和接收数据的方式
+        :param name: 'requests'或'pycurl'，使用pycurl时所有连接由一个线程驱动，数据直接写入文件
+        :return: None
+        """
+        if self._downloadKit.is_running:
+            print('有任务未完成时不能改变transport。')
+            return
+        if name == 'requests':
+            self._downloadKit._transport = RequestsTransport()
+        elif name == 'pycurl':
+            self._downloadKit._transport = CurlTransport()
+            self._downloadKit._transport.decode_content = self._downloadKit._encoding_mode != 'raw'
+        else:
+            raise ValueError("name参数只能是'requests'或'pycurl'。")
+
+    def protocol(self, scheme, handler):
+        """设置处理某种url协议的对象，默认已支持file://、ftp://和s3://（需安装boto3）
+        :param scheme: 协议名称，如's3'
+        :param handler: 有request(url, session, method, **kwargs)方法的对象，返回与Response接口相同的对象，为None时删除
+        :return: None
+        """
+        scheme = scheme.lower().rstrip(':/')
+        if handler is None:
+            self._downloadKit._protocols.pop(scheme, None)
+        else:
+            self._downloadKit._protocols[scheme] = handler
+
+    def volumes(self, roots, policy='round_robin', max_writers=None):
+        """设置把文件分散保存到多个存储卷，add()未指定goal_path或指定相对路径时，开始下载时为每个任务选择一个卷
+        :param roots: 各卷上的保存文件夹列表，为None时关闭
+        :param policy: 'round_robin'轮流使用；'most_free'使用剩余空间最多的卷；'throughput'按已测得的速度和正在写入的任务数选择
+        :param max_writers: 每个卷最多同时写入多少个任务，都已达到时任务等待，None为不限制
+        :return: None
+        """
+        if self._downloadKit.is_running:
+            print('有任务未完成时不能改变volumes。')
+            return
+        if max_writers is not None and (not isinstance(max_writers, int) or max_writers < 1):
+            raise ValueError('max_writers参数只能是大于0的int或None。')
+        self._downloadKit._volumes = Volumes(roots, policy, max_writers) if roots else None
+
+    def store(self, path, hash_name='sha256', link_mode='hardlink'):
+        """设置内容仓库，相同内容的文件只保存一份，下载的文件是仓库文件的链接；
+        文件大小和强ETag（或Digest响应头）与仓库中已有文件相同时不再下载
+        :param path: 仓库文件夹，为None时关闭
+        :param hash_name: 哈希算法，hashlib支持的名称
+        :param link_mode: 'hardlink'使用硬链接，修改下载的文件会同时修改仓库中的文件；
+                          'reflink'使用写时复制，文件系统不支持时复制；'copy'复制文件
+        :return: None
+        """
+        self._downloadKit._store = ContentStore(path, hash_name, link_mode) if path else None
+
+    def content_encoding(self, mode='decode', decompress=False):
+        """设置如何处理经过压缩（Content-Encoding）的响应
+        :param mode: 'decode'：由传输层边接收边解压，压缩的响应不分块下载，也不按Content-Length检查文件大小；
+                     'raw'：保存收到的压缩数据，可分块下载并检查文件大小；
+                     'identity'：请求服务器不压缩（Accept-Encoding: identity），服务器仍压缩时同'decode'
+        :param decompress: mode为'raw'时，是否在下载成功后把文件流式解压为原始内容，
+                           支持gzip、deflate、br（需安装brotli）、zstd（需安装zstandard）
+        :return: None
+        """
+        if mode not in ENCODING_MODES:
+            raise ValueError(f'mode参数只能是{ENCODING_MODES}之一。')
+        if self._downloadKit.is_running:
+            print('有任务未完成时不能改变content_encoding。')
+            return
+        self._downloadKit._encoding_mode = mode
+        self._downloadKit._decompress = decompress
+        if hasattr(self._downloadKit._transport, 'decode_content'):
+            self._downloadKit._transport.decode_content = mode != 'raw'
+
+    def write_behind(self, on_off, max_size='64M'):
+        """设置是否使用后台写入，开启后每个存储设备由一个独立线程合并写入数据，下载线程不等待硬盘
+        :param on_off: bool代表开关
+        :param max_size: 每个设备最多缓存多少数据，超过时下载线程等待，可用'K'、'M'、'G'为单位
+        :return: None
+        """
+        if not on_off:
+            self._downloadKit._writer = None
+        elif self._downloadKit._writer is None:
+            self._downloadKit._writer = DiskWriter(parse_size(max_size))
+        else:
+            self._downloadKit._writer.max_size = parse_size(max_size)
+
+    def memory_limit(self, size):
+        """设置所有任务共用的内存额度，记录器缓存和后台写入队列中未写入硬盘的数据都计入；
+        超出时先把缓存最多的任务写入文件，仍不够时下载线程等待
+        :param size: 字节数，可用'K'、'M'、'G'为单位，为0或None时不限制
+        :return: None
+        """
+        if self._downloadKit.is_running:
+            print('有任务未完成时不能改变memory_limit。')
+            return
+        self._downloadKit._memory = MemoryBudget(parse_size(size)) if size else None
+
+    def small_file_size(self, size):
+        """设置小文件大小上限，不超过此大小的文件一次读完后直接保存，不预先创建空文件
+        :param size: 字节数，可用'K'、'M'、'G'为单位，为0或None时关闭
+        :return: None
+        """
+        self._downloadKit._small_file_size = parse_size(size) if size else 0
+
+    def disk_space(self, on_off, margin=0, preallocate=False):
+        """设置是否在下载前按文件大小预留硬盘空间，空间不够时任务等待同一文件系统上的其它任务结束再开始
+        :param on_off: bool代表开关
+        :param margin: 每个文件系统至少保留多少空闲空间，可用'K'、'M'、'G'为单位
+        :param preallocate: 是否在开始下载前为文件分配全部空间
+        :return: None
+        """
+        if not on_off:
+            self._downloadKit._disk_space = None
+            return
+        margin = parse_size(margin) if margin else 0
+        if self._downloadKit._disk_space is None:
+            self._downloadKit._disk_space = DiskSpace(margin, preallocate)
+        else:
+            self._downloadKit._disk_space.margin = margin
+            self._downloadKit._disk_space.preallocate = preallocate
+
+    def trace(self, on_off):
+        """设置是否记录每个任务和子任务的等待、连接、传输、写入等阶段时间，可用export_trace()导出
+        :param on_off: bool代表开关
+        :return: None
+        """
+        if not on_off:
+            self._downloadKit._tracer = None
+        elif self._downloadKit._tracer is None:
+            self._downloadKit._tracer = Tracer()
+
+    def cookies_ttl(self, seconds):
+        """设置从页面对象获取的cookies和user agent缓存多长时间，所有任务共用
+        :param seconds: 缓存有效时间（秒），为0时每个任务都重新获取
+        :return: None
+        """
+        if not isinstance(seconds, (int, float)) or seconds < 0:
+            raise TypeError('seconds参数只能接受int或float格式且不能小于0。')
+        self._downloadKit._cookies_cache.ttl = seconds
+
+    def check_etag(self, on_off):
+        """设置使用多个来源下载时是否要求各来源ETag一致，文件大小总会检查
+        :param on_off: bool代表开关
+        :return: None
+        """
+        self._downloadKit._check_etag = on_off
+
     def proxies(self, http=None, https=None):
         """设置代理地址及端口，例：'127.0.0.1:1080'
         :param http: http代理地址及端口
@@ -130,6 +291,55 @@ class Setter(object):
         """
         self._downloadKit._session.proxies = {'http': http, 'https': https}
 
+    def dns_cache(self, on_off, ttl=300):
+        """设置是否缓存域名解析结果，缓存由所有DownloadKit对象共用，只对任务的requests连接生效
+        :param on_off: bool代表开关
+        :param ttl: 解析结果缓存多少秒
+        :return: None
+        """
+        if on_off:
+            DNS_CACHE.ttl = ttl
+            DNS_CACHE.enable()
+        else:
+            DNS_CACHE.disable()
+
+    def prefetch(self, num=5, head=False):
+        """设置在下载时为等待队列前端的任务预先解析域名、建立连接，使其开始时不用等待
+        :param num: 处理等待队列中前多少个任务，为0时关闭
+        :param head: 是否代替建立连接，发送HEAD请求获取文件大小、文件名和是否支持分块，结果保存在任务的head_info属性
+        :return: None
+        """
+        if self._downloadKit._prefetcher is not None:
+            self._downloadKit._prefetcher.stop()
+            self._downloadKit._prefetcher = None
+        if num:
+            self._downloadKit._prefetcher = Prefetcher(self._downloadKit, num, head)
+
+    def proxy_pool(self, proxies, max_conn=4, max_errors=3, cooldown=300):
+        """设置代理池，每个连接从池中选择代理，同一文件的分块会分散到不同代理，设置后proxies()的设置不生效
+        :param proxies: 代理地址列表，如['http://127.0.0.1:1080', 'socks5://127.0.0.1:1081']，为None时关闭
+        :param max_conn: 每个代理最多同时使用的连接数
+        :param max_errors: 连续出错多少次后停用代理
+        :param cooldown: 停用多少秒后再给代理一次机会，为None时不再使用
+        :return: None
+        """
+        self._downloadKit._proxy_pool = ProxyPool(proxies, max_conn, max_errors, cooldown) if proxies else None
+
+    def post_process(self, func, workers=None, kind='process', max_queue=None):
+        """设置下载成功后处理文件的方式，处理在进程池或线程池中与下载同时进行，返回值保存在任务对象的post_result属性
+        :param func: 默认处理函数，接收文件路径，使用进程池时须为模块顶层函数；为True时不设默认函数，只处理add()指定then的任务；
+                     为False或None时关闭
+        :param workers: 进程或线程数，为None时使用cpu核数
+        :param kind: 'process'使用进程池，适合计算量大的处理；'thread'使用线程池
+        :param max_queue: 最多有多少个文件等待或正在处理，达到时下载线程等待，为None时为workers的2倍
+        :return: None
+        """
+        if self._downloadKit._post_processor is not None:
+            self._downloadKit._post_processor.shutdown(False)
+            self._downloadKit._post_processor = None
+        if func:
+            self._downloadKit._post_processor = PostProcessor(None if func is True else func, workers, kind, max_queue)
+
 
 class LogSet(object):
     """用于设置信息打印和记录日志方式"""
@@ -140,14 +350,27 @@ class LogSet(object):
         """
         self._setter = setter
 
-    def path(self, path):
-        """设置日志文件路径
+    def path(self, path, max_size=None, interval=None):
+        """设置日志文件路径，后缀为.jsonl、.csv、.log时在后台线程中批量写入（.log使用jsonl格式），
+        后缀为.xlsx、.txt、.json时由DataRecorder写入
         :param path: 文件路径，可以是str或Path
+        :param max_size: 文件超过多少字节时另起新文件，None为不限制，只支持.jsonl、.csv、.log
+        :param interval: 文件使用超过多少秒时另起新文件，None为不限制，只支持.jsonl、.csv、.log
         :return: None
         """
+        suffix = Path(path).suffix.lower()
+        if suffix in RECORDER_SUFFIXES:
+            if max_size or interval:
+                raise ValueError(f'{suffix}格式的日志不支持max_size和interval参数。')
+            logger = RecorderLog(path)
+        elif suffix in WRITER_SUFFIXES:
+            logger = LogWriter(path, max_size, interval)
+        else:
+            raise ValueError(f'不支持的日志格式：{suffix or "无后缀"}，只能是{WRITER_SUFFIXES + RECORDER_SUFFIXES}之一。')
+
         if self._setter._downloadKit._logger is not None:
-            self._setter._downloadKit._logger.record()
-        self._setter._downloadKit._logger = Recorder(path)
+            self._setter._downloadKit._logger.close()
+        self._setter._downloadKit._logger = logger
 
     def print_all(self):
         """打印所有信息"""
@@ -4,13 +4,15 @@
 @Contact :   g1879@qq.com
 """
 from pathlib import Path
-from typing import Union, Literal
+from typing import Union, Literal, Optional, List, Callable, Any
 
 from DrissionPage.base import BasePage
 from DrissionPage import SessionOptions
 from requests import Session
 
 from .downloadKit import DownloadKit
+from .encoding import ENCODING_MODE
+from .protocols import FileHandler, FTPHandler, S3Handler
 
 FILE_EXISTS = Literal['add', 'skip', 'rename', 'overwrite']
 
@@ -42,15 +44,61 @@ class Setter(object):
 
     def block_size(self, size: Union[str, int]) -> None: ...
 
+    def transport(self, name: Literal['requests', 'pycurl']) -> None: ...
+
+    def write_behind(self, on_off: bool, max_size: Union[str, int] = '64M') -> None: ...
+
+    def memory_limit(self, size: Union[str, int, None]) -> None: ...
+
+    def small_file_size(self, size: Union[str, int, None]) -> None: ...
+
+    def disk_space(self, on_off: bool, margin: Union[str, int] = 0, preallocate: bool = False) -> None: ...
+
+    def trace(self, on_off: bool) -> None: ...
+
+    def cookies_ttl(self, seconds: float) -> None: ...
+
+    def check_etag(self, on_off: bool) -> None: ...
+
     def proxies(self, http: str = None, https: str = None) -> None: ...
 
+    def dns_cache(self, on_off: bool, ttl: float = 300) -> None: ...
+
+    def prefetch(self, num: int = 5, head: bool = False) -> None: ...
+
+    def proxy_pool(self,
+                   proxies: Optional[List[str]],
+                   max_conn: int = 4,
+                   max_errors: int = 3,
+                   cooldown: Optional[float] = 300) -> None: ...
+
+    def protocol(self, scheme: str, handler: Optional[Union[FileHandler, FTPHandler, S3Handler, Any]]) -> None: ...
+
+    def volumes(self,
+                roots: Optional[List[Union[str, Path]]],
+                policy: Literal['round_robin', 'most_free', 'throughput'] = 'round_robin',
+                max_writers: Optional[int] = None) -> None: ...
+
+    def store(self,
+              path: Union[str, Path, None],
+              hash_name: str = 'sha256',
+              link_mode: Literal['hardlink', 'reflink', 'copy'] = 'hardlink') -> None: ...
+
+    def content_encoding(self, mode: ENCODING_MODE = 'decode', decompress: bool = False) -> None: ...
+
+    def post_process(self,
+                     func: Union[Callable[[str], Any], bool, None],
+                     workers: Optional[int] = None,
+                     kind: Literal['process', 'thread'] = 'process',
+                     max_queue: Optional[int] = None) -> None: ...
+
 
 class LogSet(object):
     _setter: Setter = ...
 
     def __init__(self, setter: Setter): ...
 
-    def path(self, path: Union[str, Path]) -> None: ...
+    def path(self, path: Union[str, Path], max_size: Optional[int] = None, interval: Optional[float] = None) -> None: ...
 
     def print_all(self) -> None: ...
 
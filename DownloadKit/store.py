@@ -0,0 +1,276 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   store.py
+"""
+import hashlib
+from base64 import b64decode
+from json import dumps, loads
+from os import link, replace, fsync
+from pathlib import Path
+from random import randint
+from re import findall
+from shutil import copyfile
+from threading import Lock
+
+try:
+    from fcntl import ioctl
+except ImportError:  # windows
+    ioctl = None
+
+_FICLONE = 0x40049409
+_DIGEST_NAMES = {'sha-256': 'sha256', 'sha-512': 'sha512', 'md5': 'md5', 'sha': 'sha1'}
+
+
+class ContentStore(object):
+    def __init__(self, path, hash_name='sha256', link_mode='hardlink'):
+        """按内容哈希保存文件的仓库，相同内容只保存一份，下载的文件是仓库文件的链接
+        文件保存在'仓库/哈希前2位/哈希'，索引以jsonl格式追加写入'仓库/index.jsonl'
+        :param path: 仓库文件夹
+        :param hash_name: 哈希算法，hashlib支持的名称
+        :param link_mode: 'hardlink'使用硬链接，'reflink'使用写时复制（不支持时复制），'copy'复制文件
+        """
+        if link_mode not in ('hardlink', 'reflink', 'copy'):
+            raise ValueError("link_mode参数只能是'hardlink'、'reflink'或'copy'。")
+        hashlib.new(hash_name)
+        self.path = Path(path).absolute()
+        self.hash_name = hash_name
+        self.link_mode = link_mode
+        self._objects = {}  # {哈希: 大小}
+        self._keys = {}  # {'大小|ETag': 哈希}
+        self._lock = Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.path / 'index.jsonl'
+        self._load()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def object_path(self, digest):
+        """返回一个哈希对应的仓库文件路径
+        :param digest: 十六进制哈希值
+        :return: Path对象
+        """
+        return self.path / digest[:2] / digest
+
+    def lookup(self, size, headers):
+        """按文件大小和响应头查找仓库中已有的相同文件
+        :param size: 文件大小，未知时不查找
+        :param headers: 响应头，使用强ETag或与仓库算法相同的Digest、Repr-Digest
+        :return: 哈希值，没有时返回None
+        """
+        if not size:
+            return None
+        digest = _header_digest(headers, self.hash_name)
+        if digest is None:
+            key = _etag_key(size, headers)
+            if key is None:
+                return None
+            with self._lock:
+                digest = self._keys.get(key, None)
+            if digest is None:
+                return None
+        return digest if self._usable(digest, size) else None
+
+    def link_to(self, digest, path):
+        """把仓库文件链接到目标路径，目标已存在时替换
+        :param digest: 哈希值
+        :param path: 目标路径
+        :return: None
+        """
+        path = Path(path)
+        tmp = path.parent / f'.{path.name}.{randint(0, 99999999)}.link'
+        try:
+            self._place(self.object_path(digest), tmp)
+            replace(tmp, path)
+        except Exception:
+            if tmp.exists():
+                tmp.unlink()
+            raise
+
+    def put(self, path, size=None, headers=None, hasher=None):
+        """把下载完成的文件放入仓库，已有相同内容时把文件替换为仓库文件的链接
+        :param path: 文件路径
+        :param size: 文件大小，为None时读取
+        :param headers: 响应头，有强ETag时记录，使以后相同的文件可以不下载
+        :param hasher: 边下载边计算的StreamHasher对象，不完整时重新读取文件计算
+        :return: 哈希值
+        """
+        path = Path(path)
+        size = path.stat().st_size if size is None else size
+        if hasher is not None and hasher.valid and hasher.pos == size:
+            digest = hasher.hexdigest()
+        else:
+            digest = _file_digest(path, self.hash_name)
+
+        obj = self.object_path(digest)
+        with self._lock:
+            exists = self._objects.get(digest, None) == size and obj.exists()
+        if exists:  # 相同内容已存在，删除重复的数据
+            if not obj.samefile(path):
+                self.link_to(digest, path)
+        else:
+            obj.parent.mkdir(exist_ok=True)
+            tmp = obj.parent / f'.{digest}.{randint(0, 99999999)}.tmp'
+            try:
+                self._place(path, tmp)
+                replace(tmp, obj)
+            except Exception:
+                if tmp.exists():
+                    tmp.unlink()
+                raise
+
+        key = _etag_key(size, headers) if headers is not None else None
+        self._record(digest, size, key)
+        return digest
+
+    def _place(self, src, dst):
+        """按链接方式把文件放到新路径
+        :param src: 源文件
+        :param dst: 新路径，不能已存在
+        :return: None
+        """
+        if self.link_mode == 'hardlink':
+            try:
+                link(src, dst)
+                return
+            except OSError:  # 跨文件系统或不支持硬链接
+                pass
+        if self.link_mode != 'copy' and ioctl is not None:
+            try:
+                with open(src, 'rb') as s, open(dst, 'wb') as d:
+                    ioctl(d.fileno(), _FICLONE, s.fileno())
+                return
+            except OSError:
+                Path(dst).unlink()
+        copyfile(src, dst)
+
+    def _usable(self, digest, size):
+        """检查仓库中的文件是否可用
+        :param digest: 哈希值
+        :param size: 应有的大小
+        :return: bool
+        """
+        with self._lock:
+            if self._objects.get(digest, None) != size:
+                return False
+        obj = self.object_path(digest)
+        if obj.exists() and obj.stat().st_size == size:
+            return True
+        with self._lock:  # 仓库文件已被删除或修改
+            self._objects.pop(digest, None)
+            for k in [k for k, v in self._keys.items() if v == digest]:
+                self._keys.pop(k)
+        return False
+
+    def _record(self, digest, size, key):
+        """记录到索引并追加写入索引文件
+        :param digest: 哈希值
+        :param size: 文件大小
+        :param key: ETag索引键，为None时不记录
+        :return: None
+        """
+        with self._lock:
+            if self._objects.get(digest, None) == size and (key is None or self._keys.get(key, None) == digest):
+                return
+            self._objects[digest] = size
+            if key is not None:
+                self._keys[key] = digest
+            with open(self._index_path, 'a', encoding='utf-8') as f:
+                f.write(dumps({'hash': digest, 'size': size, 'key': key}) + '\n')
+                f.flush()
+                fsync(f.fileno())
+
+    def _load(self):
+        """读取索引文件"""
+        if not self._index_path.exists():
+            return
+        with open(self._index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = loads(line)
+                except ValueError:  # 中断时可能写了半行
+                    continue
+                self._objects[data['hash']] = data['size']
+                if data.get('key', None):
+                    self._keys[data['key']] = data['hash']
+
+
+class StreamHasher(object):
+    def __init__(self, hash_name='sha256'):
+        """边下载边计算哈希，数据不按顺序到达时失效，改为下载后读取文件计算
+        :param hash_name: 哈希算法
+        """
+        self._hash = hashlib.new(hash_name)
+        self._lock = Lock()
+        self.pos = 0
+        self.valid = True
+
+    def update(self, data, seek=None):
+        """输入一段数据
+        :param data: 字节数据
+        :param seek: 数据在文件中的位置，None表示接在最后
+        :return: None
+        """
+        with self._lock:
+            if not self.valid:
+                return
+            if seek is not None and seek != self.pos:
+                self.valid = False
+                return
+            self._hash.update(data)
+            self.pos += len(data)
+
+    def hexdigest(self):
+        """返回十六进制哈希值"""
+        return self._hash.hexdigest()
+
+
+def _etag_key(size, headers):
+    """生成用于查找相同文件的索引键，弱ETag不使用
+    :param size: 文件大小
+    :param headers: 响应头
+    :return: 索引键或None
+    """
+    etag = headers.get('ETag', None) if headers else None
+    if not size or not etag or etag.startswith('W/'):
+        return None
+    return f'{size}|{etag.strip()}'
+
+
+def _header_digest(headers, hash_name):
+    """从Digest或Repr-Digest响应头中取出与仓库算法相同的哈希值
+    :param headers: 响应头
+    :param hash_name: 仓库使用的哈希算法
+    :return: 十六进制哈希值或None
+    """
+    if not headers:
+        return None
+    for name in ('Repr-Digest', 'Digest'):
+        value = headers.get(name, None)
+        if not value:
+            continue
+        for alg, data in findall(r'([\w-]+)=:?([A-Za-z0-9+/=]+):?', value):
+            if _DIGEST_NAMES.get(alg.lower(), None) == hash_name:
+                try:
+                    return b64decode(data).hex()
+                except ValueError:
+                    return None
+    return None
+
+
+def _file_digest(path, hash_name):
+    """读取文件计算哈希
+    :param path: 文件路径
+    :param hash_name: 哈希算法
+    :return: 十六进制哈希值
+    """
+    h = hashlib.new(hash_name)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(1048576)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
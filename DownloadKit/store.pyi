@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Literal, Optional, Union
+
+_FICLONE: int = ...
+_DIGEST_NAMES: Dict[str, str] = ...
+
+
+class ContentStore(object):
+    path: Path = ...
+    hash_name: str = ...
+    link_mode: str = ...
+    _objects: Dict[str, int] = ...
+    _keys: Dict[str, str] = ...
+    _lock: Lock = ...
+    _index_path: Path = ...
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 hash_name: str = 'sha256',
+                 link_mode: Literal['hardlink', 'reflink', 'copy'] = 'hardlink'): ...
+
+    def __len__(self) -> int: ...
+
+    def object_path(self, digest: str) -> Path: ...
+
+    def lookup(self, size: Optional[int], headers: Optional[dict]) -> Optional[str]: ...
+
+    def link_to(self, digest: str, path: Union[str, Path]) -> None: ...
+
+    def put(self,
+            path: Union[str, Path],
+            size: Optional[int] = None,
+            headers: Optional[dict] = None,
+            hasher: Optional[StreamHasher] = None) -> str: ...
+
+    def _place(self, src: Union[str, Path], dst: Union[str, Path]) -> None: ...
+
+    def _usable(self, digest: str, size: int) -> bool: ...
+
+    def _record(self, digest: str, size: int, key: Optional[str]) -> None: ...
+
+    def _load(self) -> None: ...
+
+
+class StreamHasher(object):
+    pos: int = ...
+    valid: bool = ...
+    _lock: Lock = ...
+
+    def __init__(self, hash_name: str = 'sha256'): ...
+
+    def update(self, data: bytes, seek: Optional[int] = None) -> None: ...
+
+    def hexdigest(self) -> str: ...
+
+
+def _etag_key(size: Optional[int], headers: Optional[dict]) -> Optional[str]: ...
+
+
+def _header_digest(headers: Optional[dict], hash_name: str) -> Optional[str]: ...
+
+
+def _file_digest(path: Union[str, Path], hash_name: str) -> str: ...
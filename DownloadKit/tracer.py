@@ -0,0 +1,105 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   tracer.py
+"""
+from json import dump
+from pathlib import Path
+from threading import local
+from time import perf_counter
+
+
+class Tracer(object):
+    def __init__(self):
+        """记录任务各阶段开始和结束时间的对象，可导出为Chrome trace格式"""
+        self._start = perf_counter()
+        self._events = []
+        self._local = local()
+
+    @property
+    def events(self):
+        """返回所有阶段记录，时间单位为秒，从开始记录时算起"""
+        return [{'phase': name, 'road': road, 'mission': mid, 'task': tid,
+                 'start': round(start - self._start, 6), 'end': round(end - self._start, 6), 'args': args}
+                for name, road, mid, tid, start, end, args in list(self._events)]
+
+    def set_road(self, road):
+        """设置当前线程对应的线程号，之后在此线程记录的阶段都属于该线程
+        :param road: 线程号
+        :return: None
+        """
+        self._local.road = road
+
+    def add(self, phase, item, start, end=None, **args):
+        """记录一个阶段
+        :param phase: 阶段名称，如'queue'、'connect'、'transfer'、'flush'
+        :param item: 所属Mission或Task对象
+        :param start: 开始时间，perf_counter()的值
+        :param end: 结束时间，为None时为当前时间
+        :param args: 附加信息
+        :return: None
+        """
+        mid, tid = (item.mid, item.id) if hasattr(item, 'mid') else (item.id, None)
+        road = None if phase in ('queue', 'mission') else getattr(self._local, 'road', None)
+        self._events.append((phase, road, mid, tid, start, perf_counter() if end is None else end, args))
+
+    def add_curl_phases(self, response, item):
+        """记录pycurl响应的域名解析、建立连接、TLS握手和等待首字节阶段
+        :param response: CurlResponse对象
+        :param item: 所属Mission或Task对象
+        :return: None
+        """
+        timings = getattr(response, 'timings', None)
+        if not timings:
+            return
+        start = response._start_time
+        last = 0
+        for phase, key in (('dns', 'namelookup'), ('tcp', 'connect'), ('tls', 'appconnect'), ('wait', 'starttransfer')):
+            t = timings.get(key, 0)
+            if t > last:
+                self.add(phase, item, start + last, start + t)
+                last = t
+
+    def clear(self):
+        """清空已记录的阶段"""
+        self._events = []
+        self._start = perf_counter()
+
+    def export(self, path, fmt='chrome'):
+        """把记录导出为文件
+        :param path: 文件路径
+        :param fmt: 'chrome'为Chrome trace事件格式，可用chrome://tracing或Perfetto打开；'json'为阶段记录列表
+        :return: 文件路径
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = self.events if fmt == 'json' else self._chrome_events()
+        with open(path, 'w', encoding='utf-8') as f:
+            dump(data, f, ensure_ascii=False)
+        return str(path.absolute())
+
+    def _chrome_events(self):
+        """生成Chrome trace格式数据，每个线程一条泳道，等待和任务整体时间为异步事件"""
+        events = []
+        roads = set()
+        for name, road, mid, tid, start, end, args in list(self._events):
+            label = f'M{mid}' if tid is None else f'M{mid} T{tid}'
+            ts = round((start - self._start) * 1000000, 1)
+            dur = round((end - start) * 1000000, 1)
+            args = dict(args, mission=mid, task=tid)
+            if road is None:  # 不属于某个线程的阶段
+                events.append({'name': name, 'cat': name, 'ph': 'b', 'id': label, 'pid': 1, 'tid': 0,
+                               'ts': ts, 'args': args})
+                events.append({'name': name, 'cat': name, 'ph': 'e', 'id': label, 'pid': 1, 'tid': 0,
+                               'ts': round(ts + dur, 1)})
+            else:
+                roads.add(road)
+                events.append({'name': f'{name} {label}', 'cat': name, 'ph': 'X', 'pid': 1, 'tid': road + 1,
+                               'ts': ts, 'dur': dur, 'args': args})
+
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'DownloadKit'}})
+        for road in roads:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': road + 1,
+                           'args': {'name': f'线程{road}'}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
@@ -0,0 +1,38 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from threading import local
+from typing import List, Union, Optional, Literal, Any
+
+from .mission import Mission, Task
+
+
+class Tracer(object):
+    _start: float = ...
+    _events: List[tuple] = ...
+    _local: local = ...
+
+    def __init__(self): ...
+
+    @property
+    def events(self) -> List[dict]: ...
+
+    def set_road(self, road: int) -> None: ...
+
+    def add(self,
+            phase: str,
+            item: Union[Mission, Task],
+            start: float,
+            end: Optional[float] = None,
+            **args) -> None: ...
+
+    def add_curl_phases(self, response: Any, item: Union[Mission, Task]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def export(self, path: Union[str, Path], fmt: Literal['chrome', 'json'] = 'chrome') -> str: ...
+
+    def _chrome_events(self) -> dict: ...
@@ -0,0 +1,548 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   transport.py
+"""
+import socket
+from ipaddress import ip_address
+from os import open as os_open, close as os_close, write as os_write, lseek, O_WRONLY, O_CREAT, SEEK_SET
+from queue import Queue, Empty
+from threading import Thread, Event, Condition, Lock
+from time import perf_counter
+from urllib.parse import urljoin, urlparse
+
+from requests import Request
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+
+try:
+    from os import pwrite
+except ImportError:  # windows
+    pwrite = None
+
+try:
+    from os import O_BINARY
+except ImportError:
+    O_BINARY = 0
+
+
+class DNSCache(object):
+    def __init__(self, ttl=300, max_size=1024):
+        """域名解析缓存，只对挂载了DNSCacheAdapter的Session对象生效
+        :param ttl: 解析结果缓存多少秒
+        :param max_size: 最多缓存多少条
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = False
+        self._cache = {}
+        self._lock = Lock()
+
+    def enable(self):
+        """启用缓存"""
+        self.enabled = True
+
+    def disable(self):
+        """停用缓存并清空"""
+        with self._lock:
+            self.enabled = False
+            self._cache = {}
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache = {}
+
+    def resolve(self, host, port):
+        """解析域名，有未过期的缓存时直接使用
+        :param host: 域名
+        :param port: 端口
+        :return: 第一个解析结果的ip地址
+        """
+        key = (host, port)
+        now = perf_counter()
+        item = self._cache.get(key, None)
+        if item is not None and item[0] > now:
+            return item[1]
+
+        result = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]  # 出错的不缓存
+        with self._lock:
+            if len(self._cache) >= self.max_size:
+                for k in [k for k, v in self._cache.items() if v[0] <= now] or list(self._cache)[:1]:
+                    self._cache.pop(k, None)
+            self._cache[key] = (now + self.ttl, result)
+        return result
+
+
+DNS_CACHE = DNSCache()
+
+
+class DNSCacheAdapter(HTTPAdapter):
+    def __init__(self, cache, **kwargs):
+        """使用域名解析缓存的传输适配器，把请求发往缓存的ip，Host头和证书校验仍使用原域名
+        :param cache: DNSCache对象，未启用时按原样发送
+        :param kwargs: HTTPAdapter的参数
+        """
+        self._cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        parsed = urlparse(request.url)
+        host = parsed.hostname
+        # 经代理的请求由代理解析域名；旧版requests不能按请求指定证书校验用的域名，也不使用缓存
+        if (not self._cache.enabled or not host or _is_ip(host) or select_proxy(request.url, proxies)
+                or not hasattr(self, 'build_connection_pool_key_attributes')):
+            return super().send(request, stream, timeout, verify, cert, proxies)
+
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        ip = self._cache.resolve(host, port)
+        netloc = f'[{ip}]' if ':' in ip else ip
+        if parsed.port:
+            netloc = f'{netloc}:{parsed.port}'
+        prepared = request.copy()
+        prepared.url = parsed._replace(netloc=netloc).geturl()
+        if 'Host' not in prepared.headers:
+            prepared.headers['Host'] = parsed.netloc.rpartition('@')[2]
+        prepared.dns_host = host
+
+        r = super().send(prepared, stream, timeout, verify, cert, proxies)
+        r.request = request  # 重定向和cookies使用原域名
+        r.url = request.url
+        return r
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        host = getattr(request, 'dns_host', None)
+        if host is None:
+            return super().get_connection_with_tls_context(request, verify, proxies, cert)
+        host_params, pool_kwargs = self.build_connection_pool_key_attributes(request, verify, cert)
+        pool_kwargs['server_hostname'] = host
+        pool_kwargs['assert_hostname'] = host
+        return self.poolmanager.connection_from_host(**host_params, pool_kwargs=pool_kwargs)
+
+
+def use_dns_cache(session):
+    """域名解析缓存启用时，在Session对象上挂载DNSCacheAdapter，已挂载自定义适配器的不替换
+    :param session: Session对象
+    :return: None
+    """
+    if not DNS_CACHE.enabled:
+        return
+    for prefix in ('https://', 'http://'):
+        if type(session.adapters.get(prefix, None)) is HTTPAdapter:
+            session.mount(prefix, DNSCacheAdapter(DNS_CACHE))
+
+
+def _is_ip(host):
+    """判断是否ip地址
+    :param host: 域名或ip
+    :return: bool
+    """
+    try:
+        ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class RequestsTransport(object):
+    """使用requests发送请求的传输层，为默认方式"""
+    name = 'requests'
+
+    def request(self, url, session, method, **kwargs):
+        """发送请求
+        :param url: 目标url
+        :param session: 用于连接的Session对象
+        :param method: 请求方式
+        :param kwargs: 连接参数
+        :return: Response对象
+        """
+        use_dns_cache(session)
+        if method == 'get':
+            return session.get(url, **kwargs)
+        elif method == 'post':
+            return session.post(url, **kwargs)
+
+
+class CurlTransport(object):
+    """使用pycurl的传输层，所有连接由一个线程通过CurlMulti驱动，数据可直接写入文件"""
+    name = 'pycurl'
+    decode_content = True  # 是否由curl解压响应数据
+
+    def __init__(self):
+        try:
+            import pycurl
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError('使用pycurl传输层须先安装pycurl：pip install pycurl')
+        self._pycurl = pycurl
+        self._multi = None
+        self._thread = None
+        self._commands = Queue()
+        self._handles = {}
+        self._lock = Lock()
+
+    def request(self, url, session, method, **kwargs):
+        """发送请求，收到响应头后返回
+        :param url: 目标url
+        :param session: 用于提供headers、cookies等设置的Session对象
+        :param method: 请求方式
+        :param kwargs: 连接参数
+        :return: CurlResponse对象
+        """
+        pycurl = self._pycurl
+        prepared = session.prepare_request(Request(method.upper(), url,
+                                                   headers=kwargs.get('headers', None),
+                                                   params=kwargs.get('params', None),
+                                                   data=kwargs.get('data', None),
+                                                   json=kwargs.get('json', None),
+                                                   files=kwargs.get('files', None),
+                                                   cookies=kwargs.get('cookies', None),
+                                                   auth=kwargs.get('auth', None)))
+        headers = CaseInsensitiveDict(prepared.headers)
+        encoding = headers.pop('Accept-Encoding', None) if self.decode_content else None
+
+        c = pycurl.Curl()
+        c.setopt(pycurl.URL, prepared.url)
+        c.setopt(pycurl.HTTPHEADER, [f'{k}: {v}' for k, v in headers.items()])
+        c.setopt(pycurl.NOSIGNAL, 1)
+        if encoding:  # 与requests一致，由传输层解压；保存压缩数据时只发送请求头，不解压
+            c.setopt(pycurl.ENCODING, encoding)
+        if prepared.body is not None:
+            body = prepared.body.encode('utf-8') if isinstance(prepared.body, str) else prepared.body
+            c.setopt(pycurl.POSTFIELDS, body)
+        if method == 'post':
+            c.setopt(pycurl.POST, 1)
+
+        c.setopt(pycurl.FOLLOWLOCATION, 1 if kwargs.get('allow_redirects', True) else 0)
+        c.setopt(pycurl.MAXREDIRS, session.max_redirects)
+
+        timeout = kwargs.get('timeout', None)
+        if timeout:
+            connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            c.setopt(pycurl.CONNECTTIMEOUT_MS, int(connect_timeout * 1000))
+            c.setopt(pycurl.LOW_SPEED_LIMIT, 1)
+            c.setopt(pycurl.LOW_SPEED_TIME, max(1, int(read_timeout)))
+
+        proxies = kwargs.get('proxies', None) or session.proxies
+        proxy = proxies.get(prepared.url.split(':', 1)[0], None) if proxies else None
+        if proxy:
+            c.setopt(pycurl.PROXY, proxy)
+
+        verify = kwargs.get('verify', session.verify)
+        if verify is False:
+            c.setopt(pycurl.SSL_VERIFYPEER, 0)
+            c.setopt(pycurl.SSL_VERIFYHOST, 0)
+        elif isinstance(verify, str):
+            c.setopt(pycurl.CAINFO, verify)
+
+        cert = kwargs.get('cert', session.cert)
+        if cert:
+            cert, key = cert if isinstance(cert, tuple) else (cert, None)
+            c.setopt(pycurl.SSLCERT, cert)
+            if key:
+                c.setopt(pycurl.SSLKEY, key)
+
+        response = CurlResponse(self, c, prepared.url)
+        c.setopt(pycurl.HEADERFUNCTION, response._on_header)
+        c.setopt(pycurl.WRITEFUNCTION, response._on_write)
+
+        self._start()
+        response._start_time = perf_counter()
+        self._commands.put(('add', response))
+        response._headers_ready.wait()
+        if response.status_code is None:
+            response.close()
+            raise ConnectionError(response._error or '连接失败')
+        return response
+
+    def _start(self):
+        """启动驱动线程"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._multi = self._pycurl.CurlMulti()
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _command(self, action, response):
+        """向驱动线程发送指令
+        :param action: 'add'、'resume'或'remove'
+        :param response: CurlResponse对象
+        :return: None
+        """
+        self._commands.put((action, response))
+
+    def _run(self):
+        """驱动线程函数，所有curl操作都在此线程进行"""
+        pycurl = self._pycurl
+        multi = self._multi
+        while True:
+            while True:
+                try:
+                    action, response = self._commands.get(timeout=0 if self._handles else 1)
+                except Empty:
+                    break
+
+                if action == 'add':
+                    self._handles[response._curl] = response
+                    multi.add_handle(response._curl)
+                elif action == 'resume':
+                    if response._curl in self._handles:
+                        try:
+                            response._curl.pause(pycurl.PAUSE_CONT)
+                        except pycurl.error:  # 已中止的传输，等待结束
+                            pass
+                elif action == 'remove':
+                    if response._curl in self._handles:
+                        self._finish(response._curl, '连接已关闭')
+
+            while True:
+                ret, num = multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+
+            while True:
+                num, ok_list, err_list = multi.info_read()
+                for c in ok_list:
+                    self._finish(c, None)
+                for c, errno, msg in err_list:
+                    self._finish(c, f'{errno} {msg}')
+                if num == 0:
+                    break
+
+            if self._handles:
+                multi.select(.05)
+
+    def _finish(self, curl, error):
+        """结束一个连接
+        :param curl: Curl对象
+        :param error: 错误信息，成功为None
+        :return: None
+        """
+        response = self._handles.pop(curl)
+        self._multi.remove_handle(curl)
+        pycurl = self._pycurl
+        try:
+            response.timings = {'namelookup': curl.getinfo(pycurl.NAMELOOKUP_TIME),
+                                'connect': curl.getinfo(pycurl.CONNECT_TIME),
+                                'appconnect': curl.getinfo(pycurl.APPCONNECT_TIME),
+                                'starttransfer': curl.getinfo(pycurl.STARTTRANSFER_TIME),
+                                'total': curl.getinfo(pycurl.TOTAL_TIME)}
+        except Exception:
+            pass
+        response._set_done(error)
+        curl.close()
+
+
+class CurlResponse(object):
+    def __init__(self, transport, curl, url):
+        """pycurl传输层返回的响应对象，提供与requests的Response相同的常用接口
+        :param transport: 所属CurlTransport对象
+        :param curl: Curl对象
+        :param url: 请求url
+        """
+        self._transport = transport
+        self._curl = curl
+        self.url = url
+        self.status_code = None
+        self.reason = ''
+        self.headers = CaseInsensitiveDict()
+        self.encoding = None
+        self._headers_ready = Event()
+        self._cond = Condition()
+        self._buffer = bytearray()
+        self._max_buffer = 4194304  # 4M
+        self._paused = False
+        self._mode = None  # None、'iter'、'direct'
+        self._done = False
+        self._error = None
+        self._closed = False
+        self._content = None
+        self._fd = None
+        self._pos = 0
+        self._limit = None
+        self._written = 0
+        self._callback = None
+        self._stopped = None  # 主动中止的原因：'limit'、'canceled'
+        self._start_time = None
+        self.timings = None  # 结束后各阶段耗时（秒），从开始请求算起
+
+    def __bool__(self):
+        return self.ok
+
+    def __del__(self):
+        self.close()
+
+    def __repr__(self):
+        return f'<CurlResponse [{self.status_code}]>'
+
+    @property
+    def ok(self):
+        """返回状态码是否表示成功"""
+        return self.status_code is not None and self.status_code < 400
+
+    @property
+    def apparent_encoding(self):
+        """返回推测的编码"""
+        return 'utf-8'
+
+    @property
+    def content(self):
+        """读取并返回全部内容"""
+        if self._content is None:
+            self._content = b''.join(self.iter_content(self._max_buffer))
+        return self._content
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        """逐块返回数据，除最后一块外每块大小都等于chunk_size
+        :param chunk_size: 每块字节数
+        :param decode_unicode: 为与requests兼容，不使用
+        :return: 生成器
+        """
+        if self._content is not None:
+            for i in range(0, len(self._content), chunk_size):
+                yield self._content[i:i + chunk_size]
+            return
+
+        self._set_mode('iter')
+        while True:
+            resume = False
+            with self._cond:
+                self._max_buffer = max(self._max_buffer, chunk_size)
+                while len(self._buffer) < chunk_size and not self._done:
+                    if self._paused and len(self._buffer) < self._max_buffer:
+                        self._paused = False
+                        self._transport._command('resume', self)
+                    self._cond.wait(1)
+
+                if not self._buffer:
+                    if self._error:
+                        raise IOError(self._error)
+                    return
+
+                chunk = bytes(self._buffer[:chunk_size])
+                del self._buffer[:chunk_size]
+                if self._paused and len(self._buffer) < self._max_buffer:
+                    self._paused = False
+                    resume = True
+
+            if resume:
+                self._transport._command('resume', self)
+            yield chunk
+
+    def write_into(self, path, offset, callback=None, limit=None):
+        """由驱动线程把数据直接写入文件指定位置，阻塞直到结束
+        :param path: 文件路径
+        :param offset: 开始写入的位置
+        :param callback: 每写入一段数据调用，参数为字节数，返回False时中止
+        :param limit: 最多写入多少字节，None为不限制
+        :return: 'success'或'canceled'
+        """
+        self._fd = os_open(str(path), O_WRONLY | O_CREAT | O_BINARY)
+        self._limit = limit
+        self._callback = callback
+        try:
+            with self._cond:  # 之前用iter_content()读取时已缓存的数据先写入
+                data = bytes(self._buffer[:limit] if limit is not None else self._buffer)
+                self._buffer.clear()
+                self._pos = offset + len(data)
+                self._written = len(data)
+            if data:
+                self._write_at(data, offset)
+                if callback is not None and callback(len(data)) is False:
+                    self._stopped = 'canceled'
+                    self.close()
+            if self._stopped is None and (limit is None or self._written < limit):
+                self._set_mode('direct')
+            else:
+                self._stopped = self._stopped or 'limit'
+                self.close()
+            with self._cond:
+                while not self._done:
+                    self._cond.wait(1)
+        finally:
+            os_close(self._fd)
+            self._fd = None
+
+        if self._stopped == 'canceled':
+            return 'canceled'
+        if self._error and self._stopped != 'limit':
+            raise IOError(self._error)
+        return 'success'
+
+    def close(self):
+        """关闭连接"""
+        if not self._closed:
+            self._closed = True
+            if not self._done:
+                self._transport._command('remove', self)
+
+    def _set_mode(self, mode):
+        """设置读取方式，如传输因等待设置而暂停则恢复"""
+        with self._cond:
+            self._mode = mode
+            resume = self._paused
+            self._paused = False
+        if resume:
+            self._transport._command('resume', self)
+
+    def _on_header(self, line):
+        """接收响应头的回调，跳转时会收到多组响应头"""
+        line = line.decode('iso-8859-1').strip()
+        if line.startswith('HTTP/'):
+            parts = line.split(' ', 2)
+            self.status_code = int(parts[1])
+            self.reason = parts[2] if len(parts) > 2 else ''
+            self.headers = CaseInsensitiveDict()
+        elif ':' in line:
+            k, v = line.split(':', 1)
+            k, v = k.strip(), v.strip()
+            self.headers[k] = f'{self.headers[k]}, {v}' if k in self.headers else v
+            if k.lower() == 'location' and 300 <= self.status_code < 400:  # 跳转后的地址
+                self.url = urljoin(self.url, v)
+
+    def _on_write(self, data):
+        """接收数据的回调，在驱动线程中执行"""
+        if not self._headers_ready.is_set():
+            self._headers_ready.set()
+
+        if self._mode == 'direct':
+            if self._limit is not None:
+                data = data[:self._limit - self._written]
+            self._write_at(data, self._pos)
+            self._pos += len(data)
+            self._written += len(data)
+            if self._callback is not None and self._callback(len(data)) is False:
+                self._stopped = 'canceled'
+                return 0
+            if self._limit is not None and self._written >= self._limit:
+                self._stopped = 'limit'
+                return 0
+            return None
+
+        with self._cond:
+            if self._mode is None or len(self._buffer) >= self._max_buffer:  # 未确定读取方式或缓存已满时暂停
+                self._paused = True
+                return self._transport._pycurl.WRITEFUNC_PAUSE
+            self._buffer += data
+            self._cond.notify_all()
+
+    def _write_at(self, data, pos):
+        """把数据写入文件指定位置
+        :param data: 字节数据
+        :param pos: 位置
+        :return: None
+        """
+        if pwrite is not None:
+            pwrite(self._fd, data, pos)
+        else:
+            lseek(self._fd, pos, SEEK_SET)
+            os_write(self._fd, data)
+
+    def _set_done(self, error):
+        """传输结束时由驱动线程调用"""
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+        self._headers_ready.set()
@@ -0,0 +1,153 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from queue import Queue
+from threading import Thread, Event, Condition, Lock
+from typing import Union, Optional, Callable, Dict, Any, Iterator, Literal
+
+from requests import Session, Response, PreparedRequest
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPConnectionPool
+
+
+class DNSCache(object):
+    ttl: float = ...
+    max_size: int = ...
+    enabled: bool = ...
+    _cache: Dict[tuple, tuple] = ...
+    _lock: Lock = ...
+
+    def __init__(self, ttl: float = 300, max_size: int = 1024): ...
+
+    def enable(self) -> None: ...
+
+    def disable(self) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def resolve(self, host: str, port: int) -> str: ...
+
+
+DNS_CACHE: DNSCache = ...
+
+
+class DNSCacheAdapter(HTTPAdapter):
+    _cache: DNSCache = ...
+
+    def __init__(self, cache: DNSCache, **kwargs): ...
+
+    def send(self,
+             request: PreparedRequest,
+             stream: bool = False,
+             timeout: Any = None,
+             verify: Union[bool, str] = True,
+             cert: Any = None,
+             proxies: Optional[dict] = None) -> Response: ...
+
+    def get_connection_with_tls_context(self,
+                                        request: PreparedRequest,
+                                        verify: Union[bool, str],
+                                        proxies: Optional[dict] = None,
+                                        cert: Any = None) -> HTTPConnectionPool: ...
+
+
+def use_dns_cache(session: Session) -> None: ...
+
+
+def _is_ip(host: str) -> bool: ...
+
+
+class RequestsTransport(object):
+    name: str = ...
+
+    def request(self, url: str, session: Session, method: str, **kwargs) -> Optional[Response]: ...
+
+
+class CurlTransport(object):
+    name: str = ...
+    decode_content: bool = ...
+    _pycurl: Any = ...
+    _multi: Any = ...
+    _thread: Optional[Thread] = ...
+    _lock: Lock = ...
+    _commands: Queue = ...
+    _handles: Dict[Any, CurlResponse] = ...
+
+    def __init__(self): ...
+
+    def request(self, url: str, session: Session, method: str, **kwargs) -> CurlResponse: ...
+
+    def _start(self) -> None: ...
+
+    def _command(self, action: Literal['add', 'resume', 'remove'], response: CurlResponse) -> None: ...
+
+    def _run(self) -> None: ...
+
+    def _finish(self, curl: Any, error: Optional[str]) -> None: ...
+
+
+class CurlResponse(object):
+    _transport: CurlTransport = ...
+    _curl: Any = ...
+    url: str = ...
+    status_code: Optional[int] = ...
+    reason: str = ...
+    headers: CaseInsensitiveDict = ...
+    encoding: Optional[str] = ...
+    _headers_ready: Event = ...
+    _cond: Condition = ...
+    _buffer: bytearray = ...
+    _max_buffer: int = ...
+    _paused: bool = ...
+    _mode: Optional[str] = ...
+    _done: bool = ...
+    _error: Optional[str] = ...
+    _closed: bool = ...
+    _content: Optional[bytes] = ...
+    _fd: Optional[int] = ...
+    _pos: int = ...
+    _limit: Optional[int] = ...
+    _written: int = ...
+    _callback: Optional[Callable[[int], bool]] = ...
+    _stopped: Optional[str] = ...
+    _start_time: Optional[float] = ...
+    timings: Optional[dict] = ...
+
+    def __init__(self, transport: CurlTransport, curl: Any, url: str): ...
+
+    def __bool__(self) -> bool: ...
+
+    def __del__(self) -> None: ...
+
+    @property
+    def ok(self) -> bool: ...
+
+    @property
+    def apparent_encoding(self) -> str: ...
+
+    @property
+    def content(self) -> bytes: ...
+
+    def iter_content(self, chunk_size: int = 1, decode_unicode: bool = False) -> Iterator[bytes]: ...
+
+    def write_into(self,
+                   path: Union[str, Path],
+                   offset: int,
+                   callback: Optional[Callable[[int], bool]] = None,
+                   limit: Optional[int] = None) -> str: ...
+
+    def close(self) -> None: ...
+
+    def _set_mode(self, mode: str) -> None: ...
+
+    def _on_header(self, line: bytes) -> None: ...
+
+    def _on_write(self, data: bytes) -> Optional[int]: ...
+
+    def _write_at(self, data: bytes, pos: int) -> None: ...
+
+    def _set_done(self, error: Optional[str]) -> None: ...
@@ -0,0 +1,138 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   volumes.py
+"""
+from pathlib import Path
+from shutil import disk_usage
+from threading import Lock
+from time import perf_counter
+
+POLICIES = ('round_robin', 'most_free', 'throughput')
+
+
+class Volumes(object):
+    def __init__(self, roots, policy='round_robin', max_writers=None):
+        """把任务分散保存到多个存储卷，每个任务整个文件保存在一个卷上
+        :param roots: 各卷上的保存文件夹列表
+        :param policy: 'round_robin'轮流使用；'most_free'使用剩余空间最多的卷；'throughput'按已测得的速度和正在写入的任务数选择
+        :param max_writers: 每个卷最多同时写入多少个任务，都已达到时任务等待，None为不限制
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'policy参数只能是{POLICIES}之一。')
+        if not roots:
+            raise ValueError('roots参数不能为空。')
+        self.roots = [Path(i).absolute() for i in roots]
+        for root in self.roots:
+            root.mkdir(parents=True, exist_ok=True)
+        self.policy = policy
+        self.max_writers = max_writers
+        self._lock = Lock()
+        self._next = 0
+        self._active = {root: {} for root in self.roots}  # {卷: {任务: 开始时间}}
+        self._speeds = {root: None for root in self.roots}  # 每个任务的平均速度（字节/秒）
+        self._parked = []  # 所有卷都已达到写入数上限时等待的任务
+
+    def choose(self, mission, size=None, prefer=None):
+        """为任务选择一个卷，并登记为正在写入
+        :param mission: 任务对象
+        :param size: 文件大小，已知时不选择剩余空间不够的卷
+        :param prefer: 必须使用的卷，如同名文件所在的卷，为None时按策略选择
+        :return: 卷的文件夹，所有可用的卷都已达到写入数上限时返回None，任务已登记等待
+        """
+        with self._lock:
+            candidates = [r for r in ([prefer] if prefer is not None else self.roots)
+                          if self.max_writers is None or len(self._active[r]) < self.max_writers]
+            if not candidates:
+                self._parked.append(mission)
+                return None
+
+            if prefer is not None:
+                root = prefer
+
+            elif self.policy == 'round_robin':
+                ordered = self.roots[self._next:] + self.roots[:self._next]
+                root = next(r for r in ordered if r in candidates)
+                self._next = (self.roots.index(root) + 1) % len(self.roots)
+
+            elif self.policy == 'most_free':
+                root = max(candidates, key=self._free)
+
+            else:  # 没有测得速度的卷先使用，以便测量，其中正在写入的任务少的优先
+                root = max(candidates, key=lambda r: (True, -len(self._active[r])) if self._speeds[r] is None
+                           else (False, self._speeds[r] / (len(self._active[r]) + 1)))
+
+            if size and prefer is None and self._free(root) < size:  # 剩余空间不够时换用空间最多的卷
+                root = max(candidates, key=self._free)
+
+            self._active[root][mission] = perf_counter()
+            mission._volume = root
+            return root
+
+    def release(self, mission):
+        """任务结束时调用，记录速度并释放写入数
+        :param mission: 任务对象
+        :return: 等待卷的任务列表，须重新加入运行
+        """
+        with self._lock:
+            root = mission._volume
+            if root is None:
+                return []
+            mission._volume = None
+            start = self._active[root].pop(mission, None)
+            if start is not None and mission.result == 'success' and mission.downloaded_size:
+                seconds = perf_counter() - start
+                if seconds > 0:
+                    speed = mission.downloaded_size / seconds
+                    old = self._speeds[root]
+                    self._speeds[root] = speed if old is None else old * .7 + speed * .3
+
+            parked, self._parked = self._parked, []
+            return parked
+
+    def move(self, mission, root):
+        """把已登记的任务改到另一个卷，用于开始下载后才发现同名文件在另一个卷上，不受写入数上限限制
+        :param mission: 任务对象
+        :param root: 卷的文件夹
+        :return: None
+        """
+        with self._lock:
+            start = self._active[mission._volume].pop(mission, perf_counter())
+            self._active[root][mission] = start
+            mission._volume = root
+
+    def find(self, sub, name):
+        """在各卷中查找已存在的文件
+        :param sub: 卷文件夹下的相对路径
+        :param name: 文件名
+        :return: 文件路径，没有时返回None
+        """
+        root = self.locate(sub, name)
+        return None if root is None else root / sub / name
+
+    def locate(self, sub, name):
+        """查找已存在的文件在哪个卷上
+        :param sub: 卷文件夹下的相对路径
+        :param name: 文件名
+        :return: 卷的文件夹，没有时返回None
+        """
+        for root in self.roots:
+            if (root / sub / name).exists():
+                return root
+        return None
+
+    def stats(self):
+        """返回各卷的剩余空间、正在写入的任务数和测得的速度"""
+        with self._lock:
+            return {str(r): {'free': self._free(r), 'writing': len(self._active[r]),
+                             'speed': round(self._speeds[r]) if self._speeds[r] is not None else None}
+                    for r in self.roots}
+
+    def _free(self, root):
+        """返回卷的剩余空间，减去正在写入的任务还未写入的大小
+        :param root: 卷的文件夹
+        :return: 字节数
+        """
+        pending = sum(max(0, (m.size or 0) - m.downloaded_size) for m in self._active[root])
+        return disk_usage(root).free - pending
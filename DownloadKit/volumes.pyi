@@ -0,0 +1,42 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Literal, Optional, Union
+
+from .mission import Mission
+
+POLICIES: tuple = ...
+
+
+class Volumes(object):
+    roots: List[Path] = ...
+    policy: str = ...
+    max_writers: Optional[int] = ...
+    _lock: Lock = ...
+    _next: int = ...
+    _active: Dict[Path, Dict[Mission, float]] = ...
+    _speeds: Dict[Path, Optional[float]] = ...
+    _parked: List[Mission] = ...
+
+    def __init__(self,
+                 roots: List[Union[str, Path]],
+                 policy: Literal['round_robin', 'most_free', 'throughput'] = 'round_robin',
+                 max_writers: Optional[int] = None): ...
+
+    def choose(self, mission: Mission, size: Optional[int] = None, prefer: Optional[Path] = None) -> Optional[Path]: ...
+
+    def release(self, mission: Mission) -> List[Mission]: ...
+
+    def move(self, mission: Mission, root: Path) -> None: ...
+
+    def find(self, sub: str, name: str) -> Optional[Path]: ...
+
+    def locate(self, sub: str, name: str) -> Optional[Path]: ...
+
+    def stats(self) -> Dict[str, dict]: ...
+
+    def _free(self, root: Path) -> int: ...
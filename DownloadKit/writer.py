@@ -0,0 +1,221 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   writer.py
+"""
+from collections import deque
+from os import stat
+from threading import Thread, Condition, Lock
+from time import perf_counter
+
+
+class DiskWriter(object):
+    def __init__(self, max_size=67108864):
+        """后台写入器，每个存储设备一个写入线程，下载线程只把数据放入队列
+        :param max_size: 每个设备队列中最多缓存多少字节，超过时放入数据会等待
+        """
+        self.max_size = max_size
+        self._devices = {}
+        self._lock = Lock()
+
+    @property
+    def cached_size(self):
+        """返回所有队列中等待写入的字节数"""
+        return sum(d.size for d in list(self._devices.values()))
+
+    def write(self, mission, data, seek=None):
+        """把数据放入对应设备的写入队列
+        :param mission: 数据所属任务
+        :param data: 字节数据
+        :param seek: 在文件中的位置，None表示最后
+        :return: None
+        """
+        self._get_device(mission).put(mission, data, seek)
+
+    def flush(self, mission):
+        """等待任务的数据全部写入并关闭文件，写入出错时抛出异常
+        :param mission: 任务对象
+        :return: None
+        """
+        device = self._devices.get(mission._writer_device, None)
+        if device is not None:
+            device.flush(mission)
+
+    def discard(self, mission):
+        """丢弃任务尚未写入的数据并关闭文件
+        :param mission: 任务对象
+        :return: None
+        """
+        device = self._devices.get(mission._writer_device, None)
+        if device is not None:
+            device.discard(mission)
+
+    def _get_device(self, mission):
+        """返回任务文件所在设备的写入线程对象"""
+        if mission._writer_device is None:
+            mission._writer_device = stat(mission.path.parent).st_dev
+        device = self._devices.get(mission._writer_device, None)
+        if device is None:
+            with self._lock:
+                device = self._devices.get(mission._writer_device, None)
+                if device is None:
+                    device = self._devices[mission._writer_device] = _DeviceWriter(self)
+        return device
+
+
+class _DeviceWriter(object):
+    def __init__(self, disk_writer):
+        """一个存储设备的写入线程，把连续的数据合并成大块顺序写入
+        :param disk_writer: 所属DiskWriter对象
+        """
+        self._disk_writer = disk_writer
+        self._items = deque()
+        self._cond = Condition()
+        self.size = 0  # 队列中和正在写入的字节数
+        self._pending = {}  # 每个任务未写完的数据条数
+        self._files = {}
+        self._errors = {}
+        Thread(target=self._run, daemon=True).start()
+
+    def put(self, mission, data, seek):
+        """放入数据，队列已满时等待
+        :param mission: 数据所属任务
+        :param data: 字节数据
+        :param seek: 在文件中的位置，None表示最后
+        :return: None
+        """
+        budget = mission.download_kit._memory
+        if budget is not None:  # 先取得全局内存额度
+            budget.acquire(mission, len(data), False)
+        with self._cond:
+            while self.size and self.size + len(data) > self._disk_writer.max_size:
+                self._cond.wait()
+            self._items.append((mission, data, seek))
+            self.size += len(data)
+            self._pending[mission] = self._pending.get(mission, 0) + 1
+            self._cond.notify_all()
+
+    def flush(self, mission):
+        """等待任务数据全部写入，关闭文件
+        :param mission: 任务对象
+        :return: None
+        """
+        with self._cond:
+            while self._pending.get(mission, 0):
+                self._cond.wait()
+            self._pending.pop(mission, None)
+            f = self._files.pop(mission, None)
+            error = self._errors.pop(mission, None)
+        if f is not None:
+            f.close()
+        if error is not None:
+            raise error
+
+    def discard(self, mission):
+        """丢弃任务尚未写入的数据，等待正在写入的完成后关闭文件
+        :param mission: 任务对象
+        :return: None
+        """
+        with self._cond:
+            keep = deque()
+            dropped = 0
+            for i in self._items:
+                if i[0] is mission:
+                    dropped += len(i[1])
+                    self._pending[mission] -= 1
+                else:
+                    keep.append(i)
+            self._items = keep
+            self.size -= dropped
+            self._cond.notify_all()
+        _release(mission, dropped)
+        try:
+            self.flush(mission)
+        except Exception:
+            pass
+
+    def _run(self):
+        """线程函数，每次取出一批数据，合并后写入"""
+        while True:
+            with self._cond:
+                while not self._items:
+                    self._cond.wait()
+                batch = []
+                batch_size = 0
+                while self._items and batch_size < 16777216:  # 每批最多16M
+                    item = self._items.popleft()
+                    batch.append(item)
+                    batch_size += len(item[1])
+
+            counts = {}
+            sizes = {}
+            for mission, start, parts in _merge(batch):
+                counts[mission] = counts.get(mission, 0) + len(parts)
+                size = sum(len(i) for i in parts)
+                sizes[mission] = sizes.get(mission, 0) + size
+                if mission in self._errors:
+                    continue
+                t = perf_counter()
+                try:
+                    self._write(mission, start, parts)
+                except Exception as e:
+                    self._errors[mission] = e
+                else:
+                    mission.download_kit._trace('flush', mission, t, bytes=size)
+
+            with self._cond:
+                self.size -= batch_size
+                for mission, num in counts.items():
+                    self._pending[mission] = self._pending.get(mission, 0) - num
+                self._cond.notify_all()
+            for mission, size in sizes.items():
+                _release(mission, size)
+
+    def _write(self, mission, start, parts):
+        """把合并后的数据写入文件
+        :param mission: 任务对象
+        :param start: 开始位置，None表示最后
+        :param parts: 字节数据列表
+        :return: None
+        """
+        f = self._files.get(mission, None)
+        if f is None:
+            f = self._files[mission] = open(mission.path, 'rb+')
+        if start is None:
+            f.seek(0, 2)
+        else:
+            f.seek(start)
+        f.write(parts[0] if len(parts) == 1 else b''.join(parts))
+
+
+def _release(mission, size):
+    """归还已写入或已丢弃的数据占用的全局内存额度
+    :param mission: 数据所属任务
+    :param size: 字节数
+    :return: None
+    """
+    budget = mission.download_kit._memory
+    if budget is not None and size:
+        budget.release(mission, size, False)
+
+
+def _merge(batch):
+    """把同一任务中位置相连的数据合并
+    :param batch: (任务, 数据, 位置)组成的列表
+    :return: (任务, 开始位置, 数据列表)组成的列表
+    """
+    groups = []
+    last = None
+    # 同一任务的数据按位置排序，追加到末尾的数据保持原有顺序
+    batch = sorted(batch, key=lambda i: (id(i[0]), i[2] is not None, i[2] or 0))
+    for mission, data, seek in batch:
+        if last is not None and last[0] is mission and \
+                ((seek is None and last[1] is None) or (seek is not None and last[1] is not None
+                                                        and seek == last[1] + last[3])):
+            last[2].append(data)
+            last[3] += len(data)
+        else:
+            last = [mission, seek, [data], len(data)]
+            groups.append(last)
+    return [(g[0], g[1], g[2]) for g in groups]
@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+"""
+from collections import deque
+from io import BufferedRandom
+from threading import Condition, Lock
+from typing import Optional, Dict, List, Tuple
+
+from .mission import Mission
+
+
+class DiskWriter(object):
+    max_size: int = ...
+    _devices: Dict[int, _DeviceWriter] = ...
+    _lock: Lock = ...
+
+    def __init__(self, max_size: int = 67108864): ...
+
+    @property
+    def cached_size(self) -> int: ...
+
+    def write(self, mission: Mission, data: bytes, seek: Optional[int] = None) -> None: ...
+
+    def flush(self, mission: Mission) -> None: ...
+
+    def discard(self, mission: Mission) -> None: ...
+
+    def _get_device(self, mission: Mission) -> _DeviceWriter: ...
+
+
+class _DeviceWriter(object):
+    _disk_writer: DiskWriter = ...
+    _items: deque = ...
+    _cond: Condition = ...
+    size: int = ...
+    _pending: Dict[Mission, int] = ...
+    _files: Dict[Mission, BufferedRandom] = ...
+    _errors: Dict[Mission, Exception] = ...
+
+    def __init__(self, disk_writer: DiskWriter): ...
+
+    def put(self, mission: Mission, data: bytes, seek: Optional[int]) -> None: ...
+
+    def flush(self, mission: Mission) -> None: ...
+
+    def discard(self, mission: Mission) -> None: ...
+
+    def _run(self) -> None: ...
+
+    def _write(self, mission: Mission, start: Optional[int], parts: List[bytes]) -> None: ...
+
+
+def _release(mission: Mission, size: int) -> None: ...
+
+
+def _merge(batch: List[tuple]) -> List[Tuple[Mission, Optional[int], List[bytes]]]: ...
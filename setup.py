@@ -21,6 +21,12 @@ setup(
         "requests",
         "DataRecorder>=3.4.2"
     ],
+    entry_points={
+        "console_scripts": ["downloadkit = DownloadKit.cli:main"],
+    },
+    extras_require={
+        "pycurl": ["pycurl"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3.6",
         "Development Status :: 4 - Beta",
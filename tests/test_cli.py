@@ -0,0 +1,117 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_cli.py
+"""
+from _thread import interrupt_main
+from json import dumps, loads
+from os import urandom
+from threading import Thread
+from time import sleep, perf_counter
+
+import pytest
+
+from DownloadKit.cli import BatchRunner, load_state, main
+from DownloadKit.faultserver import FaultServer
+
+FILES = {f'/{n}.bin': urandom(200000 + i) for i, n in enumerate('abc')}
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files=FILES) as s:
+        yield s
+
+
+@pytest.fixture
+def batch(server, tmp_path):
+    """写入任务列表，返回(任务列表路径, 结果文件路径, 保存路径)"""
+    path = tmp_path / 'list.txt'
+    path.write_text('\n'.join(server.url(n) for n in FILES) + '\n', encoding='utf-8')
+    return path, tmp_path / 'results.jsonl', tmp_path / 'out'
+
+
+def run(batch, resume=False):
+    path, results, out = batch
+    runner = BatchRunner(str(path), str(results), str(out), roads=2, interval=0, resume=resume,
+                         progress_interval=0)
+    try:
+        return runner.run()
+    finally:
+        runner.kit.cancel()
+
+
+def requests_of(server, name):
+    return [i for i in server.log if i['path'] == name]
+
+
+def check_out(out):
+    assert sorted(p.name for p in out.iterdir()) == ['a.bin', 'b.bin', 'c.bin']
+    for name, data in FILES.items():
+        assert (out / name.lstrip('/')).read_bytes() == data
+
+
+def test_run(batch):
+    summary = run(batch)
+    assert summary == {'total': 3, 'success': 3, 'skipped': 0, 'failed': 0, 'resumed': 0}
+    check_out(batch[2])
+    state = load_state(batch[1])
+    assert [state[i]['result'] for i in (1, 2, 3)] == ['success'] * 3
+
+
+def test_resume_after_interrupt(server, batch):
+    server.add_fault('/b.bin', 'stall', times=1, after=16384, seconds=2)
+    results = batch[1]
+
+    def interrupt():
+        end = perf_counter() + 10
+        while perf_counter() < end:
+            if results.exists() and '"event": "start", "path"' in results.read_text(encoding='utf-8') \
+                    and requests_of(server, '/a.bin'):
+                break
+            sleep(.05)
+        sleep(.3)
+        interrupt_main()
+
+    Thread(target=interrupt, daemon=True).start()
+    with pytest.raises(KeyboardInterrupt):
+        run(batch)
+    state = load_state(results)
+    assert state[2]['result'] is None and state[2]['path'].endswith('b.bin')
+
+    server.log.clear()
+    summary = run(batch, resume=True)
+    assert summary['failed'] == 0
+    assert summary['resumed'] + summary['success'] == 3
+    assert summary['resumed'] == sum(1 for i in state.values() if i['result'] == 'success')
+    assert len(requests_of(server, '/b.bin')) == 1
+    check_out(batch[2])  # 中断的文件被覆盖，没有生成b_1.bin
+
+
+def test_resume_overwrites_partial_file(server, batch):
+    path, results, out = batch
+    out.mkdir()
+    (out / 'a.bin').write_bytes(FILES['/a.bin'])
+    (out / 'b.bin').write_bytes(b'partial')
+    lines = [{'id': 1, 'url': server.url('a.bin'), 'event': 'start', 'path': str(out / 'a.bin')},
+             {'id': 1, 'url': server.url('a.bin'), 'event': 'done', 'result': 'success', 'path': str(out / 'a.bin')},
+             {'id': 2, 'url': server.url('b.bin'), 'event': 'start', 'path': str(out / 'b.bin')}]
+    results.write_text(''.join(dumps(i) + '\n' for i in lines) + '{"id": 3, "url"', encoding='utf-8')  # 最后半行
+
+    assert main([str(path), '-o', str(results), '-p', str(out), '-r', '2', '--interval', '0',
+                 '--progress-interval', '0', '-q', '--resume']) == 0
+    assert not requests_of(server, '/a.bin')
+    check_out(out)
+    done = [loads(i) for i in results.read_text(encoding='utf-8').splitlines()[3:] if '"done"' in i]
+    assert sorted(i['id'] for i in done) == [2, 3]
+
+
+def test_resume_changed_url_downloads_again(server, batch):
+    path, results, out = batch
+    results.write_text(dumps({'id': 1, 'url': server.url('old.bin'), 'event': 'done', 'result': 'success'}) + '\n',
+                       encoding='utf-8')
+    summary = run(batch, resume=True)
+    assert summary['resumed'] == 0 and summary['success'] == 3
+    assert len(requests_of(server, '/a.bin')) == 1
+    check_out(out)
@@ -0,0 +1,67 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_cluster.py
+"""
+from multiprocessing import Process
+from os import urandom
+from time import sleep, perf_counter
+
+import pytest
+
+from DownloadKit.cluster import SQLiteQueue, run_worker
+from DownloadKit.faultserver import FaultServer
+
+DATA = urandom(2 * 1048576)
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+def start_worker(queue, goal_path, name):
+    p = Process(target=run_worker, args=(queue.path, str(goal_path), 2, '50M', 2, name), daemon=True)
+    p.start()
+    return p
+
+
+def wait_for(func, timeout=10):
+    end_time = perf_counter() + timeout
+    while not func():
+        assert perf_counter() < end_time
+        sleep(.1)
+
+
+def test_report_returns_lost_missions(tmp_path):
+    queue = SQLiteQueue(tmp_path / 'q.db')
+    a, b = queue.put('http://127.0.0.1/a'), queue.put('http://127.0.0.1/b')
+    queue.take('w1', 2)
+    assert queue.report([(a, 1, 10), (b, 1, 10)], 'w1') == []
+
+    assert queue.requeue_stale(-1) == 2
+    queue.take('w2', 1)
+    assert queue.report([(a, 2, 10), (b, 2, 10)], 'w1') == [a, b]
+    assert queue.results()[0]['downloaded'] == 0
+    queue.close()
+
+
+def test_requeued_mission_runs_in_one_worker(server, tmp_path):
+    server.add_fault('/a.bin', 'slow', rate=1048576)
+    queue = SQLiteQueue(tmp_path / 'q.db')
+    queue.put(server.url('a.bin'), file_exists='overwrite', split=False)
+    w1 = start_worker(queue, tmp_path / 'out', 'w1')
+    wait_for(lambda: queue.results()[0]['downloaded'])
+
+    assert queue.requeue_stale(0) == 1  # w1仍在下载，但被当作已失效
+    w2 = start_worker(queue, tmp_path / 'out', 'w2')
+    w1.join(30)
+    w2.join(30)
+
+    row = queue.results()[0]
+    assert row['state'] == 'done' and row['result'] == 'success', row
+    assert (tmp_path / 'out' / 'a.bin').read_bytes() == DATA
+    assert [i['bytes'] for i in server.log].count(len(DATA)) == 1  # 原来的下载已停止，只完整下载一次
+    queue.close()
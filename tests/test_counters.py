@@ -0,0 +1,44 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_counters.py
+"""
+from os import urandom
+from threading import Thread
+
+from DownloadKit import DownloadKit
+from DownloadKit._funcs import ByteCounter
+from DownloadKit.faultserver import FaultServer
+
+
+def test_byte_counter_threads():
+    counter = ByteCounter()
+
+    def work():
+        for _ in range(10000):
+            counter.add(3)
+            counter.add(-1)
+
+    threads = [Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value == 8 * 10000 * 2
+
+
+def test_progress_counts_after_many_missions(tmp_path):
+    files = {f'/{i}.bin': urandom(1000 + i) for i in range(40)}
+    with FaultServer(files=files) as server:
+        d = DownloadKit(tmp_path, roads=8)
+        d.set.interval(0)
+        missions = [d.add(server.url(p), split=False) for p in files]
+        d.wait(show=False)
+        assert all(m.result == 'success' for m in missions)
+        p = d.progress()
+        assert p['missions'] == len(files)
+        assert p['running'] == 0 and p['done'] == len(files)
+        assert p['size'] == p['downloaded'] == sum(len(i) for i in files.values())
+        assert sorted(d.missions) == list(range(1, len(files) + 1))
+        assert not d.is_running
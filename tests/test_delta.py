@@ -0,0 +1,156 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_delta.py
+"""
+import hashlib
+from json import dumps
+from os import urandom
+from time import sleep
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.delta import load_index, _rsum
+from DownloadKit.faultserver import FaultServer
+
+BLOCK = 4096
+NEW = urandom(256 * BLOCK + 100)
+OLD = NEW[:10 * BLOCK] + urandom(BLOCK) + NEW[11 * BLOCK:200 * BLOCK] + urandom(BLOCK) + NEW[201 * BLOCK:]
+
+
+def json_index(data=NEW, name=None):
+    blocks = [hashlib.sha1(data[i:i + BLOCK]).hexdigest() for i in range(0, len(data), BLOCK)]
+    index = {'size': len(data), 'block_size': BLOCK, 'hash': 'sha1', 'blocks': blocks,
+             'file_hash': ['sha256', hashlib.sha256(data).hexdigest()]}
+    if name:
+        index['name'] = name
+    return dumps(index).encode()
+
+
+def zsync_index(data=NEW):
+    try:
+        hashlib.new('md4')
+        md4 = True
+    except ValueError:
+        md4 = False
+    head = (f'zsync: 0.6.2\nFilename: a.bin\nBlocksize: {BLOCK}\nLength: {len(data)}\nHash-Lengths: 1,4,16\n'
+            f'SHA-1: {hashlib.sha1(data).hexdigest()}\n\n').encode()
+    body = b''
+    for i in range(0, len(data), BLOCK):
+        block = data[i:i + BLOCK].ljust(BLOCK, b'\x00')
+        body += _rsum(block) + (hashlib.new('md4', block).digest() if md4 else b'\x00' * 16)
+    return head + body
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files={'/a.bin': NEW, '/a.json': json_index(), '/a.zsync': zsync_index()}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path, roads=2)
+    d.set.retry(1)
+    d.set.interval(0)
+    d.set.timeout(5)
+    (tmp_path / 'a.bin').write_bytes(OLD)
+    yield d
+    d.cancel()
+
+
+def fetched(server):
+    """返回从a.bin下载的字节数"""
+    return sum(i['bytes'] for i in server.log if i['path'] == '/a.bin')
+
+
+@pytest.mark.parametrize('control', ['bytes', 'url', 'path'])
+def test_json_delta(server, kit, tmp_path, control):
+    if control == 'bytes':
+        delta = json_index()
+    elif control == 'url':
+        delta = server.url('a.json')
+    else:
+        delta = tmp_path / 'a.json'
+        delta.write_bytes(json_index())
+    m = kit.add(server.url('a.bin'), delta=delta)
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert (tmp_path / 'a.bin').read_bytes() == NEW
+    assert m.delta_info == {'blocks': 257, 'reused': 255, 'fetch_size': 2 * BLOCK}
+    assert fetched(server) == 2 * BLOCK
+    assert not list(tmp_path.glob('.a.bin.*'))
+
+
+def test_zsync_delta(server, kit, tmp_path):
+    m = kit.add(server.url('a.bin'), delta=server.url('a.zsync'))
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert (tmp_path / 'a.bin').read_bytes() == NEW
+    assert m.delta_info['reused'] == 255
+    assert fetched(server) == 2 * BLOCK
+
+
+def test_moved_blocks_are_reused(server, kit, tmp_path):
+    (tmp_path / 'a.bin').write_bytes(NEW[BLOCK:2 * BLOCK] + NEW[:BLOCK])  # 数据块换了位置
+    m = kit.add(server.url('a.bin'), delta=json_index())
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert m.delta_info['reused'] == 2
+    assert (tmp_path / 'a.bin').read_bytes() == NEW
+
+
+def test_without_local_file_downloads_whole_file(server, kit, tmp_path):
+    (tmp_path / 'a.bin').unlink()
+    m = kit.add(server.url('a.bin'), delta=json_index())
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert m.delta_info is None
+    assert (tmp_path / 'a.bin').read_bytes() == NEW
+
+
+def test_name_from_index(server, kit, tmp_path):
+    (tmp_path / 'b.bin').write_bytes(OLD)
+    m = kit.add(server.url('a.bin'), delta=json_index(name='b.bin'))
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert (tmp_path / 'b.bin').read_bytes() == NEW
+    assert (tmp_path / 'a.bin').read_bytes() == OLD
+
+
+def test_server_data_differs_from_index(server, kit, tmp_path):
+    server.add_file('/a.bin', urandom(len(NEW)))
+    m = kit.add(server.url('a.bin'), delta=json_index())
+    m.wait(show=False)
+    assert m.result is False
+    assert '不一致' in m.info
+    assert (tmp_path / 'a.bin').read_bytes() == OLD  # 失败时不改动本地文件
+    assert not list(tmp_path.glob('.a.bin.*'))
+
+
+def test_bad_control_file(server, kit):
+    m = kit.add(server.url('a.bin'), delta=b'not an index')
+    m.wait(show=False)
+    assert m.result is False
+    assert '校验文件不能使用' in m.info
+
+
+def test_load_index_formats():
+    index = load_index(json_index())
+    assert (index.size, index.block_size, index.blocks_count) == (len(NEW), BLOCK, 257)
+    assert index.block_range(256) == [256 * BLOCK, len(NEW) - 1]
+    index = load_index(zsync_index())
+    assert (index.size, index.block_size, index.blocks_count, index.file_name) == (len(NEW), BLOCK, 257, 'a.bin')
+    assert index.pad
+
+
+def test_cancel_keeps_local_file(server, kit, tmp_path):
+    server.add_fault('/a.bin', 'stall', seconds=3)
+    m = kit.add(server.url('a.bin'), delta=json_index())
+    while m.state != 'running' or not m.tasks or m.tasks[0].info != '下载中':
+        sleep(.02)
+    m.cancel()
+    assert m.result == 'canceled'
+    assert (tmp_path / 'a.bin').read_bytes() == OLD
@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_extract.py
+"""
+import tarfile
+import zipfile
+from io import BytesIO
+from os import urandom
+from time import sleep
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+MEMBERS = {'a.bin': urandom(1048576), 'sub/b.bin': urandom(524288), 'c.txt': b'hello' * 1000}
+
+
+def make_tar(mode='w', members=MEMBERS):
+    buf = BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, BytesIO(data))
+    return buf.getvalue()
+
+
+def make_zip():
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        for name, data in MEMBERS.items():
+            z.writestr(name, data, zipfile.ZIP_DEFLATED if name.endswith('.txt') else zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def server():
+    files = {'/t.tar': make_tar(), '/t.tar.gz': make_tar('w:gz'), '/t.zip': make_zip(),
+             '/evil.tar': make_tar(members={'../evil.txt': b'x', 'ok.txt': b'ok'})}
+    with FaultServer(files=files) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path / 'out', roads=2)
+    d.set.retry(1)
+    d.set.interval(0)
+    d.set.timeout(5)
+    yield d
+    d.cancel()
+
+
+def extracted_ok(m, dest):
+    assert m.result == 'success', m.info
+    assert sorted(m.extracted) == sorted(str(dest / i) for i in MEMBERS)
+    for name, data in MEMBERS.items():
+        assert (dest / name).read_bytes() == data
+    return True
+
+
+@pytest.mark.parametrize('name', ['t.tar', 't.tar.gz'])
+def test_tar_stream(server, kit, tmp_path, name):
+    m = kit.add(server.url(name), extract=True)
+    m.wait(show=False)
+    assert extracted_ok(m, tmp_path / 'out')
+    assert not (tmp_path / 'out' / name).exists()
+    assert len(server.log) == 1
+
+
+def test_extract_to_sub_folder(server, kit, tmp_path):
+    m = kit.add(server.url('t.tar'), extract='x')
+    m.wait(show=False)
+    assert extracted_ok(m, tmp_path / 'out' / 'x')
+
+
+def test_zip_ranged_reads(server, kit, tmp_path):
+    m = kit.add(server.url('t.zip'), extract=True)
+    m.wait(show=False)
+    assert extracted_ok(m, tmp_path / 'out')
+    ranged = [i for i in server.log if i['range'] is not None]
+    assert ranged and all(i['status'] == 206 for i in ranged)
+    assert sum(i['bytes'] for i in ranged) < 2 * len(server.files['/t.zip'])
+    assert not list((tmp_path / 'out').glob('tmp*'))
+
+
+def test_zip_spooled_without_ranges(server, kit, tmp_path):
+    server.add_fault('/t.zip', 'no_ranges', accept_ranges=0)
+    m = kit.add(server.url('t.zip'), extract=True)
+    m.wait(show=False)
+    assert extracted_ok(m, tmp_path / 'out')
+    assert len(server.log) == 1
+    assert not list((tmp_path / 'out').glob('tmp*'))  # 临时文件已删除
+
+
+def test_unsafe_members_skipped(server, kit, tmp_path):
+    m = kit.add(server.url('evil.tar'), extract=True)
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert (tmp_path / 'out' / 'ok.txt').read_bytes() == b'ok'
+    assert not (tmp_path / 'evil.txt').exists()
+
+
+def test_broken_archive_fails(server, kit):
+    server.add_file('/bad.tar', b'not a tar file' * 100)
+    m = kit.add(server.url('bad.tar'), extract=True)
+    m.wait(show=False)
+    assert m.result is False
+    assert '解压失败' in m.info
+
+
+@pytest.mark.parametrize('name', ['t.tar', 't.zip'])
+def test_pause_restarts_extraction(server, kit, tmp_path, name):
+    rule = server.add_fault(f'/{name}', 'slow', rate=1048576)
+    m = kit.add(server.url(name), extract=True)
+    while m.downloaded_size < 100000:
+        sleep(.05)
+    m.pause()
+    assert m.state == 'paused'
+    rule['times'] = rule['hits']  # 继续后不再限速
+    m.resume()
+    m.wait(show=False)
+    assert extracted_ok(m, tmp_path / 'out')
+    size = len(server.files[f'/{name}'])
+    assert [i for i in server.log if i['fault'] is None and i['bytes'] == size]  # 继续后从头完整读取
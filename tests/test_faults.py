@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_faults.py
+"""
+from hashlib import md5
+from os import urandom
+from time import sleep
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+DATA = urandom(3 * 1048576 + 123)
+MD5 = md5(DATA).hexdigest()
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+@pytest.fixture(params=['requests', 'pycurl'])
+def kit(request, server, tmp_path):
+    if request.param == 'pycurl':
+        pytest.importorskip('pycurl')
+    server.clear_faults()
+    d = DownloadKit(tmp_path, roads=4)
+    d.set.transport(request.param)
+    d.set.retry(3)
+    d.set.interval(0)
+    d.set.timeout(2)
+    d.set.block_size('1M')
+    yield d
+    d.cancel()
+    server.clear_faults()
+
+
+def file_ok(mission):
+    """检查任务是否成功且文件内容完整"""
+    return (mission.result == 'success' and mission.path is not None
+            and md5(mission.path.read_bytes()).hexdigest() == MD5)
+
+
+def test_reset_mid_stream_is_retried(server, kit):
+    rule = server.add_fault('/a.bin', 'reset', times=1, ranged=True, range_=(1048576, 1048576), after=100000)
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert rule['hits'] == 1
+    assert file_ok(m)
+
+
+def test_reset_without_split_is_retried(server, kit):
+    server.add_fault('/a.bin', 'reset', times=1, after=500000)
+    m = kit.add(server.url('a.bin'), split=False)
+    m.wait(show=False)
+    assert file_ok(m)
+
+
+def test_server_ignores_range(server, kit):
+    rule = server.add_fault('/a.bin', 'no_ranges', ranged=True)
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert rule['hits'] == 3  # 第一块用不带Range的连接，其余3块都收到整个文件
+    assert file_ok(m)
+
+
+def test_split_chunk_stall_is_retried(server, kit):
+    rule = server.add_fault('/a.bin', 'stall', times=1, ranged=True, range_=(2097152, 2097152),
+                            after=1000, seconds=4)
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert rule['hits'] == 1
+    assert file_ok(m)
+
+
+def test_truncated_body_is_retried(server, kit):
+    rule = server.add_fault('/a.bin', 'truncate', times=1, after=500000)
+    m = kit.add(server.url('a.bin'), split=False)
+    m.wait(show=False)
+    assert rule['hits'] == 1
+    assert m.retries == 1
+    assert file_ok(m)
+
+
+def test_truncated_body_without_retry_fails(server, kit):
+    kit.set.retry(0)
+    server.add_fault('/a.bin', 'truncate', after=500000)
+    m = kit.add(server.url('a.bin'), split=False)
+    m.wait(show=False)
+    assert m.result is False
+
+
+def test_content_length_longer_than_body_fails(server, kit):
+    server.add_fault('/a.bin', 'wrong_length', delta=1000)
+    m = kit.add(server.url('a.bin'), split=False)
+    m.wait(show=False)
+    assert m.result is False
+
+
+def test_cancel_during_split(server, kit):
+    server.add_fault('/a.bin', 'slow', rate=262144)
+    m = kit.add(server.url('a.bin'))
+    sleep(.5)
+    m.cancel()
+    m.wait(show=False)
+    assert m.result == 'canceled'
+    assert m.is_done
+    assert 0 < m.downloaded_size < len(DATA)
+
+
+def test_pause_and_resume_during_split(server, kit):
+    rule = server.add_fault('/a.bin', 'slow', rate=262144)
+    m = kit.add(server.url('a.bin'))
+    sleep(.5)
+    m.pause()
+    assert m.state == 'paused'
+    size = m.downloaded_size
+    sleep(.3)
+    assert m.downloaded_size == size
+    server._faults.remove(rule)
+    m.resume()
+    m.wait(show=False)
+    assert file_ok(m)
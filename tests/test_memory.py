@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_memory.py
+"""
+from os import urandom
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+from DownloadKit.memory import MemoryBudget
+
+DATA = urandom(4 * 1048576 + 123)
+
+
+class FakeMission(object):
+    """写入时归还全部缓存额度的任务替身"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.flushed = 0
+
+    def _record_buffer(self):
+        self.flushed += 1
+        self.budget.release(self, self.budget._recorders.get(self, 0))
+
+
+def test_forced_flush_of_largest_mission():
+    budget = MemoryBudget(100)
+    a, b, c = FakeMission(budget), FakeMission(budget), FakeMission(budget)
+    budget.acquire(a, 60)
+    budget.acquire(b, 30)
+    budget.acquire(c, 40)  # 超出额度，先写入缓存最多的a
+    assert (a.flushed, b.flushed) == (1, 0)
+    stats = budget.stats()
+    assert stats['used'] == 70 and stats['forced'] == 1 and stats['waits'] == 0
+    assert stats['peak'] == 90
+
+
+def test_waits_for_writer_queue():
+    budget = MemoryBudget(100)
+    budget.acquire(None, 80, False)
+    done = []
+    t = Thread(target=lambda: done.append(budget.acquire(FakeMission(budget), 40)))
+    t.start()
+    sleep(.3)
+    assert not done and budget.waits > 0  # 后台写入队列中的数据不能强制写入，只能等待
+    budget.release(None, 80, False)
+    t.join(2)
+    assert done
+    assert budget.stats()['writer'] == 0 and budget.used == 40
+
+
+def test_oversized_block_passes_when_empty():
+    budget = MemoryBudget(100)
+    budget.acquire(FakeMission(budget), 500)
+    assert budget.used == 500
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_kit_stays_within_limit(server, tmp_path, write_behind):
+    d = DownloadKit(tmp_path, roads=4)
+    d.set.interval(0)
+    d.set.block_size('256K')
+    d.set.memory_limit('1M')
+    d.set.write_behind(write_behind)
+    m = d.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert m.path.read_bytes() == DATA
+    stats = d.memory_stats()
+    assert stats['used'] == 0 and stats['missions'] == 0
+    assert 0 < stats['peak'] <= 1048576
+    d.cancel()
+
+
+def test_kit_forces_flush_across_missions(server, tmp_path):
+    d = DownloadKit(tmp_path, roads=8)
+    d.set.interval(0)
+    d.set.block_size('64K')
+    d.set.memory_limit('1M')  # 每个任务缓存到256K才写入，8个任务同时缓存会超出额度
+    server.add_file('/slow.bin', DATA[:1048576])
+    server.add_fault('/slow.bin', 'slow', rate=2097152)
+    missions = [d.add(server.url('slow.bin'), rename=f'{i}.bin', split=False) for i in range(8)]
+    d.wait(show=False)
+    assert all(m.result == 'success' and m.path.read_bytes() == DATA[:1048576] for m in missions)
+    stats = d.memory_stats()
+    assert stats['forced'] > 0
+    assert stats['used'] == 0 and stats['peak'] <= 1048576
+    d.cancel()
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_names.py
+"""
+from os import urandom
+from shutil import rmtree
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+DATA = urandom(2 * 1048576)
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path / 'out', roads=4)
+    d.set.interval(0)
+    yield d
+    d.cancel()
+
+
+def download(kit, url, **kwargs):
+    m = kit.add(url, **kwargs)
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    return m
+
+
+@pytest.mark.parametrize('mode', ['rename', 'overwrite', 'add', 'skip'])
+def test_folder_removed_between_missions(server, kit, tmp_path, mode):
+    download(kit, server.url('a.bin'), file_exists=mode)
+    rmtree(tmp_path / 'out')
+    m = download(kit, server.url('a.bin'), file_exists=mode)
+    assert m.path.name == 'a.bin'
+    assert m.path.read_bytes() == DATA
+
+
+def test_rename_after_file_deleted(server, kit):
+    m = download(kit, server.url('a.bin'))
+    m.path.unlink()
+    m = download(kit, server.url('a.bin'))
+    assert m.path.name == 'a.bin'
+    m = download(kit, server.url('a.bin'))
+    assert m.path.name == 'a_1.bin'
+
+
+def test_unwritable_folder_fails_mission(server, kit, tmp_path):
+    (tmp_path / 'out').write_bytes(b'')  # 保存路径被同名文件占用
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert m.result is False
@@ -0,0 +1,200 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_protocols.py
+"""
+from datetime import datetime
+from hashlib import md5
+from io import BytesIO
+from os import urandom
+from re import match
+from threading import Thread
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.protocols import FileHandler, FTPHandler, S3Handler, _resolve_range
+
+DATA = urandom(3 * 1048576 + 123)
+MD5 = md5(DATA).hexdigest()
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path / 'out', roads=4)
+    d.set.block_size('1M')
+    d.set.interval(0)
+    yield d
+    d.cancel()
+
+
+@pytest.fixture
+def src(tmp_path):
+    root = tmp_path / 'src'
+    root.mkdir()
+    (root / 'a.bin').write_bytes(DATA)
+    return root
+
+
+def file_ok(mission):
+    """检查任务是否成功且文件内容完整"""
+    return (mission.result == 'success' and mission.path is not None
+            and md5(mission.path.read_bytes()).hexdigest() == MD5)
+
+
+def _ftp_server(root, size_cmd=True):
+    """启动一个匿名只读的pyftpdlib服务器
+    :param root: 服务器根文件夹
+    :param size_cmd: 是否支持SIZE命令
+    :return: 服务器对象
+    """
+    pytest.importorskip('pyftpdlib')
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler as ServerHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    class Handler(ServerHandler):
+        def ftp_SIZE(self, path):
+            if size_cmd:
+                return super().ftp_SIZE(path)
+            self.respond('502 Command not implemented.')
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(str(root))
+    Handler.authorizer = authorizer
+    server = ThreadedFTPServer(('127.0.0.1', 0), Handler)
+    Thread(target=server.serve_forever, kwargs={'timeout': .1}, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def ftp(src):
+    server = _ftp_server(src)
+    yield f'ftp://127.0.0.1:{server.address[1]}'
+    server.close_all()
+
+
+@pytest.fixture
+def ftp_no_size(src):
+    server = _ftp_server(src, False)
+    yield f'ftp://127.0.0.1:{server.address[1]}'
+    server.close_all()
+
+
+class StubS3Client(object):
+    """只实现get_object()的s3 client替身"""
+
+    class exceptions(object):
+        class ClientError(Exception):
+            def __init__(self, status):
+                super().__init__(status)
+                self.response = {'ResponseMetadata': {'HTTPStatusCode': status}}
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.calls = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append((Bucket, Key, Range))
+        data = self.objects.get((Bucket, Key), None)
+        if data is None:
+            raise self.exceptions.ClientError(404)
+
+        obj = {'ETag': '"stub"', 'LastModified': datetime(2024, 1, 1)}
+        r = match(r'bytes=(\d+)-(\d*)', Range) if Range else None
+        if r:
+            start = int(r.group(1))
+            end = min(int(r.group(2)), len(data) - 1) if r.group(2) else len(data) - 1
+            part = data[start:end + 1]
+            obj['ContentRange'] = f'bytes {start}-{end}/{len(data)}'
+            obj['ResponseMetadata'] = {'HTTPStatusCode': 206}
+        else:
+            part = data
+            obj['ResponseMetadata'] = {'HTTPStatusCode': 200}
+        obj['ContentLength'] = len(part)
+        obj['Body'] = BytesIO(part)
+        return obj
+
+
+def test_resolve_range_without_size():
+    assert _resolve_range('bytes=100-', None) == (200, 0, None)
+    assert _resolve_range('bytes=-100', None) == (200, 0, None)
+    assert _resolve_range('bytes=100-199', 1000) == (206, 100, 199)
+    assert _resolve_range('bytes=1000-', 1000)[0] == 416
+
+
+def test_file_range_request(src):
+    r = FileHandler().request((src / 'a.bin').as_uri(), None, 'get', headers={'Range': 'bytes=10-19'})
+    assert r.status_code == 206
+    assert r.headers['Content-Range'] == f'bytes 10-19/{len(DATA)}'
+    assert r.content == DATA[10:20]
+    r.close()
+
+
+def test_file_split_download(src, kit):
+    m = kit.add((src / 'a.bin').as_uri())
+    m.wait(show=False)
+    assert m.tasks_count == 4
+    assert file_ok(m)
+
+
+def test_file_missing(src, kit):
+    m = kit.add((src / 'none.bin').as_uri())
+    m.wait(show=False)
+    assert m.result is False
+
+
+def test_ftp_split_download(ftp, kit):
+    m = kit.add(f'{ftp}/a.bin')
+    m.wait(show=False)
+    assert m.tasks_count == 4
+    assert file_ok(m)
+
+
+def test_ftp_range_request(ftp):
+    r = FTPHandler().request(f'{ftp}/a.bin', None, 'get', headers={'Range': f'bytes={len(DATA) - 100}-'}, timeout=5)
+    assert r.status_code == 206
+    assert r.headers['Content-Range'] == f'bytes {len(DATA) - 100}-{len(DATA) - 1}/{len(DATA)}'
+    assert r.content == DATA[-100:]
+    r.close()
+
+
+def test_ftp_without_size_ignores_range(ftp_no_size):
+    r = FTPHandler().request(f'{ftp_no_size}/a.bin', None, 'get', headers={'Range': 'bytes=100-'}, timeout=5)
+    assert r.status_code == 200
+    assert 'Content-Range' not in r.headers
+    assert 'Accept-Ranges' not in r.headers
+    assert r.content == DATA
+    r.close()
+
+
+def test_ftp_without_size_is_not_split(ftp_no_size, kit):
+    m = kit.add(f'{ftp_no_size}/a.bin')
+    m.wait(show=False)
+    assert m.tasks_count == 1
+    assert file_ok(m)
+
+
+def test_ftp_missing(ftp, kit):
+    m = kit.add(f'{ftp}/none.bin')
+    m.wait(show=False)
+    assert m.result is False
+
+
+def test_s3_split_download(kit):
+    client = StubS3Client({('bucket', 'dir/a.bin'): DATA})
+    kit.set.protocol('s3', S3Handler(client))
+    m = kit.add('s3://bucket/dir/a.bin')
+    m.wait(show=False)
+    assert m.tasks_count == 4
+    assert file_ok(m)
+    assert [c[2] for c in client.calls].count(None) == 1  # 只有第一块不带Range
+
+
+def test_s3_missing(kit):
+    kit.set.protocol('s3', S3Handler(StubS3Client({})))
+    m = kit.add('s3://bucket/none.bin')
+    m.wait(show=False)
+    assert m.result is False
+    assert '404' in str(m.info)
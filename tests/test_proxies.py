@@ -0,0 +1,153 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_proxies.py
+"""
+from hashlib import md5
+from os import urandom
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit import proxies as proxies_module
+from DownloadKit.faultserver import FaultServer
+from DownloadKit.proxies import ProxyPool
+
+DATA = urandom(3 * 1048576 + 123)
+
+
+@pytest.fixture
+def weights(monkeypatch):
+    """记录acquire()计算的各代理权重，并总是选择第一个候选代理"""
+    record = {}
+
+    def choices(candidates, w):
+        record.clear()
+        record.update(zip(candidates, w))
+        return [candidates[0]]
+
+    monkeypatch.setattr(proxies_module, 'choices', choices)
+    return record
+
+
+def test_max_conn_caps_acquire():
+    pool = ProxyPool(['p'], max_conn=2, timeout=.2)
+    a, b = pool.acquire(), pool.acquire()
+    assert a and b
+    assert pool.acquire() is None
+    assert pool.stats['p']['running'] == 2
+
+    a.done(10)
+    c = pool.acquire()
+    assert c is not None
+    assert pool.stats['p']['running'] == 2
+
+
+def test_lease_done_once():
+    pool = ProxyPool(['p'])
+    lease = pool.acquire()
+    lease.done(100, True)
+    lease.done(100, False)
+    assert pool.stats['p'] == {'speed': pool.stats['p']['speed'], 'errors': 0, 'running': 0, 'bytes': 100,
+                               'bad': False}
+
+
+def test_dropped_lease_does_not_count_as_error():
+    pool = ProxyPool(['p'], max_errors=1)
+    pool.acquire()  # 未调用done()即被回收
+    assert pool.stats['p']['running'] == 0
+    assert pool.stats['p']['errors'] == 0
+
+
+def test_errors_evict_proxy():
+    pool = ProxyPool(['a', 'b'], max_errors=2, cooldown=None)
+    pool.release('a', 0, 1, False)
+    assert not pool.stats['a']['bad']
+    pool.release('a', 0, 1, False)
+    assert pool.stats['a']['bad']
+    for _ in range(5):
+        lease = pool.acquire()
+        assert lease.proxy == 'b'
+        lease.done()
+
+    pool.release('b', 0, 1, False)
+    pool.release('b', 0, 1, True)  # 成功后连续出错次数清零
+    pool.release('b', 0, 1, False)
+    assert not pool.stats['b']['bad']
+    pool.release('b', 0, 1, False)
+    assert pool.acquire() is None
+
+
+def test_cooldown_revives_proxy():
+    pool = ProxyPool(['a'], max_errors=3, cooldown=0)
+    for _ in range(3):
+        pool.release('a', 0, 1, False)
+    assert pool.stats['a']['bad']
+
+    lease = pool.acquire()
+    assert lease is not None
+    assert pool.stats['a']['errors'] == 2
+    lease.done(0, False)  # 再出错一次即再次停用
+    assert pool.stats['a']['bad']
+
+
+def test_weights_follow_speed_errors_and_load(weights):
+    pool = ProxyPool(['fast', 'slow', 'new'])
+    pool.release('fast', 1000, .1, True)
+    pool.release('slow', 1000, 1, True)
+    pool.acquire().done()
+    assert weights['fast'] == 10 * weights['slow']
+    assert weights['new'] == weights['fast']  # 未测速的按最快的计算
+
+    pool.release('fast', 0, 1, False)
+    lease = pool.acquire()  # 选中fast，之后fast有一个正在使用的连接
+    assert weights['fast'] == 5 * weights['slow']
+    pool.acquire().done()
+    assert lease.proxy == 'fast'
+    assert weights['fast'] == 2.5 * weights['slow']
+
+
+def test_speed_is_smoothed():
+    pool = ProxyPool(['p'])
+    pool.release('p', 1000, 1, True)
+    pool.release('p', 2000, 1, True)
+    assert pool.stats['p']['speed'] == pytest.approx(1300)
+    assert pool.stats['p']['bytes'] == 3000
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:  # 也作为http代理，按请求的路径返回文件
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path, server):
+    d = DownloadKit(tmp_path, roads=4)
+    d.set.block_size('1M')
+    d.set.interval(0)
+    d.set.proxy_pool([server.base_url])
+    yield d
+    d.cancel()
+
+
+def test_kit_returns_leases(server, kit):
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert md5(m.path.read_bytes()).digest() == md5(DATA).digest()
+    stats = kit.proxy_stats()[server.base_url]
+    assert stats['running'] == 0
+    assert stats['bytes'] == len(DATA)
+
+
+def test_kit_reports_skipped_lease(server, kit, tmp_path):
+    (tmp_path / 'a.bin').write_bytes(b'old')
+    kit._proxy_pool.release(server.base_url, 0, 1, False)
+    m = kit.add(server.url('a.bin'), file_exists='skip')
+    m.wait(show=False)
+    assert m.result == 'skipped'
+    stats = kit.proxy_stats()[server.base_url]
+    assert stats['running'] == 0
+    assert stats['errors'] == 0  # 显式归还并记为成功，而不是回收时归还
@@ -0,0 +1,82 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_ranges.py
+"""
+from os import urandom
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+DATA = urandom(1048576 + 123)
+RANGES = [(0, 9), (100, 199), (-50, None)]
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path, roads=2)
+    d.set.retry(1)
+    d.set.interval(0)
+    d.set.timeout(2)
+    yield d
+    d.cancel()
+
+
+def check_file(m):
+    assert m.result == 'success', m.info
+    assert m.ranges == [[0, 9], [100, 199], [len(DATA) - 50, len(DATA) - 1]]
+    data = m.path.read_bytes()
+    assert len(data) == len(DATA)
+    for start, end in m.ranges:
+        assert data[start:end + 1] == DATA[start:end + 1]
+
+
+def test_ranges_to_file(server, kit):
+    m = kit.add(server.url('a.bin'), ranges=RANGES)
+    m.wait(show=False)
+    check_file(m)
+    assert m.size == 160
+
+
+def test_ranges_to_memory(server, kit, tmp_path):
+    m = kit.add(server.url('a.bin'), ranges=RANGES, to_memory=True)
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert m.content == [DATA[:10], DATA[100:200], DATA[-50:]]
+    assert not (tmp_path / 'a.bin').exists()
+
+
+def test_ranges_without_range_support(server, kit):
+    server.add_fault('/a.bin', 'no_ranges')
+    m = kit.add(server.url('a.bin'), ranges=RANGES)
+    m.wait(show=False)
+    check_file(m)
+
+
+def test_ranges_fallback_after_rejected_request(server, kit):
+    rule = server.add_fault('/a.bin', 'status', times=1, code=400)
+    m = kit.add(server.url('a.bin'), ranges=RANGES)
+    m.wait(show=False)
+    assert rule['hits'] == 1
+    check_file(m)
+
+
+@pytest.mark.parametrize('reject', [False, True])
+def test_ranges_skip_existing(server, kit, tmp_path, reject):
+    if reject:  # 合并请求被拒绝后逐个请求时跳过
+        server.add_fault('/a.bin', 'status', times=1, code=400)
+    (tmp_path / 'a.bin').write_bytes(b'old')
+    m = kit.add(server.url('a.bin'), ranges=RANGES, file_exists='skip')
+    m.wait(show=False)
+    assert m.result == 'skipped', m.info
+    assert m.ranges is None
+    assert (tmp_path / 'a.bin').read_bytes() == b'old'
@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_store.py
+"""
+from os import urandom
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+OLD = urandom(2 * 1048576)
+NEW = urandom(2 * 1048576 + 100)
+
+
+@pytest.fixture
+def server():
+    with FaultServer(files={'/a.bin': OLD}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path, roads=4)
+    d.set.store(tmp_path / '.store')
+    yield d
+    d.cancel()
+
+
+def download(kit, url, **kwargs):
+    m = kit.add(url, **kwargs)
+    m.wait(show=False)
+    assert m.result == 'success'
+    return m
+
+
+def test_overwrite_keeps_store_object(server, kit):
+    m = download(kit, server.url('a.bin'))
+    obj = kit._store.object_path(m.content_hash)
+    assert obj.stat().st_nlink > 1
+
+    server.add_file('/a.bin', NEW)
+    m = download(kit, server.url('a.bin'), file_exists='overwrite')
+    assert m.path.read_bytes() == NEW
+    assert obj.read_bytes() == OLD
+
+
+def test_add_keeps_store_object(server, kit):
+    m = download(kit, server.url('a.bin'))
+    obj = kit._store.object_path(m.content_hash)
+
+    server.add_file('/a.bin', NEW)
+    m = download(kit, server.url('a.bin'), file_exists='add')
+    assert m.path.read_bytes() == OLD + NEW
+    assert m.path.stat().st_nlink == 1
+    assert obj.read_bytes() == OLD
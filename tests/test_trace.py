@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_trace.py
+"""
+from os import urandom
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+
+DATA = urandom(2 * 1048576)
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FaultServer(files={'/a.bin': DATA}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(tmp_path):
+    d = DownloadKit(tmp_path, roads=4)
+    d.set.interval(0)
+    d.set.trace(True)
+    yield d
+    d.cancel()
+
+
+def flushes(kit, server):
+    m = kit.add(server.url('a.bin'))
+    m.wait(show=False)
+    assert m.result == 'success', m.info
+    assert m.path.read_bytes() == DATA
+    events = [e for e in kit._tracer.events if e['phase'] == 'flush']
+    assert sum(e['args']['bytes'] for e in events) == len(DATA)
+    return events
+
+
+def test_each_recorder_write_is_traced(server, kit):
+    kit.set.block_size('16K')  # 数据块多于记录器缓存条数，下载中途就会写入
+    events = flushes(kit, server)
+    assert len(events) > 1
+    assert all(e['road'] is not None for e in events)
+
+
+def test_memory_limit_writes_are_traced(server, kit):
+    kit.set.block_size('256K')
+    kit.set.memory_limit('1M')
+    assert len(flushes(kit, server)) > 1
+
+
+def test_write_behind_writes_are_traced(server, kit):
+    kit.set.block_size('256K')
+    kit.set.write_behind(True)
+    assert flushes(kit, server)
@@ -0,0 +1,124 @@
+# -*- coding:utf-8 -*-
+"""
+@Author  :   g1879
+@Contact :   g1879@qq.com
+@File    :   test_volumes.py
+"""
+from os import urandom
+
+import pytest
+
+from DownloadKit import DownloadKit
+from DownloadKit.faultserver import FaultServer
+from DownloadKit.volumes import Volumes
+
+DATA = urandom(1048576 + 123)
+
+
+class FakeMission(object):
+    """只有Volumes用到的属性的任务替身"""
+
+    def __init__(self, size=None, downloaded_size=0, result=None):
+        self._volume = None
+        self.size = size
+        self.downloaded_size = downloaded_size
+        self.result = result
+
+
+@pytest.fixture
+def roots(tmp_path):
+    return [tmp_path / f'v{i}' for i in range(3)]
+
+
+def test_round_robin(roots):
+    volumes = Volumes(roots)
+    chosen = [volumes.choose(FakeMission()) for _ in range(6)]
+    assert chosen == [r.absolute() for r in roots] * 2
+    assert all(i['writing'] == 2 for i in volumes.stats().values())
+
+
+def test_max_writers_parks_missions(roots):
+    volumes = Volumes(roots[:2], max_writers=1)
+    a, b, c = FakeMission(), FakeMission(), FakeMission()
+    assert volumes.choose(a) and volumes.choose(b)
+    assert volumes.choose(c) is None
+    assert volumes.release(a) == [c]
+    assert volumes.choose(c) == volumes.roots[0]
+    assert volumes.release(a) == []  # 重复释放无效
+
+
+def test_throughput_prefers_unmeasured_then_faster(roots):
+    volumes = Volumes(roots[:2], 'throughput')
+    a = FakeMission(downloaded_size=1000, result='success')
+    b = FakeMission(downloaded_size=10, result='success')
+    assert volumes.choose(a) == volumes.roots[0]
+    assert volumes.choose(b) == volumes.roots[1]  # 没有测得速度的卷先使用
+    volumes.release(a)
+    volumes.release(b)
+    speeds = {k: v['speed'] for k, v in volumes.stats().items()}
+    assert speeds[str(volumes.roots[0])] > speeds[str(volumes.roots[1])]
+    assert volumes.choose(FakeMission()) == volumes.roots[0]
+
+
+def test_size_moves_to_volume_with_space(roots):
+    volumes = Volumes(roots[:2])
+    assert volumes.choose(FakeMission(size=1 << 20)) == volumes.roots[0]  # 剩余空间要减去此任务未写入的大小
+    volumes._next = 0
+    assert volumes.choose(FakeMission(), 1 << 60) == volumes.roots[1]  # 剩余空间不够时改用剩余空间最多的卷
+
+
+def test_locate(roots):
+    volumes = Volumes(roots)
+    (roots[2] / 'sub').mkdir()
+    (roots[2] / 'sub' / 'a.bin').write_bytes(b'a')
+    assert volumes.locate('sub', 'a.bin') == volumes.roots[2]
+    assert volumes.find('sub', 'a.bin') == volumes.roots[2] / 'sub' / 'a.bin'
+    assert volumes.locate('sub', 'b.bin') is None
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FaultServer(files={f'/{i}.bin': DATA for i in range(4)}) as s:
+        yield s
+
+
+@pytest.fixture
+def kit(roots):
+    d = DownloadKit(roads=4)
+    d.set.interval(0)
+    d.set.volumes(roots, max_writers=1)
+    yield d
+    d.cancel()
+
+
+def download(kit, url, **kwargs):
+    m = kit.add(url, **kwargs)
+    m.wait(show=False)
+    return m
+
+
+def test_kit_spreads_missions(server, kit, roots):
+    missions = [kit.add(server.url(f'{i}.bin'), goal_path='sub') for i in range(4)]
+    kit.wait(show=False)
+    assert all(m.result == 'success' for m in missions)
+    assert all(m.path.read_bytes() == DATA for m in missions)
+    assert {m.path.parent.parent for m in missions} == {r.absolute() for r in roots}
+    assert all(i['writing'] == 0 for i in kit.volume_stats().values())
+
+
+def test_kit_absolute_path_skips_volumes(server, kit, tmp_path):
+    m = download(kit, server.url('0.bin'), goal_path=tmp_path / 'abs')
+    assert m.result == 'success'
+    assert m.path == tmp_path / 'abs' / '0.bin'
+
+
+@pytest.mark.parametrize('mode', ['skip', 'overwrite', 'add', 'rename'])
+def test_kit_uses_volume_of_existing_file(server, kit, roots, mode):
+    (roots[1] / 'sub').mkdir()
+    (roots[1] / 'sub' / '0.bin').write_bytes(b'old')
+    m = download(kit, server.url('0.bin'), goal_path='sub', file_exists=mode)
+    assert m.path.parent == roots[1].absolute() / 'sub'
+    assert not (roots[0] / 'sub' / '0.bin').exists() and not (roots[2] / 'sub' / '0.bin').exists()
+    expected = {'skip': ('skipped', '0.bin', b'old'), 'overwrite': ('success', '0.bin', DATA),
+                'add': ('success', '0.bin', b'old' + DATA), 'rename': ('success', '0_1.bin', DATA)}[mode]
+    assert (m.result, m.path.name, m.path.read_bytes()) == expected